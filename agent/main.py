@@ -7,6 +7,7 @@ Supports BLOOM Runtime Control Plane operations:
 - Uninstall (stop + cleanup)
 - Git repo clone for multi-project management
 - Memory sync (push/pull) via hooks
+- Coalescing push queue for the Stop hook
 - Auto-registration with BLOOM Runtime on startup
 - Heartbeat to Membridge Control Plane
 """
@@ -23,16 +24,21 @@ import signal
 import socket
 import subprocess
 import sys
+import tempfile
 import time
-from contextlib import asynccontextmanager, suppress
+import uuid
+from contextlib import asynccontextmanager, nullcontext, suppress
+from datetime import datetime
 from enum import Enum
 from pathlib import Path
 from typing import Optional
 
 import httpx
-from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
+from agent.registry import ProjectRegistry
 from server.auth import AgentAuthMiddleware
 from server.logging_config import RequestIDMiddleware, setup_logging
 
@@ -49,15 +55,39 @@ ALLOW_PROCESS_CONTROL = os.environ.get("MEMBRIDGE_ALLOW_PROCESS_CONTROL", "0") =
 AGENT_DIR = Path(os.environ.get("MEMBRIDGE_AGENT_DIR", os.path.expanduser("~/membridge")))
 
 HEARTBEAT_INTERVAL = int(os.environ.get("MEMBRIDGE_HEARTBEAT_INTERVAL_SECONDS", "10"))
+# IP discovery (DNS + `tailscale ip`) is re-run at most once per TTL
+IP_ADDRS_TTL = max(1, int(os.environ.get("MEMBRIDGE_IP_ADDRS_TTL_SECONDS", "300")))
 SERVER_URL = os.environ.get("MEMBRIDGE_SERVER_URL", "http://127.0.0.1:8000").rstrip("/")
 RUNTIME_URL = os.environ.get("BLOOM_RUNTIME_URL", "").rstrip("/")
 RUNTIME_API_KEY = os.environ.get("RUNTIME_API_KEY", "")
 NODE_ID = os.environ.get("MEMBRIDGE_NODE_ID", platform.node())
 AGENT_PORT = int(os.environ.get("MEMBRIDGE_AGENT_PORT", "8001"))
+PROJECTS_DB = Path(
+    os.environ.get("MEMBRIDGE_PROJECTS_DB", os.path.expanduser("~/.membridge/agent_projects.db"))
+)
+# Legacy JSON registry, imported into PROJECTS_DB once and renamed to *.imported
 PROJECTS_FILE = Path(
     os.environ.get("MEMBRIDGE_PROJECTS_FILE", os.path.expanduser("~/.membridge/agent_projects.json"))
 )
 REPOS_BASE = Path(os.environ.get("MEMBRIDGE_REPOS_BASE", os.path.expanduser("~/projects")))
+# Stop-hook push queue: flush a project once it has been quiet for the window,
+# or once its oldest pending marker reaches the max wait
+PUSH_COALESCE_SECONDS = float(os.environ.get("MEMBRIDGE_PUSH_COALESCE_SECONDS", "30"))
+PUSH_COALESCE_MAX_SECONDS = float(os.environ.get("MEMBRIDGE_PUSH_COALESCE_MAX_SECONDS", "300"))
+# A failed queued push is retried after the window, doubling up to this cap
+PUSH_RETRY_MAX_SECONDS = float(os.environ.get("MEMBRIDGE_PUSH_RETRY_MAX_SECONDS", "600"))
+# Remote head watcher: poll each project's manifest.json (If-None-Match), backing
+# off from MIN to MAX seconds while it is unchanged; a new generation triggers
+# HEAD_WATCH_ACTION (prefetch stages it, pull installs it)
+HEAD_WATCH = os.environ.get("MEMBRIDGE_HEAD_WATCH", "0") == "1"
+HEAD_WATCH_MIN_SECONDS = float(os.environ.get("MEMBRIDGE_HEAD_WATCH_MIN_SECONDS", "10"))
+HEAD_WATCH_MAX_SECONDS = float(os.environ.get("MEMBRIDGE_HEAD_WATCH_MAX_SECONDS", "300"))
+HEAD_WATCH_ACTION = os.environ.get("MEMBRIDGE_HEAD_WATCH_ACTION", "prefetch")
+# Sync subprocesses: global limit across projects, and per-run timeout
+SYNC_CONCURRENCY = int(os.environ.get("MEMBRIDGE_SYNC_CONCURRENCY", "2"))
+SYNC_TIMEOUT = int(os.environ.get("MEMBRIDGE_SYNC_TIMEOUT_SECONDS", "120"))
+# Background sync jobs (wait=false) kept in memory for GET /jobs/{id}
+JOB_RETENTION = int(os.environ.get("MEMBRIDGE_JOB_RETENTION", "100"))
 
 
 def _detect_init_system() -> str:
@@ -95,41 +125,33 @@ def _cid(project_id: str) -> str:
     return hashlib.sha256(project_id.encode()).hexdigest()[:16]
 
 
-def load_projects() -> dict[str, dict]:
-    if not PROJECTS_FILE.exists():
-        return {}
-    try:
-        return json.loads(PROJECTS_FILE.read_text())
-    except Exception as e:
-        logger.warning("failed to load projects from %s: %s", PROJECTS_FILE, e)
-        return {}
+_registry: Optional[ProjectRegistry] = None
+
+
+def get_registry() -> ProjectRegistry:
+    global _registry
+    if _registry is None:
+        _registry = ProjectRegistry(PROJECTS_DB, legacy_json=PROJECTS_FILE)
+    return _registry
 
 
-def save_projects(projects: dict[str, dict]) -> None:
-    PROJECTS_FILE.parent.mkdir(parents=True, exist_ok=True)
-    PROJECTS_FILE.write_text(json.dumps(projects, indent=2, default=str))
+def load_projects() -> dict[str, dict]:
+    return get_registry().all()
 
 
-def upsert_project(project_id: str, canonical_id: Optional[str] = None, meta: Optional[dict] = None) -> dict:
+def upsert_project(project_id: str, canonical_id: Optional[str] = None, meta: Optional[dict] = None,
+                   unset: tuple = ()) -> dict:
     cid = canonical_id or _cid(project_id)
-    projects = load_projects()
-    entry = projects.get(cid, {
-        "project_id": project_id,
-        "canonical_id": cid,
-        "created_at": time.time(),
-    })
-    entry.update({"project_id": project_id, "canonical_id": cid, "last_seen": time.time()})
-    if meta:
-        for k, v in meta.items():
-            if v is not None:
-                entry[k] = v
-    projects[cid] = entry
-    save_projects(projects)
+    entry = get_registry().upsert(project_id, cid, meta, unset)
     logger.info("upsert_project: project_id=%s canonical_id=%s", project_id, cid)
     return entry
 
 
 def _get_ip_addrs() -> list[str]:
+    return _cached_fact("ip_addrs", int(time.time() // IP_ADDRS_TTL), _discover_ip_addrs)
+
+
+def _discover_ip_addrs() -> list[str]:
     addrs: list[str] = []
     try:
         hostname = socket.gethostname()
@@ -181,6 +203,100 @@ def _get_git_commit() -> Optional[str]:
     return None
 
 
+# Host facts for /health and /system-info: recomputed only when the file they
+# derive from changes (mtime stamp), so polling the agent never forks
+_HOST_FACTS: dict[str, tuple] = {}  # name → (stamp, value, refreshed_at)
+
+
+def _mtime(path: Path) -> Optional[int]:
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _cached_fact(name: str, stamp, compute):
+    hit = _HOST_FACTS.get(name)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    value = compute()
+    _HOST_FACTS[name] = (stamp, value, time.time())
+    return value
+
+
+def _facts_age(*names: str) -> dict[str, Optional[float]]:
+    now = time.time()
+    return {n: round(now - _HOST_FACTS[n][2], 1) if n in _HOST_FACTS else None for n in names}
+
+
+def _git_stamp() -> tuple:
+    """mtimes of HEAD, the branch ref it points to, packed-refs and the tags dir."""
+    git_dir = AGENT_DIR / ".git"
+    paths = [git_dir / "HEAD", git_dir / "packed-refs", git_dir / "refs" / "tags"]
+    with suppress(OSError):
+        head = (git_dir / "HEAD").read_text().strip()
+        if head.startswith("ref: "):
+            paths.append(git_dir / head[5:])
+    return tuple(_mtime(p) for p in paths)
+
+
+def _git_facts() -> dict[str, Optional[str]]:
+    return _cached_fact("git", _git_stamp(), lambda: {
+        "git_version": _get_git_version(),
+        "git_commit": _get_git_commit(),
+    })
+
+
+def _claude_cli_version() -> Optional[str]:
+    binary = shutil.which("claude")
+    if binary is None:
+        return None
+
+    def compute() -> Optional[str]:
+        try:
+            r = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=5)
+            return r.stdout.strip() if r.returncode == 0 else None
+        except Exception:
+            return None
+
+    return _cached_fact("claude_cli", (binary, _mtime(Path(binary).resolve())), compute)
+
+
+def _read_uptime() -> tuple[Optional[float], Optional[str]]:
+    """(seconds, `uptime -p` style text) from /proc/uptime."""
+    try:
+        seconds = float(Path("/proc/uptime").read_text().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None, None
+    minutes = int(seconds // 60)
+    parts = []
+    for unit, size in (("week", 10080), ("day", 1440), ("hour", 60), ("minute", 1)):
+        n, minutes = divmod(minutes, size)
+        if n:
+            parts.append(f"{n} {unit}{'s' if n != 1 else ''}")
+    return seconds, "up " + (", ".join(parts) or "0 minutes")
+
+
+def _read_meminfo() -> Optional[dict[str, int]]:
+    """Memory in MB from /proc/meminfo, with the same columns as `free -m`."""
+    try:
+        kb = {}
+        for line in Path("/proc/meminfo").read_text().splitlines():
+            key, _, rest = line.partition(":")
+            kb[key] = int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    if "MemTotal" not in kb:
+        return None
+    cache = kb.get("Buffers", 0) + kb.get("Cached", 0) + kb.get("SReclaimable", 0)
+    return {
+        "total": kb["MemTotal"] // 1024,
+        "used": (kb["MemTotal"] - kb.get("MemFree", 0) - cache) // 1024,
+        "free": kb.get("MemFree", 0) // 1024,
+        "available": kb.get("MemAvailable", kb.get("MemFree", 0)) // 1024,
+    }
+
+
 def _run_service_command(action: str) -> dict:
     if INIT_SYSTEM == "systemd":
         cmd = ["sudo", "systemctl", action, SERVICE_NAME]
@@ -246,6 +362,122 @@ async def _register_with_runtime() -> None:
         logger.warning("failed to register with BLOOM Runtime: %s", e)
 
 
+def _heartbeat_payloads() -> list[dict]:
+    """One heartbeat payload per registered project (or one for the bare node)."""
+    projects = load_projects()
+    ip_addrs = _get_ip_addrs()
+    if not projects:
+        return [{
+            "node_id": NODE_ID,
+            "canonical_id": _cid(NODE_ID),
+            "ip_addrs": ip_addrs,
+            "agent_version": AGENT_VERSION,
+        }]
+    return [
+        {
+            "node_id": NODE_ID,
+            "canonical_id": p["canonical_id"],
+            "project_id": p["project_id"],
+            "obs_count": p.get("obs_count"),
+            "db_sha": p.get("db_sha"),
+            "last_seen": p.get("last_seen"),
+            "head_generation": p.get("head_generation"),
+            "head_pushed_at": p.get("head_pushed_at"),
+            "synced_generation": p.get("synced_generation"),
+            "synced_at": p.get("synced_at"),
+            "staged_generation": p.get("staged_generation"),
+            "ip_addrs": ip_addrs,
+            "agent_version": AGENT_VERSION,
+        }
+        for p in projects.values()
+    ]
+
+
+class HeartbeatDelta:
+    """Builds batched heartbeats that carry only what changed since the last ack."""
+
+    NODE_FIELDS = ("ip_addrs", "agent_version")
+
+    def __init__(self):
+        self.seq = 0
+        self.acked_seq: Optional[int] = None
+        self.acked_projects: dict[str, dict] = {}
+        self.acked_node: dict = {}
+        self._sent: dict[int, tuple[dict, dict]] = {}
+
+    def build(self, payloads: list[dict]) -> dict:
+        self.seq += 1
+        full = self.acked_seq is None
+        node = {k: payloads[0].get(k) for k in self.NODE_FIELDS}
+        projects = {
+            p["canonical_id"]: {k: v for k, v in p.items() if k not in self.NODE_FIELDS and k != "node_id"}
+            for p in payloads
+        }
+        batch: dict = {"node_id": NODE_ID, "seq": self.seq, "base_seq": self.acked_seq, "projects": []}
+        for k, v in node.items():
+            if full or self.acked_node.get(k) != v:
+                batch[k] = v
+        for cid, fields in projects.items():
+            prev = self.acked_projects.get(cid)
+            if full or prev is None:
+                batch["projects"].append(fields)
+                continue
+            changed = {k: v for k, v in fields.items() if prev.get(k) != v}
+            if changed:
+                batch["projects"].append({"canonical_id": cid, **changed})
+        self._sent = {self.seq: (node, projects)}
+        return batch
+
+    def ack(self, seq: int) -> None:
+        node, projects = self._sent.pop(seq)
+        self.acked_seq, self.acked_node, self.acked_projects = seq, node, projects
+
+    def reset(self) -> None:
+        """Forget the acked state: the next batch is a full snapshot."""
+        self.acked_seq = None
+        self.acked_node = {}
+        self.acked_projects = {}
+
+
+async def _send_heartbeat_batch(client: httpx.AsyncClient, delta: HeartbeatDelta,
+                                payloads: list[dict]) -> Optional[dict]:
+    """POST one batched heartbeat; None if the control plane predates the endpoint."""
+    for _ in range(2):  # a resync request is answered at once with a full snapshot
+        batch = delta.build(payloads)
+        resp = await client.post(f"{SERVER_URL}/agent/heartbeat/batch", json=batch)
+        if resp.status_code in (404, 405):
+            return None
+        resp.raise_for_status()
+        data = resp.json()
+        if not data.get("resync"):
+            delta.ack(batch["seq"])
+            logger.debug("heartbeat batch ok: seq=%d projects=%d", batch["seq"], len(batch["projects"]))
+            return data
+        delta.reset()
+    raise RuntimeError("control plane kept rejecting the full heartbeat snapshot")
+
+
+async def _send_heartbeats_single(client: httpx.AsyncClient, payloads: list[dict]) -> int:
+    """Legacy protocol: one POST per project. Returns the number of failures."""
+    failures = 0
+    for payload in payloads:
+        try:
+            resp = await client.post(f"{SERVER_URL}/agent/heartbeat", json=payload)
+            resp.raise_for_status()
+            data = resp.json()
+            logger.debug(
+                "heartbeat ok: project=%s role=%s",
+                payload.get("project_id", "-"), data.get("role", "?"),
+            )
+        except Exception as e:
+            failures += 1
+            logger.warning(
+                "heartbeat failed (project=%s): %s",
+                payload.get("project_id", "-"), e,
+            )
+    return failures
+
+
 async def _heartbeat_loop() -> None:
     server_key = (
         os.environ.get("MEMBRIDGE_SERVER_ADMIN_KEY")
@@ -263,77 +495,62 @@ async def _heartbeat_loop() -> None:
         "X-MEMBRIDGE-ADMIN": server_key,
     }
     backoff = 0
-    node_cid = _cid(NODE_ID)
+    delta = HeartbeatDelta()
+    batch_supported = True
 
     logger.info(
         "heartbeat loop started: server=%s interval=%ds node_id=%s",
         SERVER_URL, HEARTBEAT_INTERVAL, NODE_ID,
     )
 
-    while True:
-        if backoff:
-            await asyncio.sleep(backoff)
-            backoff = 0
-        else:
-            await asyncio.sleep(HEARTBEAT_INTERVAL)
-
-        projects = load_projects()
-        ip_addrs = _get_ip_addrs()
-
-        if projects:
-            payloads = [
-                {
-                    "node_id": NODE_ID,
-                    "canonical_id": p["canonical_id"],
-                    "project_id": p["project_id"],
-                    "obs_count": p.get("obs_count"),
-                    "db_sha": p.get("db_sha"),
-                    "last_seen": p.get("last_seen"),
-                    "ip_addrs": ip_addrs,
-                    "agent_version": AGENT_VERSION,
-                }
-                for p in projects.values()
-            ]
-        else:
-            payloads = [{
-                "node_id": NODE_ID,
-                "canonical_id": node_cid,
-                "ip_addrs": ip_addrs,
-                "agent_version": AGENT_VERSION,
-            }]
-
-        consecutive_fails = 0
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            for payload in payloads:
+    # One keep-alive client for the life of the loop
+    async with httpx.AsyncClient(timeout=10.0, headers=headers) as client:
+        while True:
+            if backoff:
+                await asyncio.sleep(backoff)
+                backoff = 0
+            else:
+                await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+            payloads = _heartbeat_payloads()
+            consecutive_fails = 0
+            if batch_supported:
                 try:
-                    resp = await client.post(
-                        f"{SERVER_URL}/agent/heartbeat",
-                        json=payload,
-                        headers=headers,
-                    )
-                    resp.raise_for_status()
-                    data = resp.json()
-                    logger.debug(
-                        "heartbeat ok: project=%s role=%s",
-                        payload.get("project_id", "-"), data.get("role", "?"),
-                    )
+                    if await _send_heartbeat_batch(client, delta, payloads) is None:
+                        batch_supported = False
+                        logger.info("control plane has no batched heartbeat; sending one request per project")
                 except Exception as e:
-                    consecutive_fails += 1
-                    logger.warning(
-                        "heartbeat failed (project=%s): %s",
-                        payload.get("project_id", "-"), e,
-                    )
+                    consecutive_fails = 1
+                    logger.warning("heartbeat batch failed: %s", e)
+            if not batch_supported:
+                consecutive_fails = await _send_heartbeats_single(client, payloads)
 
-        if consecutive_fails:
-            backoff = min(60, HEARTBEAT_INTERVAL * (2 ** min(consecutive_fails - 1, 3)))
-            logger.info("heartbeat backoff: %ds (%d failures)", backoff, consecutive_fails)
+            if consecutive_fails:
+                backoff = min(60, HEARTBEAT_INTERVAL * (2 ** min(consecutive_fails - 1, 3)))
+                logger.info("heartbeat backoff: %ds (%d failures)", backoff, consecutive_fails)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Markers whose push had not succeeded before the last shutdown/crash
+    restored = _PUSH_QUEUE.attach(get_registry())
+    if restored:
+        logger.info("push queue: restored %d pending project(s)", restored)
     heartbeat_task = asyncio.create_task(_heartbeat_loop())
     registration_task = asyncio.create_task(_register_with_runtime())
+    flush_task = asyncio.create_task(_push_flush_loop())
+    watch_task = asyncio.create_task(_head_watch_loop()) if HEAD_WATCH else None
     yield
+    if watch_task:
+        watch_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await watch_task
+    flush_task.cancel()
+    with suppress(asyncio.CancelledError):
+        await flush_task
+    # Pending markers persist in the registry push_queue and are restored on
+    # the next start. No push at shutdown: a forced flush could outlast the
+    # service stop timeout and be killed mid-upload.
     heartbeat_task.cancel()
     registration_task.cancel()
     with suppress(asyncio.CancelledError):
@@ -364,6 +581,17 @@ def _tail_lines(text: str, max_lines: int = MAX_OUTPUT_LINES) -> str:
     return "\n".join([f"... ({len(lines) - max_lines} lines truncated)"] + lines[-max_lines:])
 
 
+def _read_events(path: str) -> list[dict]:
+    """Parse the engine's SYNC_EVENTS JSON lines (phases, digests, decisions)."""
+    events = []
+    with suppress(OSError):
+        with open(path) as f:
+            for line in f:
+                with suppress(ValueError):
+                    events.append(json.loads(line))
+    return events
+
+
 def _load_config_env() -> dict[str, str]:
     env = {}
     if CONFIG_ENV.exists():
@@ -390,6 +618,7 @@ def _build_env(project: str) -> dict[str, str]:
 class SyncAction(str, Enum):
     pull = "pull"
     push = "push"
+    prefetch = "prefetch"
     status = "status"
     doctor = "doctor"
 
@@ -397,6 +626,7 @@ class SyncAction(str, Enum):
 class SyncRequest(BaseModel):
     project: str = Field(..., examples=["garden-seedling"])
     no_restart_worker: bool = Field(default=True, description="Do not restart worker after pull (safe default)")
+    wait: bool = Field(default=True, description="If false, return 202 with a job id and run in the background")
 
 
 class SyncResponse(BaseModel):
@@ -410,6 +640,7 @@ class SyncResponse(BaseModel):
     stdout: Optional[str] = None
     stderr: Optional[str] = None
     returncode: Optional[int] = None
+    events: Optional[list[dict]] = None
 
 
 class StatusResponse(BaseModel):
@@ -429,13 +660,33 @@ def _find_script(action: SyncAction) -> Path:
     mapping = {
         SyncAction.pull: "claude-mem-pull",
         SyncAction.push: "claude-mem-push",
+        SyncAction.prefetch: "claude-mem-prefetch",
         SyncAction.status: "claude-mem-status",
         SyncAction.doctor: "claude-mem-doctor",
     }
     return HOOKS_BIN / mapping[action]
 
 
-def _run_sync(action: SyncAction, project: str, extra_env: dict | None = None) -> SyncResponse:
+# Syncs run as asyncio subprocesses, at most SYNC_CONCURRENCY at once, so
+# /health and heartbeats keep being served.  Pull, push and prefetch replace or
+# snapshot the node DB and its sidecars, which every project on a node shares
+# by default, so they also run one at a time per DB file.
+_SYNC_SLOTS = asyncio.Semaphore(max(1, SYNC_CONCURRENCY))
+_DB_LOCKS: dict[str, asyncio.Lock] = {}
+_MUTATING_ACTIONS = {SyncAction.pull, SyncAction.push, SyncAction.prefetch}
+_SYNC_STATS = {"running": 0, "waiting": 0}
+
+
+def _db_lock(action: SyncAction, env: dict[str, str]):
+    if action not in _MUTATING_ACTIONS:
+        return nullcontext()
+    db_path = env.get("CLAUDE_MEM_DB") or "~/.claude-mem/claude-mem.db"
+    return _DB_LOCKS.setdefault(os.path.realpath(os.path.expanduser(db_path)), asyncio.Lock())
+
+
+async def _run_sync(
+    action: SyncAction, project: str, extra_env: dict | None = None, job: Optional["AgentJob"] = None,
+) -> SyncResponse:
     hostname = platform.node()
     cid = canonical_id(project)
 
@@ -467,48 +718,102 @@ def _run_sync(action: SyncAction, project: str, extra_env: dict | None = None) -
     if extra_env:
         env.update(extra_env)
 
+    started = False
+    _SYNC_STATS["waiting"] += 1
+    try:
+        async with _db_lock(action, env), _SYNC_SLOTS:
+            _SYNC_STATS["waiting"] -= 1
+            _SYNC_STATS["running"] += 1
+            started = True
+            if job:
+                job.mark_running()
+            try:
+                return await _exec_sync(action, project, script, env, job)
+            finally:
+                _SYNC_STATS["running"] -= 1
+    finally:
+        if not started:
+            _SYNC_STATS["waiting"] -= 1
+
+
+async def _read_lines(stream: asyncio.StreamReader, lines: list[str], job: Optional["AgentJob"], prefix: str) -> None:
+    async for raw in stream:
+        line = raw.decode(errors="replace").rstrip("\n")
+        lines.append(line)
+        if job:
+            job.lines.append(prefix + line)
+
+
+async def _exec_sync(
+    action: SyncAction, project: str, script: Path, env: dict[str, str], job: Optional["AgentJob"] = None,
+) -> SyncResponse:
+    hostname = platform.node()
+    cid = canonical_id(project)
+    # Structured per-phase timings from the engine, returned alongside the log tail
+    events_fd, events_path = tempfile.mkstemp(prefix="membridge-events-", suffix=".jsonl")
+    os.close(events_fd)
+    env["SYNC_EVENTS"] = events_path
+
     logger.info("executing %s project=%s script=%s", action.value, project, script)
     try:
-        result = subprocess.run(
-            [str(script), "--project", project],
-            capture_output=True,
-            text=True,
-            timeout=120,
+        proc = await asyncio.create_subprocess_exec(
+            str(script), "--project", project,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
             env=env,
+            start_new_session=True,  # timeout kills the hook script and the engine under it
         )
-        stdout_tail = _tail_lines(result.stdout) if result.stdout else None
-        stderr_tail = _tail_lines(result.stderr) if result.stderr else None
-        logger.info("%s project=%s rc=%d", action.value, project, result.returncode)
+        # Read output line by line so background jobs can stream it while it runs
+        out: list[str] = []
+        err: list[str] = []
+        try:
+            await asyncio.wait_for(asyncio.gather(
+                _read_lines(proc.stdout, out, job, ""),
+                _read_lines(proc.stderr, err, job, "[stderr] "),
+                proc.wait(),
+            ), timeout=SYNC_TIMEOUT)
+        except asyncio.TimeoutError:
+            with suppress(ProcessLookupError):
+                os.killpg(proc.pid, signal.SIGKILL)
+            await proc.wait()
+            logger.error("%s project=%s timed out", action.value, project)
+            return SyncResponse(
+                ok=False,
+                action=action.value,
+                project=project,
+                canonical_id=cid,
+                hostname=hostname,
+                detail=f"{action.value} timed out after {SYNC_TIMEOUT}s",
+                events=_read_events(events_path),
+            )
+        stdout = "\n".join(out)
+        stderr = "\n".join(err)
+        stdout_tail = _tail_lines(stdout) if stdout else None
+        stderr_tail = _tail_lines(stderr) if stderr else None
+        logger.info("%s project=%s rc=%d", action.value, project, proc.returncode)
         return SyncResponse(
-            ok=result.returncode == 0,
+            ok=proc.returncode == 0,
             action=action.value,
             project=project,
             canonical_id=cid,
             hostname=hostname,
-            detail=f"{action.value} {'completed' if result.returncode == 0 else 'failed'}",
+            detail=f"{action.value} {'completed' if proc.returncode == 0 else 'failed'}",
             stdout=stdout_tail,
             stderr=stderr_tail,
-            returncode=result.returncode,
-        )
-    except subprocess.TimeoutExpired:
-        logger.error("%s project=%s timed out", action.value, project)
-        return SyncResponse(
-            ok=False,
-            action=action.value,
-            project=project,
-            canonical_id=cid,
-            hostname=hostname,
-            detail=f"{action.value} timed out after 120s",
+            returncode=proc.returncode,
+            events=_read_events(events_path),
         )
     except Exception as e:
         logger.exception("failed to execute %s", action.value)
         raise HTTPException(status_code=500, detail=f"Failed to execute {action.value}: {str(e)}")
+    finally:
+        with suppress(OSError):
+            os.unlink(events_path)
 
 
 @app.get("/health")
 async def health():
-    git_version = _get_git_version()
-    git_commit = _get_git_commit()
+    git = _git_facts()
     disk_usage = None
     try:
         usage = shutil.disk_usage(str(AGENT_DIR))
@@ -524,8 +829,8 @@ async def health():
         "status": "ok",
         "service": "membridge-agent",
         "version": AGENT_VERSION,
-        "git_version": git_version,
-        "git_commit": git_commit,
+        "git_version": git["git_version"],
+        "git_commit": git["git_commit"],
         "hostname": platform.node(),
         "node_id": NODE_ID,
         "os_info": OS_INFO,
@@ -540,7 +845,13 @@ async def health():
         "heartbeat_interval": HEARTBEAT_INTERVAL,
         "server_url": SERVER_URL,
         "runtime_url": RUNTIME_URL or None,
-        "projects_count": len(load_projects()),
+        "projects_count": len(get_registry()),
+        "facts_age_seconds": _facts_age("git"),
+        "syncs": {**_SYNC_STATS, "concurrency": SYNC_CONCURRENCY},
+        "push_queue": {
+            k: v for k, v in _PUSH_QUEUE.metrics().items()
+            if k in ("enqueued", "pushes", "coalescing_ratio", "max_staleness_seconds")
+        },
         "uptime_seconds": round(time.time() - _START_TIME, 1),
         "disk": disk_usage,
         "capabilities": {
@@ -550,6 +861,7 @@ async def health():
             "clone": True,
             "sync": True,
             "process_control": ALLOW_PROCESS_CONTROL,
+            "head_watch": HEAD_WATCH,
         },
     }
 
@@ -611,7 +923,7 @@ async def register_project(body: RegisterProjectRequest):
         "ok": True,
         "project_id": entry["project_id"],
         "canonical_id": entry["canonical_id"],
-        "projects_count": len(load_projects()),
+        "projects_count": len(get_registry()),
     }
 
 
@@ -620,22 +932,35 @@ async def list_agent_projects():
     return list(load_projects().values())
 
 
+async def _dispatch_sync(action: SyncAction, project: str, wait: bool, extra_env: dict | None = None):
+    """Run a sync and return its result, or (wait=False) start a job and return 202."""
+    if wait:
+        return await _run_sync(action, project, extra_env=extra_env)
+    job = _start_job(action, project, extra_env)
+    return JSONResponse(status_code=202, content=job.to_dict())
+
+
 @app.post("/sync/pull", response_model=SyncResponse)
 async def sync_pull(body: SyncRequest):
     extra_env = {}
     if body.no_restart_worker:
         extra_env["MEMBRIDGE_NO_RESTART_WORKER"] = "1"
-    return _run_sync(SyncAction.pull, body.project, extra_env=extra_env)
+    return await _dispatch_sync(SyncAction.pull, body.project, body.wait, extra_env=extra_env)
 
 
 @app.post("/sync/push", response_model=SyncResponse)
 async def sync_push(body: SyncRequest):
-    return _run_sync(SyncAction.push, body.project)
+    return await _dispatch_sync(SyncAction.push, body.project, body.wait)
+
+
+@app.post("/sync/prefetch", response_model=SyncResponse)
+async def sync_prefetch(body: SyncRequest):
+    return await _dispatch_sync(SyncAction.prefetch, body.project, body.wait)
 
 
 @app.get("/doctor")
-async def doctor(project: str = Query(..., examples=["garden-seedling"])):
-    return _run_sync(SyncAction.doctor, project)
+async def doctor(project: str = Query(..., examples=["garden-seedling"]), wait: bool = True):
+    return await _dispatch_sync(SyncAction.doctor, project, wait)
 
 
 @app.post("/pull", response_model=SyncResponse)
@@ -643,21 +968,530 @@ async def pull_alias(body: SyncRequest):
     extra_env = {}
     if body.no_restart_worker:
         extra_env["MEMBRIDGE_NO_RESTART_WORKER"] = "1"
-    return _run_sync(SyncAction.pull, body.project, extra_env=extra_env)
+    return await _dispatch_sync(SyncAction.pull, body.project, body.wait, extra_env=extra_env)
 
 
 @app.post("/push", response_model=SyncResponse)
 async def push_alias(body: SyncRequest):
-    return _run_sync(SyncAction.push, body.project)
+    return await _dispatch_sync(SyncAction.push, body.project, body.wait)
 
 
 class DoctorRequest(BaseModel):
     project: str = Field(..., examples=["garden-seedling"])
+    wait: bool = True
 
 
 @app.post("/doctor", response_model=SyncResponse)
 async def doctor_post(body: DoctorRequest):
-    return _run_sync(SyncAction.doctor, body.project)
+    return await _dispatch_sync(SyncAction.doctor, body.project, body.wait)
+
+
+class AgentJob:
+    """A background sync: status, live output lines and the final SyncResponse."""
+
+    def __init__(self, action: SyncAction, project: str):
+        self.id = uuid.uuid4().hex[:16]
+        self.action = action
+        self.project = project
+        self.status = "queued"
+        self.detail: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.lines: list[str] = []
+        self.result: Optional[SyncResponse] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    def mark_running(self) -> None:
+        self.status = "running"
+        self.started_at = time.time()
+
+    def finish(self, status: str, detail: Optional[str], result: Optional[SyncResponse] = None) -> None:
+        self.status = status
+        self.detail = detail
+        self.result = result
+        self.finished_at = time.time()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "action": self.action.value,
+            "project": self.project,
+            "canonical_id": canonical_id(self.project),
+            "status": self.status,
+            "detail": self.detail,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "log_lines": len(self.lines),
+            "status_url": f"/jobs/{self.id}",
+            "log_url": f"/jobs/{self.id}/log",
+            "result": self.result.model_dump() if self.result else None,
+        }
+
+
+_JOBS: dict[str, AgentJob] = {}
+
+
+def _start_job(action: SyncAction, project: str, extra_env: dict | None = None) -> AgentJob:
+    job = AgentJob(action, project)
+    _JOBS[job.id] = job
+    # Forget the oldest finished jobs beyond the retention limit
+    for old in [j for j in _JOBS.values() if j.done][: max(0, len(_JOBS) - JOB_RETENTION)]:
+        del _JOBS[old.id]
+    job.task = asyncio.create_task(_run_job(job, extra_env))
+    return job
+
+
+async def _run_job(job: AgentJob, extra_env: dict | None) -> None:
+    try:
+        result = await _run_sync(job.action, job.project, extra_env=extra_env, job=job)
+        job.finish("completed" if result.ok else "failed", result.detail, result)
+    except HTTPException as e:
+        job.finish("error", str(e.detail))
+    except Exception as e:
+        logger.exception("job %s failed", job.id)
+        job.finish("error", str(e))
+
+
+def _get_job(job_id: str) -> AgentJob:
+    job = _JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@app.get("/jobs")
+async def list_agent_jobs():
+    return [
+        {k: v for k, v in j.to_dict().items() if k != "result"}
+        for j in reversed(list(_JOBS.values()))
+    ]
+
+
+@app.get("/jobs/{job_id}")
+async def get_agent_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+
+async def _job_log_events(job: AgentJob, offset: int):
+    sent = offset
+    while True:
+        while sent < len(job.lines):
+            sent += 1
+            yield f"id: {sent}\nevent: log\ndata: {job.lines[sent - 1]}\n\n"
+        if job.done and sent >= len(job.lines):
+            yield f"event: end\ndata: {json.dumps(job.to_dict(), default=str)}\n\n"
+            return
+        await asyncio.sleep(0.25)
+
+
+@app.get("/jobs/{job_id}/log")
+async def stream_agent_job_log(
+    job_id: str,
+    offset: int = Query(default=0, ge=0, description="Skip this many lines (resume)"),
+    last_event_id: Optional[str] = Header(default=None),
+):
+    """Server-sent events: one `log` event per output line, then `end` with the job."""
+    job = _get_job(job_id)
+    if last_event_id and last_event_id.isdigit():
+        offset = max(offset, int(last_event_id))
+    return StreamingResponse(
+        _job_log_events(job, offset),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+class PushQueue:
+    """Dirty markers from the Stop hook, coalesced into one push per project.
+
+    A marker stays queued until its push succeeds: failures are retried with
+    backoff, and an attached store (the project registry) keeps the markers
+    across agent restarts.
+    """
+
+    def __init__(self, window: float, max_wait: float, retry_max: Optional[float] = None):
+        self.window = window
+        self.max_wait = max_wait
+        self.retry_max = max(window, retry_max if retry_max is not None else window)
+        self.pending: dict[str, dict] = {}
+        self.store = None
+        self.enqueued = 0
+        self.flushed = 0
+        self.pushes = 0
+        self.failures = 0
+        self.max_staleness = 0.0
+        self.last_flush: Optional[dict] = None
+
+    def attach(self, store) -> int:
+        """Persist markers in `store` and load the ones left by a previous run."""
+        self.store = store
+        restored = 0
+        for entry in store.pending_pushes():
+            if entry["project"] not in self.pending:
+                self.pending[entry["project"]] = entry
+                restored += 1
+        for entry in self.pending.values():
+            store.save_push(entry)
+        return restored
+
+    def enqueue(self, project: str, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        entry = self.pending.setdefault(
+            project, {"project": project, "first": now, "last": now, "count": 0, "attempts": 0},
+        )
+        entry["last"] = now
+        entry["count"] += 1
+        self.enqueued += 1
+        if self.store is not None:
+            self.store.save_push(entry)
+        return entry
+
+    def _due(self, entry: dict, now: float) -> bool:
+        if entry.get("retry_at"):
+            return now >= entry["retry_at"]
+        return now - entry["last"] >= self.window or now - entry["first"] >= self.max_wait
+
+    def take_due(self, now: Optional[float] = None, force: bool = False) -> list[dict]:
+        # Taken markers stay in the store until record() sees their push succeed
+        now = time.time() if now is None else now
+        due = [e for e in self.pending.values() if force or self._due(e, now)]
+        for entry in due:
+            del self.pending[entry["project"]]
+        return due
+
+    def _requeue(self, entry: dict, now: float) -> dict:
+        attempts = entry.get("attempts", 0) + 1
+        entry = dict(entry, attempts=attempts,
+                     retry_at=now + min(self.retry_max, self.window * 2 ** (attempts - 1)))
+        newer = self.pending.get(entry["project"])
+        if newer:
+            # Markers queued while the push ran ride along; `first` stays the oldest
+            entry.update(last=max(entry["last"], newer["last"]), count=entry["count"] + newer["count"])
+        self.pending[entry["project"]] = entry
+        return entry
+
+    def record(self, entry: dict, ok: bool, finished: Optional[float] = None) -> None:
+        finished = time.time() if finished is None else finished
+        staleness = finished - entry["first"]
+        self.pushes += 1
+        self.last_flush = {
+            "project": entry["project"],
+            "coalesced": entry["count"],
+            "staleness_seconds": round(staleness, 1),
+            "ok": ok,
+            "finished_at": finished,
+        }
+        if ok:
+            self.flushed += entry["count"]
+            self.max_staleness = max(self.max_staleness, staleness)
+            newer = self.pending.get(entry["project"])
+            if self.store is not None:
+                if newer:
+                    self.store.save_push(newer)
+                else:
+                    self.store.drop_push(entry["project"])
+            return
+        self.failures += 1
+        retry = self._requeue(entry, finished)
+        self.last_flush.update(attempts=retry["attempts"],
+                               retry_in_seconds=round(retry["retry_at"] - finished, 1))
+        if self.store is not None:
+            self.store.save_push(retry)
+
+    def metrics(self, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        pending = []
+        for e in self.pending.values():
+            item = {"project": e["project"], "count": e["count"], "age_seconds": round(now - e["first"], 1)}
+            if e.get("attempts"):
+                item.update(attempts=e["attempts"], retry_in_seconds=round(max(0.0, e["retry_at"] - now), 1))
+            pending.append(item)
+        successes = self.pushes - self.failures
+        return {
+            "window_seconds": self.window,
+            "max_wait_seconds": self.max_wait,
+            "pending": pending,
+            "enqueued": self.enqueued,
+            "pushes": self.pushes,
+            "failures": self.failures,
+            # Markers served per successful push run; 1.0 means nothing was coalesced
+            "coalescing_ratio": round(self.flushed / successes, 2) if successes else None,
+            # Longest a marker waited until its push finished (oldest pending counts too)
+            "max_staleness_seconds": round(max([self.max_staleness] + [p["age_seconds"] for p in pending]), 1),
+            "last_flush": self.last_flush,
+        }
+
+
+_PUSH_QUEUE = PushQueue(PUSH_COALESCE_SECONDS, PUSH_COALESCE_MAX_SECONDS, PUSH_RETRY_MAX_SECONDS)
+
+
+async def _flush_push_queue(force: bool = False) -> list[dict]:
+    flushed = []
+    for entry in _PUSH_QUEUE.take_due(force=force):
+        try:
+            result = await _run_sync(SyncAction.push, entry["project"])
+            ok = result.ok
+        except Exception as e:
+            logger.warning("queued push project=%s failed: %s", entry["project"], e)
+            ok = False
+        _PUSH_QUEUE.record(entry, ok)
+        logger.info(
+            "queued push project=%s coalesced=%d ok=%s%s",
+            entry["project"], entry["count"], ok,
+            "" if ok else f" retry_in={_PUSH_QUEUE.last_flush['retry_in_seconds']}s",
+        )
+        flushed.append(dict(_PUSH_QUEUE.last_flush))
+    return flushed
+
+
+async def _push_flush_loop() -> None:
+    tick = min(max(PUSH_COALESCE_SECONDS / 4, 0.5), 5.0)
+    while True:
+        await asyncio.sleep(tick)
+        try:
+            await _flush_push_queue()
+        except Exception:
+            logger.exception("push queue flush failed")
+
+
+@app.post("/push/enqueue")
+async def push_enqueue(body: SyncRequest):
+    entry = _PUSH_QUEUE.enqueue(body.project)
+    return {
+        "ok": True,
+        "project": body.project,
+        "canonical_id": canonical_id(body.project),
+        "pending_markers": entry["count"],
+        "flush_in_seconds": round(
+            max(0.0, entry["retry_at"] - time.time()) if entry.get("retry_at") else min(
+                PUSH_COALESCE_SECONDS, entry["first"] + PUSH_COALESCE_MAX_SECONDS - time.time(),
+            ), 1),
+    }
+
+
+@app.get("/push/queue")
+async def push_queue():
+    return _PUSH_QUEUE.metrics()
+
+
+@app.post("/push/flush")
+async def push_flush():
+    """Push every pending project now instead of waiting for the window."""
+    return {"ok": True, "flushed": await _flush_push_queue(force=True)}
+
+
+class HeadWatcher:
+    """Per-project poll schedule for the remote head manifest."""
+
+    def __init__(self, min_interval: float, max_interval: float):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.state: dict[str, dict] = {}
+
+    def track(self, project: str, now: Optional[float] = None) -> dict:
+        now = time.time() if now is None else now
+        return self.state.setdefault(project, {
+            "project": project, "etag": None, "generation": None,
+            "interval": self.min_interval, "next_poll_at": now, "seeded": False,
+            "polls": 0, "not_modified": 0, "changes": 0, "errors": 0, "last_error": None,
+        })
+
+    def due(self, now: Optional[float] = None) -> list[str]:
+        now = time.time() if now is None else now
+        return [p for p, e in self.state.items() if e["next_poll_at"] <= now]
+
+    def observe(self, project: str, manifest: Optional[dict], etag: Optional[str],
+                now: Optional[float] = None) -> bool:
+        """Record a poll result (manifest None = 304); True if the head moved."""
+        now = time.time() if now is None else now
+        entry = self.track(project, now)
+        entry["polls"] += 1
+        entry["last_poll_at"] = now
+        head = (manifest or {}).get("generation") or (manifest or {}).get("head_sha256")
+        changed = manifest is not None and head != entry["generation"]
+        if manifest is None:
+            entry["not_modified"] += 1
+        entry["etag"] = etag
+        if changed:
+            entry["generation"] = head
+            entry["changes"] += 1
+            entry["interval"] = self.min_interval
+        else:
+            entry["interval"] = min(entry["interval"] * 2, self.max_interval)
+        entry["next_poll_at"] = now + entry["interval"]
+        return changed
+
+    def failed(self, project: str, error: str, now: Optional[float] = None) -> None:
+        """Poll or sync failed: forget the head so the next poll re-fetches and retries."""
+        now = time.time() if now is None else now
+        entry = self.track(project, now)
+        entry.update({"etag": None, "generation": None, "last_error": error})
+        entry["errors"] += 1
+        entry["interval"] = min(entry["interval"] * 2, self.max_interval)
+        entry["next_poll_at"] = now + entry["interval"]
+
+
+_HEAD_WATCHER = HeadWatcher(HEAD_WATCH_MIN_SECONDS, HEAD_WATCH_MAX_SECONDS)
+_WATCH_S3: dict = {}
+
+
+def _watch_client():
+    """One S3 client for the watcher, built from config.env like the sync engine."""
+    if "client" not in _WATCH_S3:
+        repo_root = str(Path(__file__).resolve().parent.parent)
+        if repo_root not in sys.path:
+            sys.path.insert(0, repo_root)
+        import sqlite_minio_sync
+
+        env = {**os.environ, **_load_config_env()}
+        cfg = {k: os.path.expandvars(env.get(k, "")) for k in
+               ("MINIO_ENDPOINT", "MINIO_ACCESS_KEY", "MINIO_SECRET_KEY", "MINIO_BUCKET")}
+        cfg["MINIO_REGION"] = env.get("MINIO_REGION", "us-east-1")
+        _WATCH_S3.update(client=sqlite_minio_sync.get_s3_client(cfg), bucket=cfg["MINIO_BUCKET"],
+                         not_modified=sqlite_minio_sync._is_not_modified)
+    return _WATCH_S3
+
+
+def _fetch_head(project: str, etag: Optional[str]) -> tuple[Optional[dict], Optional[str]]:
+    """(manifest, etag) of the project's head; (None, etag) when unchanged (304)."""
+    watch = _watch_client()
+    kwargs = {"IfNoneMatch": etag} if etag else {}
+    try:
+        resp = watch["client"].get_object(
+            Bucket=watch["bucket"], Key=f"projects/{canonical_id(project)}/sqlite/manifest.json", **kwargs,
+        )
+    except Exception as e:
+        if watch["not_modified"](e):
+            return None, etag
+        raise
+    return json.loads(resp["Body"].read()), resp.get("ETag")
+
+
+def _parse_ts(value) -> Optional[float]:
+    with suppress(TypeError, ValueError):
+        return datetime.fromisoformat(value).timestamp()
+    return None
+
+
+async def _head_sync(action: SyncAction, project: str) -> tuple[bool, str, Optional[str]]:
+    """Run the watcher's sync; returns (ok, detail, engine skip reason or None)."""
+    extra_env = {"MEMBRIDGE_NO_RESTART_WORKER": "1"} if action == SyncAction.pull else None
+    try:
+        result = await _run_sync(action, project, extra_env)
+    except Exception as e:
+        return False, str(e), None
+    skip = next((e.get("reason") for e in result.events or []
+                 if e.get("event") == "decision" and e.get("decision") == "skip"), None)
+    return result.ok, result.detail, skip
+
+
+async def _poll_head(project: str) -> Optional[dict]:
+    """Poll one project; on a new generation sync it and record convergence.
+
+    Convergence is recorded only once the node holds the head's rows: a
+    prefetch that stages the file is reported as `staged_generation`, and a
+    prefetch skipped because pull would append the deltas runs that pull.
+    """
+    entry = _HEAD_WATCHER.track(project)
+    try:
+        manifest, etag = await asyncio.to_thread(_fetch_head, project, entry["etag"])
+    except Exception as e:
+        _HEAD_WATCHER.failed(project, f"poll: {e}")
+        logger.debug("head watch poll failed project=%s: %s", project, e)
+        return None
+    if not _HEAD_WATCHER.observe(project, manifest, etag):
+        return None
+
+    generation = manifest.get("generation")
+    pushed_at = _parse_ts(manifest.get("timestamp"))
+    known = get_registry().get(_cid(project)) or {}
+    if generation is not None and (
+            known.get("synced_generation") == generation
+            or (HEAD_WATCH_ACTION != "pull" and known.get("staged_generation") == generation)):
+        # Already holds this head (agent restart, or a poll retried after an error)
+        entry["seeded"] = True
+        return None
+    # The first head seen since the agent started may have been pushed long before
+    # (the agent was down): sync it, but it is no convergence sample
+    measured = entry["seeded"]
+    if manifest.get("writer_node") == NODE_ID:
+        synced_at = pushed_at or time.time()  # this node wrote the head
+    else:
+        action = SyncAction.pull if HEAD_WATCH_ACTION == "pull" else SyncAction.prefetch
+        ok, detail, skip = await _head_sync(action, project)
+        if ok and skip == "delta_reachable":
+            # Nothing to stage: only a pull appending the deltas brings the rows in
+            action = SyncAction.pull
+            ok, detail, skip = await _head_sync(action, project)
+        if not ok:
+            _HEAD_WATCHER.failed(project, f"{action.value}: {detail}")
+            logger.warning("head watch %s failed project=%s: %s", action.value, project, detail)
+            return None
+        synced_at = time.time()
+        if action == SyncAction.prefetch and skip != "current":
+            # Staged only: the live DB lacks the rows until the next pull swaps it in
+            entry["seeded"] = True
+            upsert_project(project, meta={
+                "head_generation": generation,
+                "head_pushed_at": pushed_at,
+                "staged_generation": generation,
+                "staged_at": synced_at,
+            })
+            logger.info("head watch: project=%s generation=%s staged", project, generation)
+            return {"project": project, "generation": generation, "staged": True, "convergence_seconds": None}
+
+    entry["seeded"] = True
+    convergence = round(synced_at - pushed_at, 1) if pushed_at and measured else None
+    upsert_project(project, meta={
+        "head_generation": generation,
+        "head_pushed_at": pushed_at,
+        "synced_generation": generation,
+        "synced_at": synced_at if measured else None,
+        "convergence_seconds": convergence,
+    }, unset=() if measured else ("synced_at", "convergence_seconds"))
+    logger.info(
+        "head watch: project=%s generation=%s synced (convergence=%ss)",
+        project, generation, convergence,
+    )
+    return {"project": project, "generation": generation, "convergence_seconds": convergence}
+
+
+async def _head_watch_loop() -> None:
+    tick = min(max(HEAD_WATCH_MIN_SECONDS / 2, 0.5), 5.0)
+    logger.info(
+        "head watcher started: interval=%.0f..%.0fs action=%s",
+        HEAD_WATCH_MIN_SECONDS, HEAD_WATCH_MAX_SECONDS, HEAD_WATCH_ACTION,
+    )
+    while True:
+        try:
+            for p in load_projects().values():
+                _HEAD_WATCHER.track(p["project_id"])
+            for project in _HEAD_WATCHER.due():
+                await _poll_head(project)
+        except Exception:
+            logger.exception("head watch tick failed")
+        await asyncio.sleep(tick)
+
+
+@app.get("/head-watch")
+async def head_watch():
+    now = time.time()
+    return {
+        "enabled": HEAD_WATCH,
+        "action": HEAD_WATCH_ACTION,
+        "min_interval_seconds": HEAD_WATCH_MIN_SECONDS,
+        "max_interval_seconds": HEAD_WATCH_MAX_SECONDS,
+        "projects": [
+            {k: v for k, v in e.items() if k != "etag"} | {"next_poll_in": round(e["next_poll_at"] - now, 1)}
+            for e in _HEAD_WATCHER.state.values()
+        ],
+    }
 
 
 def _require_process_control():
@@ -946,21 +1780,8 @@ async def system_info():
         "repos_base": str(REPOS_BASE),
     }
 
-    try:
-        r = subprocess.run(["uptime", "-p"], capture_output=True, text=True, timeout=5)
-        info["uptime"] = r.stdout.strip() if r.returncode == 0 else None
-    except Exception:
-        info["uptime"] = None
-
-    try:
-        r = subprocess.run(["free", "-m"], capture_output=True, text=True, timeout=5)
-        if r.returncode == 0:
-            lines = r.stdout.strip().splitlines()
-            if len(lines) >= 2:
-                parts = lines[1].split()
-                info["memory_mb"] = {"total": int(parts[1]), "used": int(parts[2]), "free": int(parts[3])}
-    except Exception:
-        info["memory_mb"] = None
+    info["uptime_seconds"], info["uptime"] = _read_uptime()
+    info["memory_mb"] = _read_meminfo()
 
     try:
         usage = shutil.disk_usage(str(AGENT_DIR))
@@ -971,12 +1792,8 @@ async def system_info():
     except Exception:
         info["disk_gb"] = None
 
-    try:
-        r = subprocess.run(["claude", "--version"], capture_output=True, text=True, timeout=5)
-        info["claude_cli"] = r.stdout.strip() if r.returncode == 0 else None
-    except Exception:
-        info["claude_cli"] = None
-
+    info["claude_cli"] = _claude_cli_version()
+    info["facts_age_seconds"] = _facts_age("claude_cli")
     return info
 
 
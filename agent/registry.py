@@ -0,0 +1,166 @@
+"""Agent project registry stored in a local SQLite database (WAL).
+
+All projects are held in memory; SQLite is the durable copy. Readers (the
+heartbeat loop, /health, /projects) never touch the disk, and every upsert
+is one atomic transaction followed by a change notification.
+
+The same database keeps the Stop-hook push markers that have not been pushed
+yet, so they survive an agent restart.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+logger = logging.getLogger("membridge.agent.registry")
+
+# Fields stored as columns; anything else an upsert sets goes into `meta` (JSON)
+_COLUMNS = ("canonical_id", "project_id", "created_at", "last_seen")
+
+
+class ProjectRegistry:
+    def __init__(self, db_path: Path, legacy_json: Optional[Path] = None):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._listeners: list[Callable[[dict], None]] = []
+        self.version = 0
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS projects (
+                canonical_id TEXT PRIMARY KEY,
+                project_id TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_seen REAL,
+                meta TEXT NOT NULL DEFAULT '{}'
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS push_queue (
+                project TEXT PRIMARY KEY,
+                first REAL NOT NULL,
+                last REAL NOT NULL,
+                count INTEGER NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                retry_at REAL
+            )
+        """)
+        if legacy_json is not None:
+            self._import_json(Path(legacy_json))
+        self._projects: dict[str, dict] = {
+            row["canonical_id"]: self._row_to_entry(row)
+            for row in self._conn.execute("SELECT * FROM projects ORDER BY created_at")
+        }
+
+    @staticmethod
+    def _row_to_entry(row: sqlite3.Row) -> dict:
+        entry = json.loads(row["meta"] or "{}")
+        entry.update({k: row[k] for k in _COLUMNS})
+        return entry
+
+    def _import_json(self, path: Path) -> None:
+        """One-time import of agent_projects.json; the file is renamed afterwards."""
+        if not path.exists():
+            return
+        try:
+            legacy = json.loads(path.read_text())
+        except Exception as e:
+            logger.warning("registry: cannot import %s: %s", path, e)
+            return
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for cid, entry in legacy.items():
+                    self._write(self._conn, {**entry, "canonical_id": entry.get("canonical_id", cid)},
+                                replace=False)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        path.rename(path.with_name(path.name + ".imported"))
+        logger.info("registry: imported %d project(s) from %s", len(legacy), path)
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, entry: dict, replace: bool = True) -> None:
+        meta = {k: v for k, v in entry.items() if k not in _COLUMNS}
+        conn.execute(
+            f"""INSERT INTO projects (canonical_id, project_id, created_at, last_seen, meta)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(canonical_id) DO {'UPDATE SET project_id=excluded.project_id, '
+                'last_seen=excluded.last_seen, meta=excluded.meta' if replace else 'NOTHING'}""",
+            (entry["canonical_id"], entry["project_id"], entry.get("created_at") or time.time(),
+             entry.get("last_seen"), json.dumps(meta, default=str)),
+        )
+
+    def upsert(self, project_id: str, canonical_id: str, meta: Optional[dict] = None,
+               unset: tuple = ()) -> dict:
+        """Create or update a project; None values in `meta` leave fields unchanged.
+
+        Fields named in `unset` are removed from the entry.
+        """
+        with self._lock:
+            now = time.time()
+            entry = dict(self._projects.get(canonical_id) or {"created_at": now})
+            entry.update({"project_id": project_id, "canonical_id": canonical_id, "last_seen": now})
+            for k, v in (meta or {}).items():
+                if v is not None:
+                    entry[k] = v
+            for k in unset:
+                if k not in _COLUMNS:
+                    entry.pop(k, None)
+            self._write(self._conn, entry)  # autocommit: one atomic statement
+            self._projects[canonical_id] = entry
+            self.version += 1
+            listeners = list(self._listeners)
+        for callback in listeners:
+            try:
+                callback(entry)
+            except Exception:
+                logger.exception("registry listener failed")
+        return dict(entry)
+
+    def subscribe(self, callback: Callable[[dict], None]) -> None:
+        """Call `callback(entry)` after every upsert."""
+        self._listeners.append(callback)
+
+    def get(self, canonical_id: str) -> Optional[dict]:
+        entry = self._projects.get(canonical_id)
+        return dict(entry) if entry else None
+
+    def all(self) -> dict[str, dict]:
+        """Snapshot of every project, keyed by canonical_id (no disk access)."""
+        return {cid: dict(entry) for cid, entry in self._projects.items()}
+
+    def save_push(self, entry: dict) -> None:
+        """Persist a pending push marker (see agent.main.PushQueue)."""
+        with self._lock:
+            self._conn.execute(
+                """INSERT INTO push_queue (project, first, last, count, attempts, retry_at)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(project) DO UPDATE SET first=excluded.first, last=excluded.last,
+                   count=excluded.count, attempts=excluded.attempts, retry_at=excluded.retry_at""",
+                (entry["project"], entry["first"], entry["last"], entry["count"],
+                 entry.get("attempts", 0), entry.get("retry_at")),
+            )
+
+    def drop_push(self, project: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM push_queue WHERE project = ?", (project,))
+
+    def pending_pushes(self) -> list[dict]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM push_queue ORDER BY first").fetchall()
+        return [dict(row) for row in rows]
+
+    def __len__(self) -> int:
+        return len(self._projects)
+
+    def close(self) -> None:
+        self._conn.close()
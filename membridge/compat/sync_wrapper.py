@@ -1,4 +1,4 @@
-"""Compatibility wrappers that call sqlite_minio_sync.py via subprocess.
+"""Compatibility wrappers that call sqlite_minio_sync.py via subprocess or in-process.
 
 These functions allow both legacy hooks and the new agent API to use
 the same sync engine without modifying sqlite_minio_sync.py.
@@ -7,7 +7,9 @@ Each wrapper:
 - Loads config from ~/.claude-mem-minio/config.env (or override)
 - Sets CLAUDE_PROJECT_ID to the project name
 - Computes canonical_id = sha256(project_name)[:16]
-- Calls sqlite_minio_sync.py functions via subprocess
+- Calls sqlite_minio_sync.py functions via subprocess, or with
+  MEMBRIDGE_SYNC_INPROCESS=1 through a cached in-process SyncEngine
+  (no interpreter start, no boto3 import, pooled S3 connections)
 - Returns structured JSON result
 """
 
@@ -17,6 +19,7 @@ import os
 import platform
 import subprocess
 import sys
+import tempfile
 import time
 from pathlib import Path
 from typing import Optional
@@ -24,6 +27,11 @@ from typing import Optional
 
 MAX_OUTPUT_LINES = 200
 
+SYNC_INPROCESS = os.environ.get("MEMBRIDGE_SYNC_INPROCESS", "0") == "1"
+
+_ENGINES: dict = {}
+_S3_CLIENTS: dict = {}
+
 SYNC_SCRIPT = Path(__file__).resolve().parent.parent.parent / "sqlite_minio_sync.py"
 
 DEFAULT_CONFIG_ENV = Path(
@@ -72,6 +80,21 @@ def _tail_lines(text: str, max_lines: int = MAX_OUTPUT_LINES) -> str:
     return "\n".join([f"... ({len(lines) - max_lines} lines truncated)"] + lines[-max_lines:])
 
 
+def _read_events(path: str) -> list[dict]:
+    """Parse the engine's SYNC_EVENTS JSON lines (phases, digests, decisions)."""
+    events = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    pass
+    except OSError:
+        pass
+    return events
+
+
 def _run_sync_subprocess(
     action: str,
     project_name: str,
@@ -99,6 +122,7 @@ def _run_sync_subprocess(
     func_map = {
         "push": "push_sqlite",
         "pull": "pull_sqlite",
+        "prefetch": "prefetch_sqlite",
         "doctor": "doctor",
     }
     func_name = func_map.get(action)
@@ -121,6 +145,9 @@ def _run_sync_subprocess(
 
     python = sys.executable
     cmd = [python, "-c", f"import sqlite_minio_sync; sqlite_minio_sync.{func_name}()"]
+    events_fd, events_path = tempfile.mkstemp(prefix="membridge-events-", suffix=".jsonl")
+    os.close(events_fd)
+    env["SYNC_EVENTS"] = events_path
 
     try:
         result = subprocess.run(
@@ -145,6 +172,7 @@ def _run_sync_subprocess(
             "stdout": stdout,
             "stderr": stderr,
             "returncode": result.returncode,
+            "events": _read_events(events_path),
             "started_at": started_at,
             "finished_at": finished_at,
         }
@@ -172,6 +200,95 @@ def _run_sync_subprocess(
             "started_at": started_at,
             "finished_at": time.time(),
         }
+    finally:
+        try:
+            os.unlink(events_path)
+        except OSError:
+            pass
+
+
+def _config_mtime(config_path: Optional[Path] = None) -> Optional[int]:
+    try:
+        return (config_path or DEFAULT_CONFIG_ENV).stat().st_mtime_ns
+    except OSError:
+        return None
+
+
+def _get_engine(project_name: str, config_path: Optional[Path] = None):
+    """Cached SyncEngine per project; projects on one endpoint share an S3 client.
+
+    An edit to config.env (new mtime) rebuilds the engine on its next use.
+    """
+    key = (project_name, str(config_path or DEFAULT_CONFIG_ENV))
+    mtime = _config_mtime(config_path)
+    cached = _ENGINES.get(key)
+    engine = cached[1] if cached and cached[0] == mtime else None
+    if engine is None:
+        if str(SYNC_SCRIPT.parent) not in sys.path:
+            sys.path.insert(0, str(SYNC_SCRIPT.parent))
+        import sqlite_minio_sync
+
+        env = _build_env(project_name, config_path)
+        cfg = {k: os.path.expandvars(env.get(k, "")) for k in sqlite_minio_sync.ENGINE_REQUIRED_KEYS}
+        cfg["MINIO_REGION"] = env.get("MINIO_REGION", "us-east-1")
+        # Engine flags (CHUNKED_SYNC, PRIMARY_NODE_ID, ...) as the subprocess would see them
+        settings = sqlite_minio_sync.engine_settings(env)
+        client_key = (cfg["MINIO_ENDPOINT"], cfg["MINIO_ACCESS_KEY"], cfg["MINIO_SECRET_KEY"],
+                      cfg["MINIO_REGION"],
+                      tuple(sorted((k, v) for k, v in settings.items() if k.startswith("S3_"))))
+        engine = sqlite_minio_sync.SyncEngine(cfg, s3=_S3_CLIENTS.get(client_key), settings=settings)
+        _S3_CLIENTS[client_key] = engine.s3
+        _ENGINES[key] = (mtime, engine)
+    return engine
+
+
+def _run_sync_inprocess(
+    action: str,
+    project_name: str,
+    extra_env: Optional[dict] = None,
+    config_path: Optional[Path] = None,
+) -> dict:
+    cid = canonical_id(project_name)
+    hostname = platform.node()
+    started_at = time.time()
+    base = {"action": action, "project": project_name, "canonical_id": cid, "hostname": hostname}
+    try:
+        engine = _get_engine(project_name, config_path)
+        if action == "pull":
+            no_restart = (extra_env or {}).get("MEMBRIDGE_NO_RESTART_WORKER") == "1"
+            result = engine.pull(no_restart_worker=no_restart)
+        elif action in ("push", "prefetch", "doctor"):
+            result = getattr(engine, action)()
+        else:
+            return {**base, "ok": False, "detail": f"Unknown action: {action}", "returncode": -1,
+                    "started_at": started_at, "finished_at": time.time()}
+    except Exception as e:
+        return {**base, "ok": False, "detail": f"{action} error: {str(e)}", "returncode": -1,
+                "started_at": started_at, "finished_at": time.time()}
+    return {
+        **base,
+        "ok": result.ok,
+        "detail": f"{action} {'completed' if result.ok else 'failed'}",
+        "stdout": _tail_lines(result.output) if result.output else None,
+        "stderr": None,
+        "returncode": result.exit_code,
+        "events": result.events,
+        "started_at": started_at,
+        "finished_at": time.time(),
+    }
+
+
+def _run_sync(
+    action: str,
+    project_name: str,
+    extra_env: Optional[dict] = None,
+    config_path: Optional[Path] = None,
+    timeout: int = 120,
+) -> dict:
+    if SYNC_INPROCESS:
+        return _run_sync_inprocess(action, project_name, extra_env=extra_env, config_path=config_path)
+    return _run_sync_subprocess(action, project_name, extra_env=extra_env, config_path=config_path,
+                                timeout=timeout)
 
 
 def push_project(
@@ -179,7 +296,7 @@ def push_project(
     config_path: Optional[Path] = None,
     timeout: int = 120,
 ) -> dict:
-    return _run_sync_subprocess("push", project_name, config_path=config_path, timeout=timeout)
+    return _run_sync("push", project_name, config_path=config_path, timeout=timeout)
 
 
 def pull_project(
@@ -191,7 +308,15 @@ def pull_project(
     extra_env = {}
     if no_restart_worker:
         extra_env["MEMBRIDGE_NO_RESTART_WORKER"] = "1"
-    return _run_sync_subprocess("pull", project_name, extra_env=extra_env, config_path=config_path, timeout=timeout)
+    return _run_sync("pull", project_name, extra_env=extra_env, config_path=config_path, timeout=timeout)
+
+
+def prefetch_project(
+    project_name: str,
+    config_path: Optional[Path] = None,
+    timeout: int = 120,
+) -> dict:
+    return _run_sync("prefetch", project_name, config_path=config_path, timeout=timeout)
 
 
 def doctor_project(
@@ -199,4 +324,4 @@ def doctor_project(
     config_path: Optional[Path] = None,
     timeout: int = 120,
 ) -> dict:
-    return _run_sync_subprocess("doctor", project_name, config_path=config_path, timeout=timeout)
+    return _run_sync("doctor", project_name, config_path=config_path, timeout=timeout)
@@ -49,7 +49,12 @@ def check_claude_mem_plugin() -> dict:
     }
 
 
-def check_sqlite_db() -> dict:
+def check_sqlite_db(full: bool = False) -> dict:
+    """Check the memory DB with PRAGMA quick_check (integrity_check if `full`).
+
+    The last full check recorded by the sync engine (``<db>.integrity.json``)
+    is reported alongside, so coverage is visible without paying for it here.
+    """
     db_path = Path(os.path.expanduser("~/.claude-mem/claude-mem.db"))
     config_env = Path(os.environ.get("MEMBRIDGE_CONFIG_ENV", os.path.expanduser("~/.claude-mem-minio/config.env")))
     if config_env.exists():
@@ -70,18 +75,30 @@ def check_sqlite_db() -> dict:
 
     try:
         conn = sqlite3.connect(str(db_path))
-        integrity = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        check = "integrity_check" if full else "quick_check"
+        integrity = conn.execute(f"PRAGMA {check}").fetchone()[0]
         tables = conn.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchall()
         size = db_path.stat().st_size
         conn.close()
+        last_full = {}
+        try:
+            last_full = json.loads(Path(f"{db_path}.integrity.json").read_text())
+        except (OSError, ValueError):
+            pass
+        last_full_at = last_full.get("last_full_at")
+        last_full_str = time.strftime("%Y-%m-%d %H:%M", time.localtime(last_full_at)) if last_full_at else "never"
         return {
             "name": "sqlite_db",
             "ok": integrity == "ok",
-            "detail": f"size={size} bytes, tables={len(tables)}, integrity={integrity}",
+            "detail": f"size={size} bytes, tables={len(tables)}, {check}={integrity}, "
+                      f"last_full_check={last_full_str}",
             "path": str(db_path),
             "size": size,
             "tables": len(tables),
             "integrity": integrity,
+            "integrity_check": check,
+            "last_full_check_at": last_full_at,
+            "last_full_check_result": last_full.get("last_full_result"),
         }
     except Exception as e:
         return {
@@ -108,6 +108,13 @@ def finish_job(job_id: str, status: str, detail: str | None = None,
     conn.commit()
 
 
+def update_job(job_id: str, status: str, detail: str | None = None) -> None:
+    """Record progress of an unfinished job (e.g. running on the agent)."""
+    conn = get_conn()
+    conn.execute("UPDATE jobs SET status=?, detail=? WHERE id=?", (status, detail, job_id))
+    conn.commit()
+
+
 def get_job(job_id: str) -> Job | None:
     conn = get_conn()
     row = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
@@ -1,5 +1,6 @@
 """Membridge Control Plane — FastAPI server for managing projects and agents."""
 
+import asyncio
 import hashlib
 import logging
 import os
@@ -8,7 +9,7 @@ from enum import Enum
 from typing import Optional
 
 import httpx
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Response
 from fastapi.responses import RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from pathlib import Path
@@ -16,7 +17,7 @@ from pydantic import BaseModel, Field
 
 from server.auth import AdminAuthMiddleware
 from server.logging_config import RequestIDMiddleware, setup_logging, request_id_var
-from server.jobs import Job, create_job, finish_job, get_job, list_jobs
+from server.jobs import Job, create_job, finish_job, get_job, list_jobs, update_job
 
 setup_logging("membridge-server")
 logger = logging.getLogger("membridge.server")
@@ -81,6 +82,7 @@ class SyncResponse(BaseModel):
     canonical_id: str
     detail: str
     job_id: Optional[str] = None
+    agent_job_id: Optional[str] = None  # stream its output from the agent: GET /jobs/{id}/log
 
 
 _projects: dict[str, Project] = {}
@@ -93,6 +95,15 @@ _leadership_pref: dict[str, str] = {}  # canonical_id → preferred primary_node
 # Projects discovered via agent heartbeats (canonical_id → ProjectHeartbeatRecord)
 _heartbeat_projects: dict[str, dict] = {}
 
+# Fleet convergence (canonical_id → recent converged generations, newest last)
+_convergence_history: dict[str, list[dict]] = {}
+CONVERGENCE_HISTORY = 20
+
+# Agent sync jobs: poll GET /jobs/{id} on the agent until the job finishes
+AGENT_JOB_POLL_SECONDS = float(os.environ.get("MEMBRIDGE_AGENT_JOB_POLL_SECONDS", "2"))
+AGENT_JOB_TIMEOUT_SECONDS = float(os.environ.get("MEMBRIDGE_AGENT_JOB_TIMEOUT_SECONDS", "900"))
+_job_followers: set[asyncio.Task] = set()
+
 
 class NodeHeartbeat(BaseModel):
     node_id: str
@@ -104,6 +115,12 @@ class NodeHeartbeat(BaseModel):
     # Optional extensions (added in v0.4):
     project_id: Optional[str] = None       # human-readable name for this canonical_id
     agent_version: Optional[str] = None    # agent self-reported version
+    # Head watcher (agent MEMBRIDGE_HEAD_WATCH=1):
+    head_generation: Optional[int] = None  # newest remote generation the node has seen
+    head_pushed_at: Optional[float] = None  # when that generation was pushed
+    synced_generation: Optional[int] = None  # generation the node's live DB holds
+    synced_at: Optional[float] = None
+    staged_generation: Optional[int] = None  # generation prefetched next to the DB, not yet pulled
 
 
 class NodeRecord(BaseModel):
@@ -116,6 +133,48 @@ class NodeRecord(BaseModel):
     ip_addrs: list[str] = []
     registered_at: float
     project_id: Optional[str] = None       # set when agent provides it
+    head_generation: Optional[int] = None
+    head_pushed_at: Optional[float] = None
+    synced_generation: Optional[int] = None
+    synced_at: Optional[float] = None
+    staged_generation: Optional[int] = None
+    last_heartbeat: Optional[float] = None  # last time the node sent any heartbeat
+
+
+class ProjectHeartbeatDelta(BaseModel):
+    """Per-project part of a batched heartbeat; omitted fields are unchanged."""
+    model_config = {"extra": "ignore"}
+
+    canonical_id: str
+    project_id: Optional[str] = None
+    obs_count: Optional[int] = None
+    db_sha: Optional[str] = None
+    last_seen: Optional[float] = None
+    head_generation: Optional[int] = None
+    head_pushed_at: Optional[float] = None
+    synced_generation: Optional[int] = None
+    synced_at: Optional[float] = None
+    staged_generation: Optional[int] = None
+
+
+class NodeHeartbeatBatch(BaseModel):
+    """All projects of a node in one request, as a delta against `base_seq`.
+
+    `base_seq` is the last `seq` the server acknowledged to this node; null
+    means a full snapshot. If it does not match the server's record (server
+    restart, lost response) nothing is applied and the reply asks the agent
+    to resend a full snapshot.
+    """
+    node_id: str
+    seq: int
+    base_seq: Optional[int] = None
+    ip_addrs: Optional[list[str]] = None     # omitted: unchanged
+    agent_version: Optional[str] = None
+    projects: list[ProjectHeartbeatDelta] = []
+
+
+# Last acknowledged batch seq and node-level fields, per node_id
+_heartbeat_acks: dict[str, dict] = {}
 
 
 class LeaseSelectRequest(BaseModel):
@@ -240,52 +299,78 @@ async def _call_agent(agent: Agent, method: str, path: str, json_body: dict | No
             raise HTTPException(status_code=502, detail=f"Agent communication error: {str(e)}")
 
 
-@app.post("/sync/pull", response_model=SyncResponse)
-async def sync_pull(body: SyncRequest):
+def _finish_from_agent(job_id: str, result: dict) -> None:
+    finish_job(job_id, "completed" if result.get("ok") else "failed",
+               detail=result.get("detail"), stdout=result.get("stdout"),
+               stderr=result.get("stderr"), returncode=result.get("returncode"),
+               dryrun=result.get("dryrun", False))
+
+
+async def _follow_agent_job(job_id: str, agent: Agent, agent_job_id: str) -> None:
+    """Poll the agent's job until it finishes and copy the result into our job."""
+    deadline = time.time() + AGENT_JOB_TIMEOUT_SECONDS
+    last_error = None
+    while time.time() < deadline:
+        await asyncio.sleep(AGENT_JOB_POLL_SECONDS)
+        try:
+            state = await _call_agent(agent, "GET", f"/jobs/{agent_job_id}")
+        except HTTPException as e:
+            last_error = e.detail  # agent briefly unreachable: keep polling
+            continue
+        if state.get("finished_at") is None:
+            update_job(job_id, state.get("status", "running"), detail=f"agent job {agent_job_id}")
+            continue
+        if state.get("result"):
+            _finish_from_agent(job_id, state["result"])
+        else:
+            finish_job(job_id, "error", detail=state.get("detail"))
+        agent.status = AgentStatus.online
+        return
+    finish_job(job_id, "error", detail=f"agent job {agent_job_id} not finished after "
+                                       f"{AGENT_JOB_TIMEOUT_SECONDS:.0f}s ({last_error or 'still running'})")
+    agent.status = AgentStatus.error
+
+
+async def _start_agent_sync(action: str, body: SyncRequest, response: Response) -> SyncResponse:
     if body.project not in _projects:
         raise HTTPException(status_code=404, detail=f"Project '{body.project}' not found")
     if body.agent not in _agents:
         raise HTTPException(status_code=404, detail=f"Agent '{body.agent}' not found")
 
     cid = canonical_id(body.project)
-    job = create_job("pull", body.project, cid, agent=body.agent, request_id=request_id_var.get("-"))
+    job = create_job(action, body.project, cid, agent=body.agent, request_id=request_id_var.get("-"))
     agent = _agents[body.agent]
     agent.status = AgentStatus.syncing
     try:
-        result = await _call_agent(agent, "POST", "/sync/pull", {"project": body.project})
-        finish_job(job.id, "completed" if result.get("ok") else "failed",
-                   detail=result.get("detail"), stdout=result.get("stdout"),
-                   stderr=result.get("stderr"), returncode=result.get("returncode"),
-                   dryrun=result.get("dryrun", False))
-        return SyncResponse(ok=result.get("ok", False), project=body.project, agent=body.agent,
-                            canonical_id=cid, detail=result.get("detail", "pull completed"), job_id=job.id)
+        result = await _call_agent(agent, "POST", f"/sync/{action}", {"project": body.project, "wait": False})
     except Exception as e:
         finish_job(job.id, "error", detail=str(e))
         raise
+    agent_job_id = result.get("job_id")
+    if not agent_job_id:
+        # Older agent: the sync already ran inside the request
+        _finish_from_agent(job.id, result)
+        response.status_code = 200
+        return SyncResponse(ok=result.get("ok", False), project=body.project, agent=body.agent,
+                            canonical_id=cid, detail=result.get("detail", f"{action} completed"), job_id=job.id)
 
+    update_job(job.id, "running", detail=f"agent job {agent_job_id}")
+    task = asyncio.create_task(_follow_agent_job(job.id, agent, agent_job_id))
+    _job_followers.add(task)
+    task.add_done_callback(_job_followers.discard)
+    return SyncResponse(ok=True, project=body.project, agent=body.agent, canonical_id=cid,
+                        detail=f"{action} started on agent (job {agent_job_id}); poll /jobs/{job.id}",
+                        job_id=job.id, agent_job_id=agent_job_id)
 
-@app.post("/sync/push", response_model=SyncResponse)
-async def sync_push(body: SyncRequest):
-    if body.project not in _projects:
-        raise HTTPException(status_code=404, detail=f"Project '{body.project}' not found")
-    if body.agent not in _agents:
-        raise HTTPException(status_code=404, detail=f"Agent '{body.agent}' not found")
 
-    cid = canonical_id(body.project)
-    job = create_job("push", body.project, cid, agent=body.agent, request_id=request_id_var.get("-"))
-    agent = _agents[body.agent]
-    agent.status = AgentStatus.syncing
-    try:
-        result = await _call_agent(agent, "POST", "/sync/push", {"project": body.project})
-        finish_job(job.id, "completed" if result.get("ok") else "failed",
-                   detail=result.get("detail"), stdout=result.get("stdout"),
-                   stderr=result.get("stderr"), returncode=result.get("returncode"),
-                   dryrun=result.get("dryrun", False))
-        return SyncResponse(ok=result.get("ok", False), project=body.project, agent=body.agent,
-                            canonical_id=cid, detail=result.get("detail", "push completed"), job_id=job.id)
-    except Exception as e:
-        finish_job(job.id, "error", detail=str(e))
-        raise
+@app.post("/sync/pull", response_model=SyncResponse, status_code=202)
+async def sync_pull(body: SyncRequest, response: Response):
+    return await _start_agent_sync("pull", body, response)
+
+
+@app.post("/sync/push", response_model=SyncResponse, status_code=202)
+async def sync_push(body: SyncRequest, response: Response):
+    return await _start_agent_sync("push", body, response)
 
 
 @app.get("/jobs", response_model=list[Job])
@@ -304,7 +389,45 @@ async def get_job_endpoint(job_id: str):
 @app.post("/agent/heartbeat")
 async def agent_heartbeat(body: NodeHeartbeat):
     """Register a node heartbeat. Returns the node's current role."""
+    role = _apply_heartbeat(body, time.time())
+    return {"ok": True, "role": role, "canonical_id": body.canonical_id}
+
+
+@app.post("/agent/heartbeat/batch")
+async def agent_heartbeat_batch(body: NodeHeartbeatBatch):
+    """Register all projects of a node at once (delta-encoded). Returns roles per project."""
     now = time.time()
+    ack = _heartbeat_acks.get(body.node_id)
+    if body.base_seq is not None and (ack is None or ack["seq"] != body.base_seq):
+        logger.info("heartbeat batch: node=%s base_seq=%s unknown, requesting resync", body.node_id, body.base_seq)
+        return {"ok": False, "resync": True, "ack": ack["seq"] if ack else None}
+
+    node = {
+        "ip_addrs": body.ip_addrs if body.ip_addrs is not None else (ack or {}).get("ip_addrs", []),
+        "agent_version": body.agent_version or (ack or {}).get("agent_version"),
+    }
+    for delta in body.projects:
+        fields = delta.model_dump(exclude_unset=True)
+        existing = _nodes.get(f"{delta.canonical_id}:{body.node_id}")
+        if body.base_seq is not None and existing is not None:
+            prev = existing.model_dump(include=set(ProjectHeartbeatDelta.model_fields))
+            fields = {**prev, **fields}
+        _apply_heartbeat(NodeHeartbeat(node_id=body.node_id, **node, **fields), now)
+
+    roles = {}
+    for n in _nodes.values():
+        if n.node_id == body.node_id:
+            n.last_heartbeat = now
+            if body.ip_addrs is not None:
+                n.ip_addrs = body.ip_addrs
+            if n.project_id and n.canonical_id in _heartbeat_projects:
+                _heartbeat_projects[n.canonical_id]["last_seen"] = now
+            roles[n.canonical_id] = n.role
+    _heartbeat_acks[body.node_id] = {"seq": body.seq, **node}
+    return {"ok": True, "ack": body.seq, "roles": roles}
+
+
+def _apply_heartbeat(body: NodeHeartbeat, now: float) -> str:
     key = f"{body.canonical_id}:{body.node_id}"
     pref_primary = _leadership_pref.get(body.canonical_id, "")
     role = "unknown"
@@ -321,7 +444,14 @@ async def agent_heartbeat(body: NodeHeartbeat):
         ip_addrs=body.ip_addrs,
         registered_at=existing.registered_at if existing else now,
         project_id=body.project_id,
+        head_generation=body.head_generation,
+        head_pushed_at=body.head_pushed_at,
+        synced_generation=body.synced_generation,
+        synced_at=body.synced_at,
+        staged_generation=body.staged_generation,
+        last_heartbeat=now,
     )
+    _record_convergence(body.canonical_id)
     # Register project from heartbeat if agent provided a project_id
     if body.project_id:
         _heartbeat_projects[body.canonical_id] = {
@@ -334,7 +464,7 @@ async def agent_heartbeat(body: NodeHeartbeat):
         "heartbeat: node=%s canonical_id=%s project=%s role=%s obs=%s",
         body.node_id, body.canonical_id, body.project_id or "-", role, body.obs_count,
     )
-    return {"ok": True, "role": role, "canonical_id": body.canonical_id}
+    return role
 
 
 @app.get("/projects/{cid}/nodes", response_model=list[NodeRecord])
@@ -387,6 +517,71 @@ async def select_leadership(cid: str, body: LeaseSelectRequest):
     }
 
 
+def _project_convergence(cid: str) -> dict:
+    """Time from the newest push until every reporting node holds that generation."""
+    nodes = [n for n in _nodes.values() if n.canonical_id == cid]
+    reporting = [n for n in nodes if n.head_generation is not None]
+    if not reporting:
+        return {"canonical_id": cid, "generation": None, "converged": None, "nodes": []}
+    head = max(reporting, key=lambda n: n.head_generation)
+    current = [n for n in reporting if (n.synced_generation or 0) >= head.head_generation]
+    current_ids = {n.node_id for n in current}
+    converged = len(current) == len(reporting)
+    seconds = None
+    if converged and head.head_pushed_at:
+        seconds = round(max(n.synced_at or head.head_pushed_at for n in current) - head.head_pushed_at, 1)
+    return {
+        "canonical_id": cid,
+        "generation": head.head_generation,
+        "pushed_at": head.head_pushed_at,
+        "converged": converged,
+        "time_to_convergence_seconds": seconds,
+        "nodes": [
+            {
+                "node_id": n.node_id,
+                "synced_generation": n.synced_generation,
+                "staged_generation": n.staged_generation,
+                "current": n.node_id in current_ids if n.head_generation is not None else None,
+                "lag_seconds": (
+                    round(n.synced_at - head.head_pushed_at, 1)
+                    if n.node_id in current_ids and n.synced_at and head.head_pushed_at else None
+                ),
+            }
+            for n in nodes
+        ],
+    }
+
+
+def _record_convergence(cid: str) -> None:
+    state = _project_convergence(cid)
+    if not state["converged"] or state["time_to_convergence_seconds"] is None:
+        return
+    history = _convergence_history.setdefault(cid, [])
+    entry = {"generation": state["generation"], "seconds": state["time_to_convergence_seconds"]}
+    if history and history[-1]["generation"] == entry["generation"]:
+        # A slower node reported in after the others: the generation converged later
+        if history[-1] == entry:
+            return
+        history[-1] = entry
+    else:
+        history.append(entry)
+        del history[:-CONVERGENCE_HISTORY]
+    logger.info(
+        "convergence: canonical_id=%s generation=%s %.1fs",
+        cid, state["generation"], state["time_to_convergence_seconds"],
+    )
+
+
+@app.get("/projects/{cid}/convergence")
+async def get_convergence(cid: str):
+    """Fleet convergence for the newest generation, plus recent history for tuning."""
+    state = _project_convergence(cid)
+    recent = _convergence_history.get(cid, [])
+    state["recent"] = recent
+    state["recent_max_seconds"] = max((h["seconds"] for h in recent), default=None)
+    return state
+
+
 @app.get("/ui", include_in_schema=False)
 async def ui_redirect():
     """Redirect browser to the web UI."""
@@ -1,7 +1,12 @@
 #!/usr/bin/env python3
 """MinIO pull/push sync for claude-mem SQLite DB."""
 
+import argparse
+import builtins
+import contextlib
+import functools
 import hashlib
+import io
 import json
 import os
 import platform
@@ -11,13 +16,27 @@ import sqlite3
 import subprocess
 import sys
 import tempfile
+import threading
 import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from urllib.request import urlopen
 
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.config import Config
 
+try:
+    import fcntl
+except ImportError:  # non-POSIX — backups fall back to chunk dedup
+    fcntl = None
+
+try:
+    import zstandard
+except ImportError:  # optional — SNAPSHOT_COMPRESSION=zstd falls back to gzip
+    zstandard = None
+
 LOCK_TTL_SECONDS = int(os.getenv("LOCK_TTL_SECONDS", "7200"))
 FORCE_PUSH = os.getenv("FORCE_PUSH", "0") == "1"
 # Grace period (seconds) after TTL before a foreign lock is stolen.
@@ -26,6 +45,9 @@ STALE_LOCK_GRACE_SECONDS = int(os.getenv("STALE_LOCK_GRACE_SECONDS", "60"))
 # Pull-overwrite backup retention
 PULL_BACKUP_MAX_DAYS = int(os.getenv("PULL_BACKUP_MAX_DAYS", "14"))
 PULL_BACKUP_MAX_COUNT = int(os.getenv("PULL_BACKUP_MAX_COUNT", "50"))
+# "dedup": content-addressed store (reflink clone, else page-aligned chunks);
+# "copy": legacy full shutil.copy2 per backup
+PULL_BACKUP_STORE = os.getenv("PULL_BACKUP_STORE", "dedup")
 
 # Leadership / Primary-Secondary constants
 NODE_ID = os.getenv("MEMBRIDGE_NODE_ID", platform.node())
@@ -35,9 +57,100 @@ ALLOW_PRIMARY_PULL_OVERRIDE = os.getenv("ALLOW_PRIMARY_PULL_OVERRIDE", "0") == "
 LEADERSHIP_ENABLED = os.getenv("LEADERSHIP_ENABLED", "1") == "1"
 LEADERSHIP_LEASE_SECONDS = int(os.getenv("LEADERSHIP_LEASE_SECONDS", "3600"))
 
+# Sidecar digest cache next to CLAUDE_MEM_DB: skip re-hashing an unchanged DB
+DIGEST_CACHE_ENABLED = os.getenv("DIGEST_CACHE", "1") == "1"
+
+# Push pre-check: skip snapshot + integrity check when neither the DB file,
+# its header change counter nor its WAL changed since the last push
+PUSH_PRECHECK = os.getenv("PUSH_PRECHECK", "1") == "1"
+
+# Tiered integrity checks: PRAGMA quick_check on every push, the full
+# integrity_check every N checks or once the last full one is too old
+INTEGRITY_FULL_EVERY = int(os.getenv("INTEGRITY_FULL_EVERY", "20"))
+INTEGRITY_FULL_MAX_AGE_HOURS = float(os.getenv("INTEGRITY_FULL_MAX_AGE_HOURS", "24"))
+
+# Machine-readable progress: one JSON line per phase/decision/digest, written
+# to "stdout", "fd:N" or a file path (appended).  Empty disables events.
+SYNC_EVENTS = os.getenv("SYNC_EVENTS", "")
+
+# ETag-validated cache for small metadata objects (sha256, manifest, lease, lock)
+META_CACHE_ENABLED = os.getenv("META_CACHE", "1") == "1"
+META_CACHE_PATH = os.getenv("META_CACHE_PATH", "~/.claude-mem-minio/meta-cache.json")
+META_CACHE_SUFFIXES = (
+    "/claude-mem.db.sha256",
+    "/manifest.json",
+    "/leadership/lease.json",
+    "/locks/active.lock",
+)
+
+# Push snapshot mode: "online" copies the DB while the worker keeps running
+# (WAL read transaction or paged backup API); "stop" is the legacy
+# stop-worker → VACUUM INTO → start-worker sequence.
+SNAPSHOT_MODE = os.getenv("SNAPSHOT_MODE", "online")
+SNAPSHOT_BACKUP_PAGES = int(os.getenv("SNAPSHOT_BACKUP_PAGES", "1024"))
+
+# Chunked (content-addressed) sync — push uploads only new chunks, pull
+# fetches only chunks the local DB lacks.  Pull follows the remote manifest
+# format regardless of this flag; it only selects the push format.
+CHUNKED_SYNC = os.getenv("CHUNKED_SYNC", "0") == "1"
+CHUNK_TARGET_BYTES = int(os.getenv("CHUNK_TARGET_BYTES", str(1024 * 1024)))
+CHUNK_MIN_BYTES = int(os.getenv("CHUNK_MIN_BYTES", str(256 * 1024)))
+CHUNK_MAX_BYTES = int(os.getenv("CHUNK_MAX_BYTES", str(4 * 1024 * 1024)))
+# Without generations, a chunk no head references is deleted only after it has
+# been unreferenced this long, so a pull or prefetch still reading an older
+# manifest can finish.  0 deletes on the next push.
+CHUNK_GC_GRACE_SECONDS = int(os.getenv("CHUNK_GC_GRACE_SECONDS", "3600"))
+
+# Compressed full-object snapshots: "none", "gzip" or "zstd" (needs the
+# zstandard package).  Applies to the full-object format only; chunked pushes
+# stay uncompressed.  Pull follows the codec recorded in the manifest.
+SNAPSHOT_COMPRESSION = os.getenv("SNAPSHOT_COMPRESSION", "none").lower()
+SNAPSHOT_COMPRESSION_LEVEL = os.getenv("SNAPSHOT_COMPRESSION_LEVEL", "")
+
+# Incremental (row-level changelog) push for the append-mostly tables.  A
+# push whose only changes are appended rows uploads a small delta segment;
+# anything else — or every DELTA_COMPACT_EVERY deltas — ships a full snapshot.
+INCREMENTAL_SYNC = os.getenv("INCREMENTAL_SYNC", "0") == "1"
+INCREMENTAL_TABLES = ("observations", "session_summaries", "user_prompts")
+DELTA_COMPACT_EVERY = int(os.getenv("DELTA_COMPACT_EVERY", "20"))
+
+# Generation-numbered remote snapshots (restore points).  Every full push
+# records its chunk list under generations/; chunks are shared between
+# generations and pruned by the hourly/daily/weekly retention below.
+SNAPSHOT_GENERATIONS = os.getenv("SNAPSHOT_GENERATIONS", "0") == "1"
+GENERATIONS_KEEP_LAST = int(os.getenv("GENERATIONS_KEEP_LAST", "3"))
+GENERATIONS_KEEP_HOURLY = int(os.getenv("GENERATIONS_KEEP_HOURLY", "24"))
+GENERATIONS_KEEP_DAILY = int(os.getenv("GENERATIONS_KEEP_DAILY", "7"))
+GENERATIONS_KEEP_WEEKLY = int(os.getenv("GENERATIONS_KEEP_WEEKLY", "4"))
+
+# Vector DB (Chroma) sync: the vector-db directory travels with claude-mem.db
+# as a separately hashed, chunked object set in the same manifest generation.
+VECTOR_SYNC = os.getenv("VECTOR_SYNC", "0") == "1"
+VECTOR_DB_DIR = os.getenv("VECTOR_DB_DIR", "~/.claude-mem/vector-db")
+
+# S3 transfer tuning — multipart concurrency/part size for upload_file and
+# download_fileobj, plus client pool size, retry policy and timeouts.
+# Pi-class nodes usually want fewer threads and smaller parts than x86 hosts.
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "4"))
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "8"))
+S3_MULTIPART_CHUNKSIZE_MB = int(os.getenv("S3_MULTIPART_CHUNKSIZE_MB", "8"))
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "10"))
+S3_RETRY_MODE = os.getenv("S3_RETRY_MODE", "adaptive")
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", "5"))
+S3_CONNECT_TIMEOUT = int(os.getenv("S3_CONNECT_TIMEOUT", "10"))
+S3_READ_TIMEOUT = int(os.getenv("S3_READ_TIMEOUT", "60"))
+# Cap on multipart transfer bandwidth (MB/s, 0 = unlimited); in batch runs
+# projects transfer one at a time, so this is also the batch-wide cap.
+S3_MAX_BANDWIDTH_MBPS = float(os.getenv("S3_MAX_BANDWIDTH_MBPS", "0"))
+
+# push_many / pull_many: concurrent manifest + local checks across projects
+BATCH_CHECK_CONCURRENCY = int(os.getenv("BATCH_CHECK_CONCURRENCY", "8"))
+
 
 def load_config():
-    """Load config from environment variables."""
+    """Load config from environment variables (or the running SyncEngine's cfg)."""
+    if _ENGINE_CFG is not None:
+        return dict(_ENGINE_CFG)
     required = [
         "MINIO_ENDPOINT",
         "MINIO_ACCESS_KEY",
@@ -59,6 +172,22 @@ def load_config():
 
 NO_RESTART_WORKER = os.getenv("MEMBRIDGE_NO_RESTART_WORKER", "0") == "1"
 
+# Set by SyncEngine for the duration of an in-process run
+_ENGINE_CFG = None
+_ENGINE_S3 = None
+_ENGINE_OUT = None
+
+
+def print(*args, **kwargs):
+    """Report line: into the running SyncEngine's buffer, else to stdout.
+
+    Module-local on purpose — no process-wide stdout redirect, so other
+    threads of a host process (the agent) keep their own output.
+    """
+    if _ENGINE_OUT is not None and "file" not in kwargs:
+        kwargs["file"] = _ENGINE_OUT
+    builtins.print(*args, **kwargs)
+
 
 def resolve_canonical_id(cfg):
     """Return canonical project ID — always sha256(project_name)[:16]."""
@@ -69,22 +198,771 @@ def sha256_file(path):
     """Compute SHA256 of a file."""
     h = hashlib.sha256()
     with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
             h.update(chunk)
     return h.hexdigest()
 
 
+def file_identity(path):
+    """Return (inode, size, mtime_ns) — changes whenever the file is rewritten."""
+    st = os.stat(path)
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+def sqlite_change_counter(path):
+    """Read the SQLite file change counter (header bytes 24..27). None if not SQLite."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(28)
+        if header[:16] == b"SQLite format 3\x00" and len(header) == 28:
+            return int.from_bytes(header[24:28], "big")
+    except OSError:
+        pass
+    return None
+
+
+def get_digest_cache_path(db_path):
+    """Return the sidecar digest cache path for a DB file."""
+    return f"{db_path}.digest.json"
+
+
+def write_digest_cache(db_path, sha, identity=None):
+    """Record the SHA256 of `db_path` together with its current file identity."""
+    if not DIGEST_CACHE_ENABLED:
+        return
+    try:
+        ino, size, mtime_ns = identity or file_identity(db_path)
+        entry = {
+            "inode": ino,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "change_counter": sqlite_change_counter(db_path),
+            "sha256": sha,
+            "computed_at": int(time.time()),
+        }
+        cache_path = get_digest_cache_path(db_path)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass
+
+
+def peek_cached_sha256(db_path, enabled=None):
+    """Return (sha256, identity) from the sidecar cache if still valid, else (None, None).
+
+    The sidecar cache is trusted only while the file's (inode, size,
+    mtime_ns) and the SQLite header change counter are all unchanged —
+    any rewrite, commit or replace invalidates it.  In WAL mode commits
+    land in the -wal file and the main file (which is what gets hashed)
+    only changes on checkpoint, which updates mtime.  `enabled` defaults
+    to DIGEST_CACHE_ENABLED.
+    """
+    enabled = DIGEST_CACHE_ENABLED if enabled is None else enabled
+    if enabled:
+        try:
+            with open(get_digest_cache_path(db_path)) as f:
+                entry = json.load(f)
+            identity = file_identity(db_path)
+            if ((entry.get("inode"), entry.get("size"), entry.get("mtime_ns")) == identity
+                    and entry.get("change_counter") == sqlite_change_counter(db_path)
+                    and entry.get("sha256")):
+                return entry["sha256"], identity
+        except (OSError, ValueError):
+            pass
+    return None, None
+
+
+def cached_sha256(db_path):
+    """Return (sha256, cache_hit) for `db_path`, hashing only on a cache miss."""
+    sha, _ = peek_cached_sha256(db_path)
+    if sha:
+        return sha, True
+    identity = file_identity(db_path)
+    sha = sha256_file(db_path)
+    # Only cache if the file did not change while it was being read
+    if file_identity(db_path) == identity:
+        write_digest_cache(db_path, sha, identity)
+    return sha, False
+
+
+def db_fingerprint(db_path):
+    """Cheap change signature of a live DB: file identity, change counter, WAL stat.
+
+    In WAL mode commits only grow (or restart) the -wal file, so its size
+    and mtime are part of the signature; checkpoints rewrite the main file.
+    """
+    try:
+        st = os.stat(db_path + "-wal")
+        wal = [st.st_size, st.st_mtime_ns]
+    except OSError:
+        wal = None
+    return {
+        "identity": list(file_identity(db_path)),
+        "change_counter": sqlite_change_counter(db_path),
+        "wal": wal,
+    }
+
+
+def dir_fingerprint(path):
+    """SHA256 over (path, inode, size, mtime_ns) of every file below `path`, WAL files included."""
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs.sort()
+        for name in sorted(files):
+            full = os.path.join(root, name)
+            try:
+                h.update(f"{os.path.relpath(full, path)} {file_identity(full)}\n".encode())
+            except OSError:
+                continue
+    return h.hexdigest()
+
+
+def get_push_state_path(db_path):
+    """Sidecar recording the DB fingerprint at the last successful push.
+
+    Several projects can share one CLAUDE_MEM_DB, so it maps each
+    canonical_id to the state of that project's last push.
+    """
+    return f"{db_path}.push-state.json"
+
+
+def _read_push_states(db_path):
+    try:
+        with open(get_push_state_path(db_path)) as f:
+            states = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(states, dict):
+        return {}
+    if "canonical_id" in states:  # single-project sidecar from an earlier engine
+        return {states["canonical_id"]: states}
+    return states
+
+
+def read_push_state(db_path, canonical_id):
+    return _read_push_states(db_path).get(canonical_id)
+
+
+def write_push_state(db_path, canonical_id, state):
+    path = get_push_state_path(db_path)
+    states = _read_push_states(db_path)
+    states[canonical_id] = dict(state, canonical_id=canonical_id)
+    try:
+        with open(path + ".tmp", "w") as f:
+            json.dump(states, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+
+
+def get_integrity_state_path(db_path):
+    """Sidecar recording the last full integrity check of a DB."""
+    return f"{db_path}.integrity.json"
+
+
+def read_integrity_state(db_path):
+    try:
+        with open(get_integrity_state_path(db_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def full_check_due(state, now=None):
+    """Reason a full integrity_check is due, or None if quick_check suffices."""
+    now = time.time() if now is None else now
+    if not state.get("last_full_at"):
+        return "no full check recorded"
+    if state.get("last_full_result") != "ok":
+        return "last full check failed"
+    if state.get("quick_checks_since_full", 0) >= INTEGRITY_FULL_EVERY:
+        return f"{state['quick_checks_since_full']} quick checks since the last full one"
+    age_hours = (now - state["last_full_at"]) / 3600
+    if age_hours >= INTEGRITY_FULL_MAX_AGE_HOURS:
+        return f"last full check {age_hours:.0f}h ago"
+    return None
+
+
+def run_integrity_check(conn, full):
+    """Run integrity_check (full) or quick_check; returns "ok" or the problems found."""
+    pragma = "integrity_check" if full else "quick_check"
+    rows = conn.execute(f"PRAGMA {pragma}").fetchall()
+    if rows == [("ok",)]:
+        return "ok"
+    return "; ".join(r[0] for r in rows[:10])
+
+
+def record_integrity_check(db_path, state, full, result):
+    """Update and persist the integrity state after a check. Returns the new state."""
+    state = dict(state)
+    now = int(time.time())
+    if full:
+        state.update(last_full_at=now, last_full_result=result, quick_checks_since_full=0)
+    else:
+        state.update(last_quick_at=now, last_quick_result=result,
+                     quick_checks_since_full=state.get("quick_checks_since_full", 0) + 1)
+    path = get_integrity_state_path(db_path)
+    try:
+        with open(path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
+    return state
+
+
+def integrity_summary(state, level=None, result=None):
+    """Manifest/report view of the integrity coverage."""
+    summary = {
+        "last_full_at": (datetime.fromtimestamp(state["last_full_at"], timezone.utc).isoformat()
+                         if state.get("last_full_at") else None),
+        "last_full_result": state.get("last_full_result"),
+        "quick_checks_since_full": state.get("quick_checks_since_full", 0),
+    }
+    if level:
+        summary.update(check=level, result=result)
+    return summary
+
+
+def check_push_state(s3, bucket, prefix, canonical_id, state, fingerprint, vector_fp):
+    """Compare the last push with the live DB and the remote head.
+
+    Returns None if the local DB (or vector DB) changed since `state` was
+    recorded; otherwise True if the remote head is still that push, False
+    if it moved.  Costs one manifest GET, and only when nothing changed locally.
+    """
+    if not (state and state.get("canonical_id") == canonical_id
+            and state.get("fingerprint") == fingerprint
+            and state.get("vector_fingerprint") == vector_fp):
+        return None
+    try:
+        head, head_sha = get_remote_head(s3, bucket, prefix)
+        head_sha = (head or {}).get("head_sha256") or head_sha
+    except Exception:
+        return False
+    return (head_sha == state.get("sha256")
+            and ((head or {}).get("vector") or {}).get("sha256") == state.get("vector_sha256"))
+
+
+class HashingWriter:
+    """File wrapper that hashes bytes as they are written.
+
+    Reports itself as non-seekable so s3transfer delivers multipart
+    downloads strictly in order, which keeps the running digest valid.
+    """
+
+    def __init__(self, f):
+        self._f = f
+        self._h = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self._h.update(data)
+        self.size += len(data)
+        return self._f.write(data)
+
+    def seekable(self):
+        return False
+
+    def hexdigest(self):
+        return self._h.hexdigest()
+
+
+def download_and_hash(s3, bucket, key, out_path, codec=None):
+    """Download an object to `out_path`, hashing it in the same pass.
+
+    With `codec` set the object is decompressed on the fly, so the digest
+    covers the decompressed bytes.  Returns (sha256, size) of the bytes written.
+    """
+    with open(out_path, "wb") as f:
+        writer = HashingWriter(f)
+        sink = DecompressingWriter(writer, codec) if codec else writer
+        s3.download_fileobj(bucket, key, sink, Config=get_transfer_config())
+        if codec:
+            sink.close()
+    return writer.hexdigest(), writer.size
+
+
+# ─────────────────────────────────────────────────────────────────
+# Compressed snapshot objects  (gzip / zstd, streamed both ways)
+# ─────────────────────────────────────────────────────────────────
+
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+COMPRESSION_DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+
+
+def resolve_compression():
+    """Return (codec, level) for push from SNAPSHOT_COMPRESSION, or (None, None)."""
+    codec = SNAPSHOT_COMPRESSION
+    if codec in ("", "none", "0"):
+        return None, None
+    if codec not in COMPRESSION_SUFFIXES:
+        print(f"  WARNING: unknown SNAPSHOT_COMPRESSION={codec!r} — uploading uncompressed")
+        return None, None
+    if codec == "zstd" and zstandard is None:
+        print("  WARNING: zstandard not installed — falling back to gzip")
+        codec = "gzip"
+    level = int(SNAPSHOT_COMPRESSION_LEVEL or COMPRESSION_DEFAULT_LEVELS[codec])
+    return codec, level
+
+
+def _compressor(codec, level):
+    if codec == "gzip":
+        return zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    if codec == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    raise RuntimeError(f"compression codec {codec!r} not available")
+
+
+def _decompressor(codec):
+    if codec == "gzip":
+        return zlib.decompressobj(31)
+    if codec == "zstd" and zstandard is not None:
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise RuntimeError(f"compression codec {codec!r} not available (pip install zstandard)")
+
+
+class CompressingReader:
+    """Read-only stream yielding the compressed form of file `f`.
+
+    Fed to upload_fileobj, which pulls one part at a time, so at most one
+    part of compressed output is buffered.  `size` counts compressed bytes read.
+    """
+
+    def __init__(self, f, codec, level):
+        self._f = f
+        self._c = _compressor(codec, level)
+        self._buf = bytearray()
+        self._eof = False
+        self.size = 0
+
+    def read(self, n=-1):
+        while not self._eof and (n is None or n < 0 or len(self._buf) < n):
+            block = self._f.read(1024 * 1024)
+            if block:
+                self._buf += self._c.compress(block)
+            else:
+                self._buf += self._c.flush()
+                self._eof = True
+        if n is None or n < 0:
+            n = len(self._buf)
+        out = bytes(self._buf[:n])
+        del self._buf[:n]
+        self.size += len(out)
+        return out
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return False
+
+
+class DecompressingWriter:
+    """Write-only stream that decompresses into another writer.
+
+    Non-seekable, like HashingWriter, so parts arrive in order.  `size`
+    counts compressed bytes received.
+    """
+
+    def __init__(self, inner, codec):
+        self._inner = inner
+        self._d = _decompressor(codec)
+        self._codec = codec
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        self._inner.write(self._d.decompress(data))
+        return len(data)
+
+    def seekable(self):
+        return False
+
+    def close(self):
+        """Flush the tail; raise if the compressed stream was truncated."""
+        flush = getattr(self._d, "flush", None)
+        tail = flush() if flush else b""
+        if tail:
+            self._inner.write(tail)
+        if not getattr(self._d, "eof", True):
+            raise ValueError(f"{self._codec} object truncated")
+
+
 def get_s3_client(cfg):
-    """Create boto3 S3 client for MinIO."""
+    """Create boto3 S3 client for MinIO (a SyncEngine reuses its own)."""
+    if _ENGINE_S3 is not None:
+        return _ENGINE_S3
     endpoint = cfg["MINIO_ENDPOINT"]
-    return boto3.client(
+    client = boto3.client(
         "s3",
         endpoint_url=endpoint,
         aws_access_key_id=cfg["MINIO_ACCESS_KEY"],
         aws_secret_access_key=cfg["MINIO_SECRET_KEY"],
         region_name=cfg["MINIO_REGION"],
-        config=Config(signature_version="s3v4"),
+        config=Config(
+            signature_version="s3v4",
+            # Every multipart/chunk worker thread needs its own connection
+            max_pool_connections=max(S3_MAX_POOL_CONNECTIONS, S3_MAX_CONCURRENCY),
+            retries={"total_max_attempts": S3_MAX_ATTEMPTS, "mode": S3_RETRY_MODE},
+            connect_timeout=S3_CONNECT_TIMEOUT,
+            read_timeout=S3_READ_TIMEOUT,
+        ),
     )
+    client.meta.events.register("after-call.s3", _count_request)
+    return client
+
+
+def get_transfer_config():
+    """TransferConfig for upload_file / download_fileobj from the S3_* knobs."""
+    mb = 1024 * 1024
+    return TransferConfig(
+        multipart_threshold=S3_MULTIPART_THRESHOLD_MB * mb,
+        multipart_chunksize=S3_MULTIPART_CHUNKSIZE_MB * mb,
+        max_concurrency=max(1, S3_MAX_CONCURRENCY),
+        use_threads=S3_MAX_CONCURRENCY > 1,
+        max_bandwidth=int(S3_MAX_BANDWIDTH_MBPS * mb) if S3_MAX_BANDWIDTH_MBPS > 0 else None,
+    )
+
+
+# ─────────────────────────────────────────────────────────────────
+# Transfer statistics  (per-phase MB/s, request and retry counts)
+# ─────────────────────────────────────────────────────────────────
+
+TRANSFER_STATS = {"requests": 0, "retries": 0}
+_TRANSFER_STATS_LOCK = threading.Lock()
+
+
+def _count_request(parsed=None, **kwargs):
+    """botocore after-call hook: count requests and the retries each needed.
+
+    Multipart parts are individual UploadPart / ranged GetObject calls, so
+    this also counts part retries.
+    """
+    meta = (parsed or {}).get("ResponseMetadata", {}) if isinstance(parsed, dict) else {}
+    with _TRANSFER_STATS_LOCK:
+        TRANSFER_STATS["requests"] += 1
+        TRANSFER_STATS["retries"] += int(meta.get("RetryAttempts", 0) or 0)
+
+
+def fmt_throughput(nbytes, seconds):
+    """Human-readable size, duration and MB/s."""
+    mb = nbytes / (1024 * 1024)
+    rate = mb / seconds if seconds > 0 else 0.0
+    return f"{mb:.2f} MB in {seconds:.2f}s ({rate:.1f} MB/s)"
+
+
+class TransferPhase:
+    """Time one sync phase and count the S3 requests/retries made inside it.
+
+        with TransferPhase("upload") as ph:
+            ...
+            ph.nbytes = size
+        print(ph)
+    """
+
+    def __init__(self, name, nbytes=0):
+        self.name = name
+        self.nbytes = nbytes
+        self.seconds = 0.0
+        self.requests = 0
+        self.retries = 0
+
+    def start(self):
+        self._t0 = time.monotonic()
+        self._started_at = time.time()
+        self._start = dict(TRANSFER_STATS)
+        return self
+
+    def stop(self, nbytes=None):
+        self.seconds = time.monotonic() - self._t0
+        self.requests = TRANSFER_STATS["requests"] - self._start["requests"]
+        self.retries = TRANSFER_STATS["retries"] - self._start["retries"]
+        if nbytes is not None:
+            self.nbytes = nbytes
+        emit_event("phase", phase=self.name, started_at=self._started_at,
+                   ended_at=self._started_at + self.seconds, seconds=round(self.seconds, 6),
+                   bytes=self.nbytes, mb_per_s=round(self.mb_per_s, 3),
+                   requests=self.requests, retries=self.retries)
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    @property
+    def mb_per_s(self):
+        return self.nbytes / (1024 * 1024) / self.seconds if self.seconds > 0 else 0.0
+
+    def __str__(self):
+        return (f"{self.name:<9} {fmt_throughput(self.nbytes, self.seconds)}"
+                f"  requests={self.requests} retries={self.retries}")
+
+
+def print_phases(phases):
+    """Print the per-phase throughput block of a sync report."""
+    if not phases:
+        return
+    print("  throughput:")
+    for ph in phases:
+        print(f"    {ph}")
+
+
+# ─────────────────────────────────────────────────────────────────
+# Progress events  (JSON lines for the agent / fleet graphs)
+# ─────────────────────────────────────────────────────────────────
+#
+#   {"event": "start",    "command": "pull_sqlite", "ts": ..., "project": ..., "canonical_id": ...}
+#   {"event": "phase",    "phase": "download", "started_at", "ended_at", "seconds", "bytes", "mb_per_s", ...}
+#   {"event": "digest",   "role": "local|remote|snapshot|download", "sha256": ..., "cached": bool}
+#   {"event": "decision", "decision": "up_to_date|full_pull|delta|...", ...}
+#   {"event": "end",      "exit_code": 0, "seconds": ..., "requests": ..., "retries": ...}
+
+_EVENT_SINK = None
+_EVENT_COMMAND = None
+
+
+def _open_event_sink(target):
+    if target == "stdout":
+        return sys.stdout
+    if target.startswith("fd:"):
+        return os.fdopen(int(target[3:]), "a", buffering=1, closefd=False)
+    return open(os.path.expanduser(target), "a", buffering=1)
+
+
+def emit_event(event, **fields):
+    """Write one JSON event line to the SYNC_EVENTS sink (no-op when disabled)."""
+    if _EVENT_SINK is None:
+        return
+    record = {"event": event, "command": _EVENT_COMMAND, "ts": time.time()}
+    record.update(fields)
+    try:
+        _EVENT_SINK.write(json.dumps(record) + "\n")
+        _EVENT_SINK.flush()
+    except (OSError, ValueError):
+        pass
+
+
+def with_events(fn):
+    """Emit start/end events around a command (end carries the exit code)."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        global _EVENT_SINK, _EVENT_COMMAND
+        if _EVENT_COMMAND is not None:
+            return fn(*args, **kwargs)  # nested command: the outer one reports
+        owned = _EVENT_SINK is None  # else a SyncEngine run provided the sink
+        if owned:
+            if not SYNC_EVENTS:
+                return fn(*args, **kwargs)
+            try:
+                _EVENT_SINK = _open_event_sink(SYNC_EVENTS)
+            except (OSError, ValueError) as e:
+                print(f"WARNING: cannot open SYNC_EVENTS sink {SYNC_EVENTS!r}: {e}")
+                return fn(*args, **kwargs)
+        _EVENT_COMMAND = fn.__name__
+        t0 = time.monotonic()
+        stats0 = dict(TRANSFER_STATS)
+        emit_event("start", project=os.environ.get("CLAUDE_PROJECT_ID"), node_id=NODE_ID)
+        exit_code = 1
+        try:
+            result = fn(*args, **kwargs)
+            exit_code = 0
+            return result
+        except SystemExit as e:
+            exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            raise
+        finally:
+            emit_event("end", exit_code=exit_code, seconds=round(time.monotonic() - t0, 6),
+                       requests=TRANSFER_STATS["requests"] - stats0["requests"],
+                       retries=TRANSFER_STATS["retries"] - stats0["retries"])
+            _EVENT_COMMAND = None
+            if owned:
+                sink, _EVENT_SINK = _EVENT_SINK, None
+                if sink is not sys.stdout:
+                    sink.close()
+    return wrapper
+
+
+# ─────────────────────────────────────────────────────────────────
+# Metadata cache  (ETag + body, conditional GET, per-run dedup)
+# ─────────────────────────────────────────────────────────────────
+
+_META_CACHE = None  # active MetaCache for the running command, if any
+
+
+def _is_not_modified(exc):
+    """True if a botocore ClientError is a 304 Not Modified."""
+    resp = getattr(exc, "response", None) or {}
+    code = str(resp.get("Error", {}).get("Code", ""))
+    status = resp.get("ResponseMetadata", {}).get("HTTPStatusCode")
+    return code in ("304", "NotModified") or status == 304
+
+
+class MetaCache:
+    """Local ETag + body store for small, frequently re-read objects.
+
+    Persisted across runs so an unchanged object costs a 304 instead of a
+    body transfer; within a run every key is fetched at most once.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.entries = {}   # "bucket/key" → {"etag": str, "body": bytes}
+        self.memo = {}      # "bucket/key" → entry dict or exception (this run only)
+        self.dirty = False
+        self.stats = {"requests": 0, "not_modified": 0, "deduped": 0, "bytes_saved": 0}
+
+    @classmethod
+    def load(cls, path):
+        cache = cls(path)
+        try:
+            with open(path) as f:
+                for ck, entry in json.load(f).items():
+                    cache.entries[ck] = {"etag": entry["etag"], "body": entry["body"].encode()}
+        except (OSError, ValueError, KeyError, AttributeError):
+            pass
+        return cache
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            data = {}
+            for ck, entry in self.entries.items():
+                try:
+                    data[ck] = {"etag": entry["etag"], "body": entry["body"].decode()}
+                except UnicodeDecodeError:
+                    continue
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except OSError:
+            pass
+
+    def get(self, client, bucket, key):
+        ck = f"{bucket}/{key}"
+        if ck in self.memo:
+            hit = self.memo[ck]
+            self.stats["deduped"] += 1
+            if isinstance(hit, Exception):
+                raise hit
+            self.stats["bytes_saved"] += len(hit["body"])
+            return {"Body": io.BytesIO(hit["body"]), "ETag": hit["etag"]}
+
+        entry = self.entries.get(ck)
+        kwargs = {"IfNoneMatch": entry["etag"]} if entry else {}
+        self.stats["requests"] += 1
+        try:
+            resp = client.get_object(Bucket=bucket, Key=key, **kwargs)
+        except Exception as e:
+            if entry and _is_not_modified(e):
+                self.stats["not_modified"] += 1
+                self.stats["bytes_saved"] += len(entry["body"])
+                self.memo[ck] = entry
+                return {"Body": io.BytesIO(entry["body"]), "ETag": entry["etag"]}
+            self.memo[ck] = e
+            if self.entries.pop(ck, None) is not None:
+                self.dirty = True
+            raise
+
+        body = resp["Body"].read()
+        etag = resp.get("ETag") if isinstance(resp, dict) else None
+        if not isinstance(body, bytes):
+            return {"Body": io.BytesIO(body) if isinstance(body, bytearray) else _StaticBody(body)}
+        self.store(bucket, key, body, etag)
+        return {**resp, "Body": io.BytesIO(body)}
+
+    def store(self, bucket, key, body, etag):
+        """Record an object body we just read or wrote."""
+        ck = f"{bucket}/{key}"
+        entry = {"etag": etag if isinstance(etag, str) else None, "body": body}
+        self.memo[ck] = entry
+        if entry["etag"]:
+            self.entries[ck] = entry
+            self.dirty = True
+        elif self.entries.pop(ck, None) is not None:
+            self.dirty = True
+
+    def forget(self, bucket, key):
+        """Drop the per-run memo so the next read revalidates with the server."""
+        self.memo.pop(f"{bucket}/{key}", None)
+
+    def report(self):
+        st = self.stats
+        print(f"  meta cache: {st['requests']} GET(s), {st['not_modified']} not modified, "
+              f"{st['deduped']} deduplicated — {st['deduped']} round trip(s), "
+              f"{st['bytes_saved']} bytes saved")
+
+
+class _StaticBody:
+    def __init__(self, data):
+        self._data = data
+
+    def read(self):
+        return self._data
+
+
+class MetaCachedS3:
+    """S3 client proxy that routes metadata-object GET/PUT through a MetaCache."""
+
+    def __init__(self, client, cache):
+        self._client = client
+        self._cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+    def get_object(self, Bucket, Key, **kwargs):
+        if kwargs or not Key.endswith(META_CACHE_SUFFIXES):
+            return self._client.get_object(Bucket=Bucket, Key=Key, **kwargs)
+        return self._cache.get(self._client, Bucket, Key)
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        resp = self._client.put_object(Bucket=Bucket, Key=Key, Body=Body, **kwargs)
+        if Key.endswith(META_CACHE_SUFFIXES) and isinstance(Body, bytes):
+            self._cache.store(Bucket, Key, Body, resp.get("ETag") if isinstance(resp, dict) else None)
+        return resp
+
+    def revalidate(self, Bucket, Key):
+        self._cache.forget(Bucket, Key)
+
+
+def with_meta_cache(fn):
+    """Run a command with a MetaCache active; save and report it on exit."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        global _META_CACHE
+        if not META_CACHE_ENABLED:
+            return fn(*args, **kwargs)
+        _META_CACHE = MetaCache.load(os.path.expanduser(META_CACHE_PATH))
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            cache, _META_CACHE = _META_CACHE, None
+            cache.save()
+            print()
+            cache.report()
+    return wrapper
+
+
+def meta_cached(s3):
+    """Wrap an S3 client with the active command's MetaCache (no-op if none)."""
+    if _META_CACHE is None or isinstance(s3, MetaCachedS3):
+        return s3
+    return MetaCachedS3(s3, _META_CACHE)
+
+
+def revalidate(s3, bucket, key):
+    """Force the next read of `key` to go to the server (conditional GET)."""
+    if isinstance(s3, MetaCachedS3):
+        s3.revalidate(bucket, key)
 
 
 def get_lock_key(canonical_id):
@@ -263,6 +1141,47 @@ def start_worker():
     return False
 
 
+def create_online_snapshot(db_path, snap_path, check=None):
+    """Write a consistent VACUUM'd copy of `db_path` without stopping the worker.
+
+    WAL databases: VACUUM INTO runs inside a single read transaction, which
+    sees a frozen view of the DB and never blocks the worker's writes.
+    Rollback-journal databases: the backup API copies SNAPSHOT_BACKUP_PAGES
+    pages per step and releases the read lock between steps (restarting if
+    the worker writes meanwhile); the copy is then VACUUM'd into `snap_path`.
+
+    `check(conn)` sees the source pages before VACUUM rewrites them (which
+    would hide freelist and page-level damage): the live DB itself for WAL
+    (its own read transaction — VACUUM cannot run inside one), the raw page
+    copy otherwise.  If it returns False no snapshot is written.
+
+    `snap_path` must be absent or empty.  Returns the source journal mode.
+    """
+    src = sqlite3.connect(db_path, timeout=30)
+    try:
+        journal_mode = src.execute("PRAGMA journal_mode").fetchone()[0].lower()
+        if journal_mode == "wal":
+            if check is None or check(src):
+                src.execute(f"VACUUM INTO '{snap_path}'")
+            return journal_mode
+
+        fd, raw_path = tempfile.mkstemp(suffix=".raw.db", dir=os.path.dirname(snap_path))
+        os.close(fd)
+        try:
+            raw = sqlite3.connect(raw_path)
+            try:
+                src.backup(raw, pages=SNAPSHOT_BACKUP_PAGES, sleep=0.05)
+                if check is None or check(raw):
+                    raw.execute(f"VACUUM INTO '{snap_path}'")
+            finally:
+                raw.close()
+        finally:
+            os.unlink(raw_path)
+        return journal_mode
+    finally:
+        src.close()
+
+
 def get_remote_manifest(s3, bucket, prefix):
     """Download and parse remote manifest.json. Returns dict or None."""
     try:
@@ -272,6 +1191,34 @@ def get_remote_manifest(s3, bucket, prefix):
         return None
 
 
+def get_remote_head(s3, bucket, prefix):
+    """Return (manifest, remote_sha) from a single manifest GET.
+
+    manifest.json is the authoritative head document (it carries a
+    `generation`); manifests written by older engines lack it, in which
+    case the legacy claude-mem.db.sha256 object is read instead.  Raises
+    the S3 NoSuchKey error if neither exists.
+    """
+    manifest = get_remote_manifest(s3, bucket, prefix)
+    if manifest and manifest.get("generation") and manifest.get("sha256"):
+        return manifest, manifest["sha256"]
+    resp = s3.get_object(Bucket=bucket, Key=f"{prefix}/claude-mem.db.sha256")
+    return manifest, resp["Body"].read().decode().strip().split()[0]
+
+
+# First token of claude-mem.db.sha256 once the head is no longer a plain
+# claude-mem.db (chunked, compressed, or deltas on a base).  It never matches
+# a local digest, so an engine that reads only the legacy pair fails its pull
+# instead of reporting a stale DB as up to date.
+LEGACY_TOMBSTONE = "upgrade-required"
+
+
+def put_legacy_tombstone(s3, bucket, prefix, head_format):
+    body = (f"{LEGACY_TOMBSTONE}  claude-mem.db: the head is a {head_format} manifest.json; "
+            f"upgrade the sync engine on this node\n")
+    s3.put_object(Bucket=bucket, Key=f"{prefix}/claude-mem.db.sha256", Body=body.encode())
+
+
 def get_local_obs_count(db_path):
     """Query local SQLite for observation count (read-only). Returns int or None."""
     if not os.path.exists(db_path):
@@ -285,27 +1232,175 @@ def get_local_obs_count(db_path):
         return None
 
 
+# ─────────────────────────────────────────────────────────────────
+# Pull-overwrite backups  (content-addressed, deduplicated store)
+# ─────────────────────────────────────────────────────────────────
+#
+#   ~/.claude-mem/backups/pull-overwrite/
+#     store/objects/<sha256>        whole-file reflink clones (read-only)
+#     store/recipes/<sha256>.json   chunk list of a chunk-deduplicated file
+#     store/chunks/<aa>/<sha256>    page-aligned chunks shared by all backups
+#     <YYYYMMDD-HHMMSS>/manifest.json
+#     <YYYYMMDD-HHMMSS>/claude-mem.db   hardlink into store/objects (reflink only)
+
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+
+def get_pull_backup_base():
+    return os.path.expanduser("~/.claude-mem/backups/pull-overwrite")
+
+
+def reflink_file(src, dst):
+    """Clone `src` to `dst` sharing extents (btrfs, XFS, bcachefs). False if unsupported."""
+    if fcntl is None:
+        return False
+    try:
+        with open(src, "rb") as fs, open(dst, "wb") as fd:
+            fcntl.ioctl(fd.fileno(), FICLONE, fs.fileno())
+        return True
+    except OSError:
+        if os.path.exists(dst):
+            os.unlink(dst)
+        return False
+
+
+def _store_chunk(store, data, chunk_sha):
+    """Write one chunk unless present. Returns bytes written."""
+    chunk_dir = os.path.join(store, "chunks", chunk_sha[:2])
+    chunk_path = os.path.join(chunk_dir, chunk_sha)
+    if os.path.exists(chunk_path):
+        return 0
+    os.makedirs(chunk_dir, exist_ok=True)
+    tmp = chunk_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, chunk_path)
+    return len(data)
+
+
+def store_backup_file(store, path, known_sha=None, known_identity=None):
+    """Add `path` to the backup store; return its reference dict.
+
+    `known_sha` is trusted only while the file still has `known_identity`;
+    it lets an already-stored file be referenced without reading it.  Otherwise the
+    file is reflink-cloned into store/objects, or — where the filesystem
+    cannot clone — split into page-aligned chunks of which only unseen
+    ones are written.  The reference records how many bytes were written.
+    """
+    size = os.path.getsize(path)
+    objects = os.path.join(store, "objects")
+    recipes = os.path.join(store, "recipes")
+    os.makedirs(objects, exist_ok=True)
+    os.makedirs(recipes, exist_ok=True)
+
+    before = file_identity(path)
+    if known_identity is None or before != tuple(known_identity):
+        known_sha = None
+    if known_sha:
+        if os.path.exists(os.path.join(objects, known_sha)):
+            return {"sha256": known_sha, "size": size, "kind": "object", "written": 0}
+        if os.path.exists(os.path.join(recipes, known_sha + ".json")):
+            return {"sha256": known_sha, "size": size, "kind": "chunks", "written": 0}
+
+    # Reflink: O(1) copy-on-write clone, shares every unchanged extent
+    fd, tmp = tempfile.mkstemp(dir=objects, suffix=".tmp")
+    os.close(fd)
+    if reflink_file(path, tmp):
+        sha = known_sha if known_sha and file_identity(path) == before else sha256_file(tmp)
+        obj = os.path.join(objects, sha)
+        if os.path.exists(obj):
+            os.unlink(tmp)
+        else:
+            os.chmod(tmp, 0o444)
+            os.replace(tmp, obj)
+        return {"sha256": sha, "size": size, "kind": "object", "written": 0}
+    if os.path.exists(tmp):
+        os.unlink(tmp)
+
+    # Chunk dedup: consecutive near-identical backups share all unchanged chunks
+    file_hash = hashlib.sha256()
+    chunks = list(iter_chunks(path, file_hash))
+    sha = file_hash.hexdigest()
+    written = 0
+    with open(path, "rb") as f:
+        for offset, chunk_size, chunk_sha in chunks:
+            if os.path.exists(os.path.join(store, "chunks", chunk_sha[:2], chunk_sha)):
+                continue
+            f.seek(offset)
+            data = f.read(chunk_size)
+            if hashlib.sha256(data).hexdigest() != chunk_sha:
+                raise ValueError(f"{path} changed while being backed up")
+            written += _store_chunk(store, data, chunk_sha)
+    recipe = os.path.join(recipes, sha + ".json")
+    with open(recipe + ".tmp", "w") as f:
+        json.dump({"sha256": sha, "size": size,
+                   "chunks": [[c_sha, c_size] for _, c_size, c_sha in chunks]}, f)
+    os.replace(recipe + ".tmp", recipe)
+    return {"sha256": sha, "size": size, "kind": "chunks", "written": written}
+
+
+def materialize_backup_file(store, ref, dest):
+    """Rebuild a stored file at `dest` and verify its SHA256."""
+    sha = ref["sha256"]
+    if ref["kind"] == "object":
+        shutil.copyfile(os.path.join(store, "objects", sha), dest)
+        got = sha256_file(dest)
+    else:
+        with open(os.path.join(store, "recipes", sha + ".json")) as f:
+            recipe = json.load(f)
+        h = hashlib.sha256()
+        with open(dest, "wb") as out:
+            for chunk_sha, _ in recipe["chunks"]:
+                with open(os.path.join(store, "chunks", chunk_sha[:2], chunk_sha), "rb") as f:
+                    data = f.read()
+                h.update(data)
+                out.write(data)
+        got = h.hexdigest()
+    if got != sha:
+        raise ValueError(f"backup of {dest} corrupt: expected {sha[:16]}, got {got[:16]}")
+
+
 def create_pull_safety_backup(db_path, local_sha, remote_sha, local_obs, remote_obs, local_ahead):
     """Create structured backup of local DB before pull overwrite.
 
     Directory: ~/.claude-mem/backups/pull-overwrite/{YYYYMMDD-HHMMSS}/
-    Contents:  claude-mem.db, chroma.sqlite3 (if present), manifest.json
+    Contents:  manifest.json referencing claude-mem.db and chroma.sqlite3
+               (if present) in the shared content-addressed store; with
+               PULL_BACKUP_STORE=copy, full copies of both files instead.
 
-    Returns the backup directory path.
+    While the digest cache still vouches for the DB, an already-stored DB
+    costs no I/O at all.  Returns the backup directory path.
     """
     ts = datetime.now().strftime("%Y%m%d-%H%M%S")
-    backup_base = os.path.expanduser("~/.claude-mem/backups/pull-overwrite")
+    backup_base = get_pull_backup_base()
     backup_dir = os.path.join(backup_base, ts)
-    os.makedirs(backup_dir, exist_ok=True)
-
-    # Copy main DB
-    db_backup = os.path.join(backup_dir, "claude-mem.db")
-    shutil.copy2(db_path, db_backup)
-
-    # Copy vector-db chroma.sqlite3 if it exists
-    chroma_path = os.path.expanduser("~/.claude-mem/vector-db/chroma.sqlite3")
+    n = 0
+    while os.path.exists(backup_dir):  # two pulls within one second
+        n += 1
+        backup_dir = os.path.join(backup_base, f"{ts}-{n}")
+    os.makedirs(backup_dir)
+    store = os.path.join(backup_base, "store")
+
+    sources = {"claude-mem.db": db_path}
+    chroma_path = os.path.join(get_vector_db_dir(), VECTOR_SQLITE_NAME)
     if os.path.exists(chroma_path):
-        shutil.copy2(chroma_path, os.path.join(backup_dir, "chroma.sqlite3"))
+        sources["chroma.sqlite3"] = chroma_path
+
+    files = {}
+    for name, src in sources.items():
+        if PULL_BACKUP_STORE == "copy":
+            shutil.copy2(src, os.path.join(backup_dir, name))
+            continue
+        ref = store_backup_file(store, src, *peek_cached_sha256(src))
+        files[name] = ref
+        if ref["kind"] == "object":
+            # Plain file in the snapshot dir: restore stays a `cp`
+            try:
+                os.link(os.path.join(store, "objects", ref["sha256"]), os.path.join(backup_dir, name))
+            except OSError:
+                pass
+        print(f"  backup {name}: {ref['kind']} {ref['sha256'][:16]} "
+              f"({ref['written']} of {ref['size']} bytes written)")
 
     # Write manifest so we know what was here and why
     manifest = {
@@ -319,57 +1414,922 @@ def create_pull_safety_backup(db_path, local_sha, remote_sha, local_obs, remote_
         "local_ahead": local_ahead,
         "db_path": db_path,
     }
+    if files:
+        manifest["files"] = files
     with open(os.path.join(backup_dir, "manifest.json"), "w") as f:
         json.dump(manifest, f, indent=2)
 
     return backup_dir
 
 
-def cleanup_pull_backups(max_days=None, max_count=None):
-    """Remove old pull-overwrite backups beyond max_days or max_count.
+def restore_pull_backup(name=None, dest=None):
+    """Restore claude-mem.db from a pull-overwrite backup.
+
+    CLI: sqlite_minio_sync.py restore_pull_backup <YYYYMMDD-HHMMSS> [dest]
+    `dest` defaults to a new file next to CLAUDE_MEM_DB (never the live DB).
+    """
+    args = sys.argv[2:] if name is None else [name] + ([dest] if dest else [])
+    if not args:
+        print("Usage: sqlite_minio_sync.py restore_pull_backup <YYYYMMDD-HHMMSS> [dest]")
+        sys.exit(1)
+    backup_dir = os.path.join(get_pull_backup_base(), args[0])
+    try:
+        with open(os.path.join(backup_dir, "manifest.json")) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"ERROR: cannot read backup {backup_dir}: {e}")
+        sys.exit(1)
+    if len(args) > 1:
+        dest = args[1]
+    else:
+        db_path = os.environ.get("CLAUDE_MEM_DB") or manifest.get("db_path")
+        dest = f"{db_path}.restored-{args[0]}"
+    ref = (manifest.get("files") or {}).get("claude-mem.db")
+    try:
+        if ref:
+            materialize_backup_file(os.path.join(get_pull_backup_base(), "store"), ref, dest)
+        else:
+            shutil.copy2(os.path.join(backup_dir, "claude-mem.db"), dest)  # legacy full copy
+    except (OSError, ValueError) as e:
+        print(f"ERROR: restore failed: {e}")
+        sys.exit(1)
+    print(f"restored: {dest}")
+    print(f"  stop the worker, then: mv {dest} {manifest.get('db_path', '<db>')}")
+    return dest
+
+
+def gc_backup_store(backup_base):
+    """Delete store objects, recipes and chunks no remaining backup references.
+
+    Reference counts are derived from the snapshot manifests: a file is
+    referenced once per backup naming it, a chunk once per recipe using it.
+    Returns the number of bytes freed.
+    """
+    store = os.path.join(backup_base, "store")
+    if not os.path.isdir(store):
+        return 0
+    file_refs = {}
+    for d in os.listdir(backup_base):
+        try:
+            with open(os.path.join(backup_base, d, "manifest.json")) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for ref in (manifest.get("files") or {}).values():
+            file_refs[ref["sha256"]] = file_refs.get(ref["sha256"], 0) + 1
+
+    freed = 0
+
+    def _drop(path):
+        nonlocal freed
+        try:
+            freed += os.path.getsize(path)
+            os.unlink(path)
+        except OSError:
+            pass
+
+    objects = os.path.join(store, "objects")
+    for name in os.listdir(objects) if os.path.isdir(objects) else []:
+        if not file_refs.get(name):
+            _drop(os.path.join(objects, name))
+
+    chunk_refs = {}
+    recipes = os.path.join(store, "recipes")
+    for name in os.listdir(recipes) if os.path.isdir(recipes) else []:
+        path = os.path.join(recipes, name)
+        if not file_refs.get(name[:-len(".json")]):
+            _drop(path)
+            continue
+        try:
+            with open(path) as f:
+                for chunk_sha, _ in json.load(f)["chunks"]:
+                    chunk_refs[chunk_sha] = chunk_refs.get(chunk_sha, 0) + 1
+        except (OSError, ValueError, KeyError):
+            pass
+
+    chunks = os.path.join(store, "chunks")
+    for sub in os.listdir(chunks) if os.path.isdir(chunks) else []:
+        for name in os.listdir(os.path.join(chunks, sub)):
+            if not chunk_refs.get(name):
+                _drop(os.path.join(chunks, sub, name))
+    return freed
+
+
+def cleanup_pull_backups(max_days=None, max_count=None):
+    """Expire old pull-overwrite backups, then garbage-collect the store.
+
+    Keeps at most `max_count` newest snapshots AND removes anything older
+    than `max_days` days.  Removing a snapshot drops only its manifest and
+    links; stored content is deleted once no snapshot references it.
+    Runs silently on errors (non-critical path).
+    """
+    if max_days is None:
+        max_days = PULL_BACKUP_MAX_DAYS
+    if max_count is None:
+        max_count = PULL_BACKUP_MAX_COUNT
+
+    backup_base = get_pull_backup_base()
+    if not os.path.isdir(backup_base):
+        return
+
+    # Sorted oldest → newest
+    dirs = sorted([
+        os.path.join(backup_base, d)
+        for d in os.listdir(backup_base)
+        if d != "store" and os.path.isdir(os.path.join(backup_base, d))
+    ])
+
+    cutoff = time.time() - max_days * 86400
+    removed = 0
+
+    # Remove by age (oldest first)
+    for d in list(dirs):
+        try:
+            if os.path.getmtime(d) < cutoff:
+                shutil.rmtree(d)
+                dirs.remove(d)
+                removed += 1
+        except Exception:
+            pass
+
+    # Remove by count (oldest first if still over limit)
+    while len(dirs) > max_count:
+        try:
+            shutil.rmtree(dirs.pop(0))
+            removed += 1
+        except Exception:
+            break
+
+    freed = 0
+    try:
+        freed = gc_backup_store(backup_base)
+    except Exception:
+        pass
+
+    if removed or freed:
+        print(f"  backup cleanup: removed {removed} old pull-overwrite snapshot(s), "
+              f"freed {freed} bytes from the store")
+
+
+# ─────────────────────────────────────────────────────────────────
+# Chunked transfer  (content-defined, SQLite page aligned)
+# ─────────────────────────────────────────────────────────────────
+
+def get_chunk_key(prefix, chunk_sha):
+    """Return the S3 key for a content-addressed chunk."""
+    return f"{prefix}/chunks/{chunk_sha}"
+
+
+def sqlite_page_size(path):
+    """Read the page size from a SQLite header. Falls back to 4096."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(100)
+        if header[:16] == b"SQLite format 3\x00":
+            size = int.from_bytes(header[16:18], "big")
+            return 65536 if size == 1 else size
+    except OSError:
+        pass
+    return 4096
+
+
+def iter_chunks(path, file_hash=None):
+    """Split a file into content-defined chunks. Yields (offset, size, sha256).
+
+    Boundaries are only placed between SQLite pages: a chunk ends after a
+    page whose CRC32 matches the boundary mask, bounded by CHUNK_MIN_BYTES
+    and CHUNK_MAX_BYTES.  Because the cut points depend on page content
+    rather than offsets, inserting rows re-synchronises after a few pages
+    instead of shifting every following chunk.
+
+    If `file_hash` (a hashlib object) is given it is fed every page, so the
+    whole-file digest comes out of the same read pass.
+    """
+    page_size = sqlite_page_size(path)
+    target_pages = max(1, CHUNK_TARGET_BYTES // page_size)
+    mask = (1 << (target_pages.bit_length() - 1)) - 1
+    min_bytes = max(page_size, CHUNK_MIN_BYTES)
+    max_bytes = max(min_bytes, CHUNK_MAX_BYTES)
+
+    offset = 0
+    size = 0
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for page in iter(lambda: f.read(page_size), b""):
+            h.update(page)
+            if file_hash is not None:
+                file_hash.update(page)
+            size += len(page)
+            boundary = (zlib.crc32(page) & mask) == mask
+            if size >= max_bytes or (size >= min_bytes and boundary):
+                yield offset, size, h.hexdigest()
+                offset += size
+                size = 0
+                h = hashlib.sha256()
+    if size:
+        yield offset, size, h.hexdigest()
+
+
+def upload_chunks(s3, bucket, prefix, path, chunks, known=()):
+    """Upload chunks of `path` that are not yet in the bucket.
+
+    `chunks` is a list of (offset, size, sha256); `known` is a set of chunk
+    hashes already listed by the remote manifest (no HEAD needed for those).
+    Up to S3_MAX_CONCURRENCY chunks are checked/uploaded in parallel.
+    Returns (uploaded_count, uploaded_bytes).
+    """
+    known = set(known)
+    todo = []
+    for offset, size, chunk_sha in chunks:
+        if chunk_sha not in known:
+            known.add(chunk_sha)
+            todo.append((offset, size, chunk_sha))
+
+    def _upload(item):
+        offset, size, chunk_sha = item
+        key = get_chunk_key(prefix, chunk_sha)
+        try:
+            s3.head_object(Bucket=bucket, Key=key)
+            return 0
+        except Exception:
+            pass
+        with open(path, "rb") as f:
+            f.seek(offset)
+            s3.put_object(Bucket=bucket, Key=key, Body=f.read(size))
+        return size
+
+    with ThreadPoolExecutor(max_workers=max(1, S3_MAX_CONCURRENCY)) as pool:
+        sizes = list(pool.map(_upload, todo))
+    return sum(1 for n in sizes if n), sum(sizes)
+
+
+def download_chunked(s3, bucket, prefix, chunks, out_path, local_path=None):
+    """Reassemble a chunked remote snapshot into `out_path`.
+
+    Chunks already present in `local_path` (matched by content hash) are
+    copied locally; only the missing ones are fetched from MinIO.  Each
+    fetched chunk is verified against its hash.  The caller verifies the
+    whole-file SHA256 against the `sha256` entry of the returned stats,
+    which is computed while the output is written.
+
+    Returns dict with reused/fetched chunk counts, byte totals and sha256.
+    """
+    local_index = {}
+    if local_path and os.path.exists(local_path):
+        for offset, size, chunk_sha in iter_chunks(local_path):
+            local_index.setdefault(chunk_sha, (offset, size))
+
+    def _fetch(chunk_sha):
+        resp = s3.get_object(Bucket=bucket, Key=get_chunk_key(prefix, chunk_sha))
+        data = resp["Body"].read()
+        got = hashlib.sha256(data).hexdigest()
+        if got != chunk_sha:
+            raise ValueError(f"chunk {chunk_sha[:16]} corrupt (got {got[:16]})")
+        return data
+
+    stats = {"reused": 0, "reused_bytes": 0, "fetched": 0, "fetched_bytes": 0}
+    # Missing chunks are fetched in parallel, a bounded window at a time,
+    # and written strictly in order so the running digest stays valid.
+    window = max(1, S3_MAX_CONCURRENCY) * 2
+    src = open(local_path, "rb") if local_index else None
+    try:
+        with open(out_path, "wb") as f, \
+                ThreadPoolExecutor(max_workers=max(1, S3_MAX_CONCURRENCY)) as pool:
+            out = HashingWriter(f)
+            for start in range(0, len(chunks), window):
+                pending = []
+                for chunk in chunks[start:start + window]:
+                    chunk_sha, size = chunk["sha256"], chunk["size"]
+                    data = None
+                    if chunk_sha in local_index:
+                        offset, _ = local_index[chunk_sha]
+                        src.seek(offset)
+                        data = src.read(size)
+                        if hashlib.sha256(data).hexdigest() == chunk_sha:
+                            stats["reused"] += 1
+                            stats["reused_bytes"] += size
+                        else:
+                            data = None  # local file changed under us — fetch instead
+                    if data is None:
+                        stats["fetched"] += 1
+                        stats["fetched_bytes"] += size
+                        pending.append(pool.submit(_fetch, chunk_sha))
+                    else:
+                        pending.append(data)
+                for item in pending:
+                    out.write(item if isinstance(item, bytes) else item.result())
+            stats["sha256"] = out.hexdigest()
+    finally:
+        if src:
+            src.close()
+    return stats
+
+
+# ─────────────────────────────────────────────────────────────────
+# Incremental changelog  (append-only delta segments)
+# ─────────────────────────────────────────────────────────────────
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _table_columns(conn, table, schema="main"):
+    """Return (column names, rowid-alias column or None) for `table`."""
+    info = conn.execute(f"PRAGMA {schema}.table_info({_quote(table)})").fetchall()
+    cols = [r[1] for r in info]
+    pk = [r for r in info if r[5]]
+    alias = pk[0][1] if len(pk) == 1 and pk[0][2].upper() == "INTEGER" else None
+    return cols, alias
+
+
+def _derived_tables(conn):
+    """Tables maintained by SQLite itself or by triggers on virtual tables (FTS)."""
+    virtual = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND sql LIKE 'CREATE VIRTUAL TABLE%'")]
+    names = [r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")]
+    return {n for n in names
+            if n.startswith("sqlite_") or n in virtual
+            or any(n.startswith(v + "_") for v in virtual)}
+
+
+def scan_table_state(db_path, prev_high_water=None):
+    """Fingerprint a DB for incremental push.
+
+    Returns (state, prefix_counts).  For INCREMENTAL_TABLES `state` holds
+    per-table high-water rowids and row counts, read from the rowid B-tree
+    without decoding rows; the schema and every other (non-derived) table
+    are digested.  `prefix_counts` are the row counts at or below
+    `prev_high_water` — equal to the previous push's counts unless an old
+    row was deleted.  An in-place update of an old row in a tracked table
+    is not detected; it reaches other nodes with the next full snapshot
+    (at the latest after DELTA_COMPACT_EVERY deltas).
+    """
+    prev_high_water = prev_high_water or {}
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        schema = hashlib.sha256()
+        for row in conn.execute(
+                "SELECT type, name, sql FROM sqlite_master "
+                "WHERE name NOT LIKE 'sqlite_%' ORDER BY type, name"):
+            schema.update(repr(row).encode())
+
+        derived = _derived_tables(conn)
+        state = {"high_water": {}, "row_counts": {}, "schema_digest": schema.hexdigest()}
+        prefix_counts = {}
+        other = hashlib.sha256()
+        names = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name")]
+        for name in names:
+            if name in derived:
+                continue
+            if name in INCREMENTAL_TABLES:
+                high_water, count = conn.execute(
+                    f"SELECT COALESCE(MAX(rowid), 0), COUNT(*) FROM {_quote(name)}").fetchone()
+                state["high_water"][name] = high_water
+                state["row_counts"][name] = count
+                limit = prev_high_water.get(name)
+                if limit is not None:
+                    prefix_counts[name] = conn.execute(
+                        f"SELECT COUNT(*) FROM {_quote(name)} WHERE rowid <= ?", (limit,)).fetchone()[0]
+                continue
+            other.update(name.encode())
+            for row in conn.execute(f"SELECT rowid, * FROM {_quote(name)} ORDER BY rowid"):
+                other.update(repr(row).encode())
+        state["other_digest"] = other.hexdigest()
+        return state, prefix_counts
+    finally:
+        conn.close()
+
+
+def is_append_only(prev_state, state, prefix_counts):
+    """True if the only changes since `prev_state` are rows appended to tracked tables."""
+    if not prev_state:
+        return False
+    for key in ("schema_digest", "other_digest"):
+        if prev_state.get(key) != state.get(key):
+            return False
+    prev_hw = prev_state.get("high_water") or {}
+    prev_counts = prev_state.get("row_counts")
+    if prev_counts is None or set(prev_hw) != set(state["high_water"]):
+        return False  # older manifest (row digests) or a tracked table appeared/vanished
+    return all(prefix_counts.get(t) == prev_counts.get(t) and state["high_water"][t] >= prev_hw[t]
+               for t in prev_hw)
+
+
+def build_delta_segment(snap_path, prev_high_water, out_path):
+    """Copy rows above `prev_high_water` from `snap_path` into a new SQLite file.
+
+    Each table keeps its columns; tables without an INTEGER PRIMARY KEY get
+    the source rowid in an extra `__rowid` column.  Returns {table: rows}.
+    """
+    if os.path.exists(out_path):
+        os.unlink(out_path)
+    conn = sqlite3.connect(snap_path)
+    rows = {}
+    try:
+        conn.execute("ATTACH DATABASE ? AS delta", (out_path,))
+        for table, hw in sorted(prev_high_water.items()):
+            cols, alias = _table_columns(conn, table)
+            select = ", ".join(_quote(c) for c in cols)
+            if alias is None:
+                select = "rowid AS __rowid, " + select
+            conn.execute(
+                f"CREATE TABLE delta.{_quote(table)} AS "
+                f"SELECT {select} FROM main.{_quote(table)} WHERE rowid > ? ORDER BY rowid", (hw,))
+            rows[table] = conn.execute(f"SELECT COUNT(*) FROM delta.{_quote(table)}").fetchone()[0]
+        conn.commit()
+        conn.execute("DETACH DATABASE delta")
+    finally:
+        conn.close()
+    return rows
+
+
+def apply_delta_segments(db_path, segments):
+    """Append the rows of downloaded delta segments to `db_path` in one transaction.
+
+    `segments` is a list of (delta entry, local segment path) in generation
+    order.  Each segment's `from` high-water marks must match the DB, so a
+    gap or a locally modified table aborts without changing anything.
+    Returns {table: rows appended}.
+    """
+    applied = {}
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        for delta, seg_path in segments:
+            seg = sqlite3.connect(f"file:{seg_path}?mode=ro", uri=True)
+            try:
+                for table, hw in sorted((delta.get("from") or {}).items()):
+                    local_hw = conn.execute(
+                        f"SELECT COALESCE(MAX(rowid), 0) FROM {_quote(table)}").fetchone()[0]
+                    if local_hw != hw:
+                        raise ValueError(f"delta {delta['generation']}: {table} high-water "
+                                         f"{local_hw} != expected {hw}")
+                    cols, alias = _table_columns(conn, table)
+                    src = [_quote(c) for c in cols]
+                    dst = list(src)
+                    if alias is None:
+                        src.insert(0, "__rowid")
+                        dst.insert(0, "rowid")
+                    rows = seg.execute(f"SELECT {', '.join(src)} FROM {_quote(table)}").fetchall()
+                    if rows:
+                        conn.executemany(
+                            f"INSERT INTO {_quote(table)} ({', '.join(dst)}) "
+                            f"VALUES ({', '.join('?' for _ in dst)})", rows)
+                    applied[table] = applied.get(table, 0) + len(rows)
+            finally:
+                seg.close()
+        conn.execute("COMMIT")
+        # Fold the WAL back so the main file reflects the applied rows
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return applied
+
+
+def get_delta_state_path(db_path):
+    """Sidecar recording which delta generation the local DB was brought to."""
+    return db_path + ".delta-state.json"
+
+
+def read_delta_state(db_path):
+    try:
+        with open(get_delta_state_path(db_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_delta_state(db_path, generation, base_sha, local_sha):
+    """Record that `db_path` (hashing to `local_sha`) is base + deltas up to `generation`."""
+    path = get_delta_state_path(db_path)
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "w") as f:
+            json.dump({"generation": generation, "base_sha256": base_sha,
+                       "local_sha256": local_sha}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def plan_delta_pull(manifest, local_sha, state):
+    """Deltas to append to the local DB, [] if it is at the head, None if a full pull is needed."""
+    deltas = (manifest or {}).get("deltas") or []
+    if not deltas:
+        return None
+    if local_sha == manifest.get("head_sha256"):
+        return []
+    if local_sha == manifest.get("sha256"):
+        return deltas
+    if (state and state.get("base_sha256") == manifest.get("sha256")
+            and state.get("local_sha256") == local_sha):
+        applied = state.get("generation")
+        known = {manifest.get("base_generation")} | {d["generation"] for d in deltas}
+        if applied in known:
+            return [d for d in deltas if d["generation"] > applied]
+    return None
+
+
+def download_delta_segments(s3, bucket, prefix, deltas, work_dir):
+    """Fetch and verify delta segments; returns [(delta, path)] (caller removes paths)."""
+    segments = []
+    try:
+        for delta in deltas:
+            fd, seg_path = tempfile.mkstemp(suffix=".delta.db", dir=work_dir)
+            os.close(fd)
+            segments.append((delta, seg_path))
+            got, _ = download_and_hash(s3, bucket, f"{prefix}/{delta['key']}", seg_path)
+            if got != delta["sha256"]:
+                raise ValueError(f"delta {delta['generation']} SHA256 mismatch")
+    except Exception:
+        remove_delta_segments(segments)
+        raise
+    return segments
+
+
+def remove_delta_segments(segments):
+    for _, seg_path in segments:
+        try:
+            os.unlink(seg_path)
+        except OSError:
+            pass
+
+
+def prune_deltas(s3, bucket, prefix, keep):
+    """Delete delta segments whose key is not in `keep` (best effort).
+
+    `keep` holds the manifest-relative keys the current head references
+    (its "deltas" entries); pass an empty list only for a head without deltas.
+    """
+    keep = {f"{prefix}/{k}" for k in keep}
+    try:
+        stale = [k for k in list_keys(s3, bucket, f"{prefix}/deltas/") if k not in keep]
+        for i in range(0, len(stale), 1000):
+            s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": k} for k in stale[i:i + 1000]]})
+        return len(stale)
+    except Exception:
+        return 0
+
+
+# ─────────────────────────────────────────────────────────────────
+# Remote snapshot generations  (restore points sharing chunks)
+# ─────────────────────────────────────────────────────────────────
+
+GENERATION_TS_FORMAT = "%Y%m%dT%H%M%SZ"
+
+
+def list_keys(s3, bucket, prefix):
+    """All object keys under `prefix` (follows list pagination)."""
+    keys = []
+    kwargs = {"Bucket": bucket, "Prefix": prefix}
+    while True:
+        resp = s3.list_objects_v2(**kwargs)
+        keys.extend(o["Key"] for o in resp.get("Contents", []))
+        if not resp.get("IsTruncated"):
+            return keys
+        kwargs["ContinuationToken"] = resp["NextContinuationToken"]
+
+
+def next_generation(s3, bucket, prefix, remote_manifest):
+    """Generation number for the next head: one past the manifest and every record.
+
+    A push from an engine without generations leaves a manifest that lacks
+    the field; generation records then keep the numbering from restarting at 1.
+    """
+    current = int((remote_manifest or {}).get("generation") or 0)
+    if remote_manifest is not None and not current:
+        current = max([0] + [g for g, _, _ in list_generations(s3, bucket, prefix)])
+    return current + 1
+
+
+def get_generation_key(prefix, generation, when):
+    """generations/<generation>-<UTC time>.json — sortable, and --at needs only a LIST."""
+    return f"{prefix}/generations/{generation:010d}-{when.strftime(GENERATION_TS_FORMAT)}.json"
+
+
+def list_generations(s3, bucket, prefix):
+    """Return [(generation, utc datetime, key)] oldest first."""
+    gens = []
+    for key in list_keys(s3, bucket, f"{prefix}/generations/"):
+        name = key.rsplit("/", 1)[-1][:-len(".json")]
+        try:
+            num, ts = name.split("-", 1)
+            when = datetime.strptime(ts, GENERATION_TS_FORMAT).replace(tzinfo=timezone.utc)
+            gens.append((int(num), when, key))
+        except ValueError:
+            continue
+    return sorted(gens)
+
+
+def read_generation(s3, bucket, key):
+    resp = s3.get_object(Bucket=bucket, Key=key)
+    return json.loads(resp["Body"].read().decode())
+
+
+def select_retained_generations(gens, keep_last=None, hourly=None, daily=None, weekly=None):
+    """Generations kept by the retention policy (newest per hour/day/ISO week)."""
+    keep_last = GENERATIONS_KEEP_LAST if keep_last is None else keep_last
+    policy = (
+        ("%Y%m%d%H", GENERATIONS_KEEP_HOURLY if hourly is None else hourly),
+        ("%Y%m%d", GENERATIONS_KEEP_DAILY if daily is None else daily),
+        ("%G%V", GENERATIONS_KEEP_WEEKLY if weekly is None else weekly),
+    )
+    newest_first = sorted(gens, reverse=True)
+    keep = {g for g, _, _ in newest_first[:max(1, keep_last)]}
+    for fmt, count in policy:
+        periods = set()
+        for g, when, _ in newest_first:
+            if len(periods) >= count:
+                break
+            period = when.strftime(fmt)
+            if period not in periods:
+                periods.add(period)
+                keep.add(g)
+    return keep
+
+
+def apply_generation_retention(s3, bucket, prefix, head_manifest):
+    """Drop generations outside the policy, then chunks nothing references.
+
+    Runs under the push lock, so no concurrent push can be mid-way through
+    uploading chunks for a manifest that is not written yet.  The retained
+    generations are the grace period here: chunks go as soon as none of
+    them references a chunk.
+    Returns (pruned generations, deleted chunks).
+    """
+    gens = list_generations(s3, bucket, prefix)
+    keep = select_retained_generations(gens)
+    stale = [key for g, _, key in gens if g not in keep]
+    if not stale:
+        return 0, 0
+    for i in range(0, len(stale), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": k} for k in stale[i:i + 1000]]})
+
+    referenced = manifest_chunk_refs(head_manifest)
+    for g, _, key in gens:
+        if g in keep:
+            referenced |= manifest_chunk_refs(read_generation(s3, bucket, key))
+    return len(stale), prune_chunks(s3, bucket, prefix, referenced, grace=0)
+
+
+def prune_chunks(s3, bucket, prefix, referenced, grace=None, now=None):
+    """Delete chunks/<sha> objects unreferenced for at least `grace` seconds.
+
+    When a chunk was first seen outside `referenced` is kept in
+    chunks-gc.json; it is deleted by a later push once the grace period
+    (CHUNK_GC_GRACE_SECONDS by default) has passed, and leaves the ledger
+    if a head references it again.  Must run under the push lock (see
+    apply_generation_retention).  Returns the number of chunks deleted.
+    """
+    grace = CHUNK_GC_GRACE_SECONDS if grace is None else grace
+    now = time.time() if now is None else now
+    chunk_prefix = f"{prefix}/chunks/"
+    ledger_key = f"{prefix}/chunks-gc.json"
+    try:
+        ledger = json.loads(s3.get_object(Bucket=bucket, Key=ledger_key)["Body"].read().decode())
+    except s3.exceptions.NoSuchKey:
+        ledger = {}
+    orphans = [k[len(chunk_prefix):] for k in list_keys(s3, bucket, chunk_prefix)
+               if k[len(chunk_prefix):] not in referenced]
+    pending = {sha: ledger.get(sha, now) for sha in orphans}
+    expired = [f"{chunk_prefix}{sha}" for sha, since in pending.items() if now - since >= grace]
+    for i in range(0, len(expired), 1000):
+        s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": k} for k in expired[i:i + 1000]]})
+    for key in expired:
+        del pending[key[len(chunk_prefix):]]
+    if pending != ledger:
+        if pending:
+            s3.put_object(Bucket=bucket, Key=ledger_key, Body=json.dumps(pending).encode())
+        else:
+            s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": ledger_key}]})
+    return len(expired)
+
+
+def manifest_chunk_refs(manifest):
+    """Chunk hashes a manifest or generation record references (DB and vector set)."""
+    manifest = manifest or {}
+    refs = {c["sha256"] for c in manifest.get("chunks") or []}
+    for f in ((manifest.get("vector") or {}).get("files") or {}).values():
+        refs.update(c["sha256"] for c in f.get("chunks") or [])
+    return refs
+
+
+def find_generation(gens, generation=None, at=None):
+    """Pick a generation by number, or the newest one taken at or before `at`."""
+    if generation is not None:
+        return next((g for g in gens if g[0] == generation), None)
+    candidates = [g for g in gens if g[1] <= at]
+    return candidates[-1] if candidates else None
+
+
+# ─────────────────────────────────────────────────────────────────
+# Vector DB object set  (Chroma directory, chunked)
+# ─────────────────────────────────────────────────────────────────
+
+VECTOR_SQLITE_NAME = "chroma.sqlite3"
+VECTOR_SKIP_SUFFIXES = ("-wal", "-shm", "-journal", ".lock", ".tmp")
+
+
+def get_vector_db_dir():
+    return os.path.expanduser(VECTOR_DB_DIR)
+
+
+def get_vector_state_path(db_path):
+    """Local record of the vector set installed by the last pull."""
+    return f"{db_path}.vector-state.json"
+
+
+def list_vector_files(vector_dir):
+    """Relative paths of the files that make up the vector DB (sorted)."""
+    rels = []
+    for root, dirs, files in os.walk(vector_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in files:
+            if name.startswith(".") or name.endswith(VECTOR_SKIP_SUFFIXES):
+                continue
+            rels.append(os.path.relpath(os.path.join(root, name), vector_dir))
+    return sorted(rels)
+
+
+def snapshot_vector_set(vector_dir, out_dir):
+    """Copy the vector DB into `out_dir` without stopping the worker.
+
+    chroma.sqlite3 gets an online SQLite snapshot; index segment files are
+    cloned (reflink where supported) and rejected if rewritten meanwhile.
+    Returns [(relative path, copy path)].
+    """
+    copies = []
+    for rel in list_vector_files(vector_dir):
+        src = os.path.join(vector_dir, rel)
+        dst = os.path.join(out_dir, rel)
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        if rel == VECTOR_SQLITE_NAME:
+            create_online_snapshot(src, dst)
+        else:
+            before = file_identity(src)
+            if not reflink_file(src, dst):
+                shutil.copyfile(src, dst)
+            if file_identity(src) != before:
+                raise ValueError(f"{rel} changed while it was copied")
+        copies.append((rel, dst))
+    return copies
+
+
+def describe_vector_set(copies):
+    """Hash and chunk snapshot copies.
 
-    Keeps at most `max_count` newest snapshots AND removes anything older
-    than `max_days` days.  Runs silently on errors (non-critical path).
+    Returns (manifest entry, {rel: [(offset, size, sha256)]}).  The set
+    digest covers every file's path and SHA256, so any change shows.
     """
-    if max_days is None:
-        max_days = PULL_BACKUP_MAX_DAYS
-    if max_count is None:
-        max_count = PULL_BACKUP_MAX_COUNT
+    files, chunk_map = {}, {}
+    for rel, path in copies:
+        h = hashlib.sha256()
+        chunks = list(iter_chunks(path, h))
+        files[rel] = {
+            "sha256": h.hexdigest(),
+            "size": os.path.getsize(path),
+            "chunks": [{"sha256": c_sha, "size": c_size} for _, c_size, c_sha in chunks],
+        }
+        chunk_map[rel] = chunks
+    set_digest = hashlib.sha256("".join(
+        f"{rel}\0{f['sha256']}\n" for rel, f in sorted(files.items())).encode()).hexdigest()
+    entry = {"sha256": set_digest, "size": sum(f["size"] for f in files.values()), "files": files}
+    return entry, chunk_map
 
-    backup_base = os.path.expanduser("~/.claude-mem/backups/pull-overwrite")
-    if not os.path.isdir(backup_base):
-        return
 
-    # Sorted oldest → newest
-    dirs = sorted([
-        os.path.join(backup_base, d)
-        for d in os.listdir(backup_base)
-        if os.path.isdir(os.path.join(backup_base, d))
-    ])
+def read_vector_state(db_path):
+    try:
+        with open(get_vector_state_path(db_path)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    cutoff = time.time() - max_days * 86400
-    removed = 0
 
-    # Remove by age (oldest first)
-    for d in list(dirs):
-        try:
-            if os.path.getmtime(d) < cutoff:
-                shutil.rmtree(d)
-                dirs.remove(d)
-                removed += 1
-        except Exception:
-            pass
+def write_vector_state(db_path, vector_dir, entry):
+    """Remember the installed set with file identities (skips re-hashing next pull)."""
+    files = {}
+    for rel, f in entry["files"].items():
+        path = os.path.join(vector_dir, rel)
+        if os.path.exists(path):
+            files[rel] = {"sha256": f["sha256"], "identity": list(file_identity(path))}
+    state = {"sha256": entry["sha256"], "files": files}
+    tmp = get_vector_state_path(db_path) + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, get_vector_state_path(db_path))
 
-    # Remove by count (oldest first if still over limit)
-    while len(dirs) > max_count:
-        try:
-            shutil.rmtree(dirs.pop(0))
-            removed += 1
-        except Exception:
-            break
 
-    if removed:
-        print(f"  backup cleanup: removed {removed} old pull-overwrite snapshot(s)")
+def plan_vector_pull(entry, vector_dir, state):
+    """Return (files to fetch, local files to remove); both empty when current.
+
+    A local file is trusted without hashing while its identity matches the
+    state written when it was installed.
+    """
+    known = (state or {}).get("files") or {}
+    fetch = []
+    for rel, f in sorted(entry["files"].items()):
+        path = os.path.join(vector_dir, rel)
+        if not os.path.exists(path):
+            fetch.append(rel)
+            continue
+        st = known.get(rel) or {}
+        if st.get("sha256") == f["sha256"] and tuple(st.get("identity") or ()) == file_identity(path):
+            continue
+        if sha256_file(path) != f["sha256"]:
+            fetch.append(rel)
+    remove = []
+    if os.path.isdir(vector_dir):
+        remove = [rel for rel in list_vector_files(vector_dir) if rel not in entry["files"]]
+    return fetch, remove
+
+
+def fetch_vector_files(s3, bucket, prefix, entry, vector_dir, rels):
+    """Download `rels` of the remote set into a staging dir beside `vector_dir`.
+
+    Chunks the current local files already hold are reused.  Returns
+    (staging dir, fetched bytes); the caller installs or removes it.
+    """
+    parent = os.path.dirname(os.path.abspath(vector_dir))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=".vector-pull-", dir=parent)
+    fetched = 0
+    try:
+        for rel in rels:
+            f = entry["files"][rel]
+            out = os.path.join(staging, rel)
+            os.makedirs(os.path.dirname(out), exist_ok=True)
+            local = os.path.join(vector_dir, rel)
+            stats = download_chunked(s3, bucket, prefix, f["chunks"], out,
+                                     local_path=local if os.path.exists(local) else None)
+            if stats["sha256"] != f["sha256"]:
+                raise ValueError(f"vector file {rel} SHA256 mismatch")
+            fetched += stats["fetched_bytes"]
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    return staging, fetched
+
+
+def install_vector_files(vector_dir, staging, rels, remove):
+    """Move staged files into place (worker stopped) and drop files the set no longer has."""
+    for rel in rels:
+        dest = os.path.join(vector_dir, rel)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(os.path.join(staging, rel), dest)
+        if rel == VECTOR_SQLITE_NAME:
+            # A WAL left over from the old file must never be replayed onto the new one
+            for suffix in ("-wal", "-shm"):
+                if os.path.exists(dest + suffix):
+                    os.unlink(dest + suffix)
+    for rel in remove:
+        os.unlink(os.path.join(vector_dir, rel))
+    if staging:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def pull_vector_only(s3, bucket, prefix, manifest, db_path, canonical_id):
+    """Bring the vector DB up to the head when claude-mem.db itself is current.
+
+    Used on pull paths that do not replace the DB.  Stops the worker only
+    if files actually change.  Never overwrites the primary's vector DB.
+    """
+    entry = (manifest or {}).get("vector")
+    if not VECTOR_SYNC or not entry:
+        return
+    vector_dir = get_vector_db_dir()
+    state = read_vector_state(db_path)
+    fetch, remove = plan_vector_pull(entry, vector_dir, state)
+    if not fetch and not remove:
+        if (state or {}).get("sha256") != entry["sha256"]:
+            write_vector_state(db_path, vector_dir, entry)
+        print("  vector DB: up to date")
+        return
+    if LEADERSHIP_ENABLED:
+        try:
+            role, _, _ = determine_role(s3, bucket, canonical_id)
+            if role == "primary":
+                print("  vector DB: differs from remote — primary keeps its own (push to publish)")
+                return
+        except Exception as e:
+            print(f"  [leadership] check failed ({e}) — proceeding without role enforcement")
+    try:
+        staging, fetched = fetch_vector_files(s3, bucket, prefix, entry, vector_dir, fetch)
+    except Exception as e:
+        print(f"  WARNING: vector DB download failed: {e}")
+        return
+    worker_was_running = stop_worker()
+    if worker_was_running:
+        time.sleep(0.5)
+    install_vector_files(vector_dir, staging, fetch, remove)
+    write_vector_state(db_path, vector_dir, entry)
+    print(f"  vector DB: {len(fetch)} file(s) updated ({fetched} bytes fetched), {len(remove)} removed")
+    if worker_was_running and not NO_RESTART_WORKER:
+        start_worker()
 
 
 # ─────────────────────────────────────────────────────────────────
@@ -486,6 +2446,7 @@ def determine_role(s3, bucket, canonical_id):
             return "primary", lease, True
 
         # Not our lease to renew — re-read to see if another node wrote a fresh one
+        revalidate(s3, bucket, get_lease_key(canonical_id))
         lease2 = read_lease(s3, bucket, canonical_id)
         if lease2 and lease2.get("expires_at", 0) >= now:
             p2 = lease2.get("primary_node_id", "")
@@ -498,11 +2459,12 @@ def determine_role(s3, bucket, canonical_id):
     return role, lease, False
 
 
+@with_meta_cache
 def leadership_info():
     """Print leadership lease and this node's current role."""
     cfg = load_config()
     canonical_id = resolve_canonical_id(cfg)
-    s3 = get_s3_client(cfg)
+    s3 = meta_cached(get_s3_client(cfg))
     bucket = cfg["MINIO_BUCKET"]
 
     print("=== Leadership Lease ===")
@@ -540,6 +2502,110 @@ def leadership_info():
         sys.exit(1)
 
 
+def download_remote_db(s3, bucket, prefix, manifest, remote_sha, out_path, local_path=None):
+    """Download the remote base DB into `out_path`, hashing while writing.
+
+    Follows the manifest format (chunked, compressed or full object); a
+    manifest that does not describe `remote_sha` falls back to the full
+    object.  Returns (sha256 of out_path, TransferPhase).
+    """
+    chunks = (manifest or {}).get("chunks")
+    compression = (manifest or {}).get("compression")
+    if (chunks or compression) and (manifest or {}).get("sha256") != remote_sha:
+        print("  manifest does not match remote SHA256 — falling back to full download")
+        chunks = compression = None
+    with TransferPhase("download") as ph:
+        if chunks:
+            stats = download_chunked(s3, bucket, prefix, chunks, out_path, local_path=local_path)
+            sha = stats["sha256"]
+            ph.nbytes = stats["fetched_bytes"]
+            print(f"  chunks: {len(chunks)} total, {stats['reused']} reused locally "
+                  f"({stats['reused_bytes']} bytes), {stats['fetched']} fetched "
+                  f"({stats['fetched_bytes']} bytes)")
+        elif compression:
+            # Decompressed straight into out_path; digest covers the raw DB
+            codec = compression["codec"]
+            sha, _ = download_and_hash(
+                s3, bucket, f"{prefix}/{compression['key']}", out_path, codec=codec)
+            ph.nbytes = compression.get("compressed_size", 0)
+            print(f"  compressed object: {compression['key']} ({codec}, {ph.nbytes} bytes)")
+        else:
+            sha, ph.nbytes = download_and_hash(s3, bucket, f"{prefix}/claude-mem.db", out_path)
+    return sha, ph
+
+
+def apply_remote_deltas(s3, bucket, prefix, deltas, path):
+    """Download `deltas`, append them to `path`, and return its new SHA256."""
+    segments = download_delta_segments(s3, bucket, prefix, deltas, os.path.dirname(path))
+    try:
+        apply_delta_segments(path, segments)
+    finally:
+        remove_delta_segments(segments)
+    return sha256_file(path)
+
+
+# ─────────────────────────────────────────────────────────────────
+# Prefetch staging  (download + verify ahead of the SessionStart pull)
+# ─────────────────────────────────────────────────────────────────
+
+def get_staging_paths(db_path):
+    """Return (staged DB, staging metadata) paths next to the live DB."""
+    return db_path + ".staged", db_path + ".staged.json"
+
+
+def discard_staged_snapshot(db_path):
+    for path in get_staging_paths(db_path):
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def read_staging_meta(db_path):
+    staged_path, meta_path = get_staging_paths(db_path)
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        if list(file_identity(staged_path)) != meta.get("identity"):
+            return None
+    except OSError:
+        return None
+    return meta
+
+
+def staging_is_fresh(meta, manifest, remote_sha):
+    """True if staged metadata describes the head `manifest` / `remote_sha`."""
+    if not meta or meta.get("base_sha256") != remote_sha:
+        return False
+    manifest = manifest or {}
+    # A vector-only push bumps the generation without touching claude-mem.db
+    return (meta.get("generation") == manifest.get("generation")
+            or (manifest.get("head_sha256") is not None and meta.get("sha256") == manifest["head_sha256"]))
+
+
+def take_staged_snapshot(db_path, manifest, remote_sha):
+    """Claim a fresh prefetched snapshot for pull.
+
+    Returns (staged path, sha256) if the staging file matches the head and is
+    untouched since it was verified; otherwise discards any stale staging
+    and returns None.  The caller replaces the DB with the returned path.
+    """
+    meta = read_staging_meta(db_path)
+    staged_path, meta_path = get_staging_paths(db_path)
+    if not staging_is_fresh(meta, manifest, remote_sha):
+        if os.path.exists(staged_path) or os.path.exists(meta_path):
+            print("  discarding stale prefetched snapshot")
+            discard_staged_snapshot(db_path)
+        return None
+    os.unlink(meta_path)
+    return staged_path, meta["sha256"]
+
+
+@with_events
+@with_meta_cache
 def pull_sqlite():
     """Pull SQLite DB from MinIO and atomically replace local copy."""
     cfg = load_config()
@@ -555,6 +2621,8 @@ def pull_sqlite():
     remote_obs = 0
     local_ahead = False
     backup_dir = None
+    remote_manifest = None
+    phases = []
 
     print(f"=== claude-mem MinIO pull sync ===")
     print(f"  project:      {project_name}")
@@ -563,32 +2631,56 @@ def pull_sqlite():
     print(f"  local db:     {db_path}")
     print()
 
-    s3 = get_s3_client(cfg)
+    s3 = meta_cached(get_s3_client(cfg))
     bucket = cfg["MINIO_BUCKET"]
 
-    # --- Download remote SHA256 ---
-    print("[1/7] Downloading remote SHA256...")
+    # --- Read remote head (manifest first, legacy .sha256 fallback) ---
+    print("[1/7] Reading remote head manifest...")
     sha_key = f"{prefix}/claude-mem.db.sha256"
     try:
-        resp = s3.get_object(Bucket=bucket, Key=sha_key)
-        remote_sha = resp["Body"].read().decode().strip().split()[0]
+        remote_manifest, remote_sha = get_remote_head(s3, bucket, prefix)
         print(f"  remote SHA256: {remote_sha}")
+        emit_event("digest", role="remote", sha256=remote_sha,
+                   generation=(remote_manifest or {}).get("generation"))
+        if remote_manifest and remote_manifest.get("generation"):
+            print(f"  generation:    {remote_manifest['generation']} "
+                  f"(writer={remote_manifest.get('writer_node', '?')})")
+        else:
+            print(f"  legacy head: {sha_key}")
     except s3.exceptions.NoSuchKey:
-        print(f"  ERROR: {sha_key} not found in bucket")
+        print(f"  ERROR: no manifest.json or {sha_key} in bucket")
         sys.exit(1)
 
     # --- Compare with local ---
     print("[2/7] Comparing with local DB...")
+    remote_deltas = (remote_manifest or {}).get("deltas") or []
     db_size_before = 0
     if os.path.exists(db_path):
-        local_sha = sha256_file(db_path)
         db_size_before = os.path.getsize(db_path)
-        print(f"  local SHA256:  {local_sha}")
+        with TransferPhase("hash", db_size_before) as ph:
+            local_sha, cache_hit = cached_sha256(db_path)
+        if not cache_hit:
+            phases.append(ph)
+        print(f"  local SHA256:  {local_sha}{' (cached)' if cache_hit else ''}")
+        emit_event("digest", role="local", sha256=local_sha, cached=cache_hit)
         print(f"  local size:    {db_size_before} bytes")
-        if local_sha == remote_sha:
+        if local_sha == remote_sha and not remote_deltas:
             print("  RESULT: already up to date")
+            emit_event("decision", decision="up_to_date")
+            pull_vector_only(s3, bucket, prefix, remote_manifest, db_path, canonical_id)
             sys.exit(0)
-        print("  SHA256 mismatch — pulling remote DB")
+        delta_plan = plan_delta_pull(remote_manifest, local_sha, read_delta_state(db_path))
+        if delta_plan == []:
+            print(f"  RESULT: already up to date (generation {remote_manifest['generation']} via deltas)")
+            emit_event("decision", decision="up_to_date", via="deltas")
+            pull_vector_only(s3, bucket, prefix, remote_manifest, db_path, canonical_id)
+            sys.exit(0)
+        if delta_plan:
+            print(f"  {len(delta_plan)} delta segment(s) behind — appending in place")
+            emit_event("decision", decision="delta", deltas=len(delta_plan))
+        else:
+            print("  SHA256 mismatch — pulling remote DB")
+            emit_event("decision", decision="full_pull", reason="sha256_mismatch")
 
         # --- Leadership gate: primary refuses destructive pull overwrite ---
         if LEADERSHIP_ENABLED:
@@ -605,13 +2697,44 @@ def pull_sqlite():
                     print("    - Inspect: download remote DB to a temp path and compare")
                     print("    - Override (unsafe): ALLOW_PRIMARY_PULL_OVERRIDE=1")
                     print(f"    - Handover: POST /projects/{canonical_id}/leadership/select")
+                    emit_event("decision", decision="refused", reason="primary")
                     sys.exit(2)
             except Exception as _e:
                 print(f"  [leadership] check failed ({_e}) — proceeding without role enforcement")
 
+        # --- Incremental: append delta segments to the live DB, no replace ---
+        if delta_plan:
+            try:
+                with TransferPhase("download") as ph:
+                    segments = download_delta_segments(
+                        s3, bucket, prefix, delta_plan, os.path.dirname(db_path))
+                    ph.nbytes = sum(d["size"] for d in delta_plan)
+                phases.append(ph)
+                try:
+                    applied = apply_delta_segments(db_path, segments)
+                finally:
+                    remove_delta_segments(segments)
+                new_sha = sha256_file(db_path)
+                write_digest_cache(db_path, new_sha)
+                write_delta_state(db_path, remote_manifest["generation"], remote_sha, new_sha)
+                pull_vector_only(s3, bucket, prefix, remote_manifest, db_path, canonical_id)
+                print()
+                print("=" * 40)
+                print("SYNC COMPLETE (incremental)")
+                print("=" * 40)
+                print(f"  canonical_id:    {canonical_id}")
+                print(f"  generation:      {remote_manifest['generation']}")
+                print(f"  deltas applied:  {len(delta_plan)}")
+                for table, n in sorted(applied.items()):
+                    print(f"  {table + ':':<17}+{n} rows")
+                print_phases(phases)
+                sys.exit(0)
+            except Exception as e:
+                print(f"  incremental apply failed ({e}) — falling back to full pull")
+                emit_event("decision", decision="full_pull", reason="delta_apply_failed")
+
         # --- Local-ahead guard: compare observation counts before overwrite ---
         local_obs = get_local_obs_count(db_path)
-        remote_manifest = get_remote_manifest(s3, bucket, prefix)
         remote_obs = remote_manifest.get("observations", 0) if remote_manifest else 0
         if local_obs is not None and local_obs > remote_obs:
             local_ahead = True
@@ -621,32 +2744,73 @@ def pull_sqlite():
             print(f"  obs check: local={local_obs} remote={remote_obs}")
     else:
         print("  local DB does not exist — pulling remote")
+        emit_event("decision", decision="full_pull", reason="no_local_db")
 
     # --- Download remote DB to temp file ---
     print("[3/7] Downloading remote DB...")
-    db_key = f"{prefix}/claude-mem.db"
     db_dir = os.path.dirname(db_path)
-    fd, tmp_path = tempfile.mkstemp(suffix=".db.tmp", dir=db_dir)
-    os.close(fd)
-    try:
-        s3.download_file(bucket, db_key, tmp_path)
-        tmp_size = os.path.getsize(tmp_path)
-        print(f"  downloaded: {tmp_size} bytes → {tmp_path}")
-    except Exception as e:
-        os.unlink(tmp_path)
-        print(f"  ERROR downloading: {e}")
-        sys.exit(1)
+    staged = take_staged_snapshot(db_path, remote_manifest, remote_sha)
+    if staged:
+        # Prefetched and verified in the background — only the swap is left
+        tmp_path, expected_sha = staged
+        print(f"  using prefetched snapshot: {tmp_path} (no download)")
+        emit_event("decision", decision="use_staged", path=tmp_path)
+        print("[4/7] Verifying SHA256...")
+        print("  verified at prefetch, staging file unchanged since")
+    else:
+        fd, tmp_path = tempfile.mkstemp(suffix=".db.tmp", dir=db_dir)
+        os.close(fd)
+        try:
+            # The digest is computed while bytes are written — no re-read of tmp_path
+            downloaded_sha, ph = download_remote_db(
+                s3, bucket, prefix, remote_manifest, remote_sha, tmp_path, local_path=db_path)
+            phases.append(ph)
+            tmp_size = os.path.getsize(tmp_path)
+            print(f"  downloaded: {tmp_size} bytes → {tmp_path}")
+            print(f"  {ph}")
+        except Exception as e:
+            os.unlink(tmp_path)
+            print(f"  ERROR downloading: {e}")
+            sys.exit(1)
 
-    # --- Verify SHA256 ---
-    print("[4/7] Verifying SHA256...")
-    downloaded_sha = sha256_file(tmp_path)
-    if downloaded_sha != remote_sha:
-        os.unlink(tmp_path)
-        print(f"  ERROR: SHA256 mismatch!")
-        print(f"    expected: {remote_sha}")
-        print(f"    got:      {downloaded_sha}")
-        sys.exit(1)
-    print("  SHA256 verified OK")
+        # --- Verify SHA256 ---
+        print("[4/7] Verifying SHA256...")
+        if downloaded_sha != remote_sha:
+            os.unlink(tmp_path)
+            print(f"  ERROR: SHA256 mismatch!")
+            print(f"    expected: {remote_sha}")
+            print(f"    got:      {downloaded_sha}")
+            sys.exit(1)
+        print("  SHA256 verified OK")
+        emit_event("digest", role="download", sha256=downloaded_sha, verified=True)
+
+        # --- Incremental: bring the base up to the head generation ---
+        expected_sha = remote_sha
+        if remote_deltas:
+            print(f"  applying {len(remote_deltas)} delta segment(s) on top of the base")
+            try:
+                expected_sha = apply_remote_deltas(s3, bucket, prefix, remote_deltas, tmp_path)
+            except Exception as e:
+                os.unlink(tmp_path)
+                print(f"  ERROR applying deltas: {e}")
+                sys.exit(1)
+
+    # --- Vector DB: stage changed files now, install while the worker is stopped ---
+    vector_entry = (remote_manifest or {}).get("vector") if VECTOR_SYNC else None
+    vector_staging = None
+    if vector_entry:
+        vector_dir = get_vector_db_dir()
+        vector_fetch, vector_remove = plan_vector_pull(vector_entry, vector_dir, read_vector_state(db_path))
+        if vector_fetch:
+            try:
+                with TransferPhase("vector") as ph:
+                    vector_staging, ph.nbytes = fetch_vector_files(
+                        s3, bucket, prefix, vector_entry, vector_dir, vector_fetch)
+                phases.append(ph)
+                print(f"  vector DB: {len(vector_fetch)} file(s) staged")
+            except Exception as e:
+                vector_entry = None
+                print(f"  WARNING: vector DB download failed ({e}) — keeping local vector DB")
 
     # --- Safety backup before overwrite ---
     if os.path.exists(db_path):
@@ -663,15 +2827,22 @@ def pull_sqlite():
     # --- Stop worker ---
     print("[6/7] Stopping worker for atomic replace...")
     worker_was_running = stop_worker()
-    # Small delay to release file locks
-    time.sleep(0.5)
+    if worker_was_running:
+        # Small delay to release file locks
+        time.sleep(0.5)
 
     # --- Atomic replace ---
     print("[7/7] Atomic replace...")
+    tmp_identity = file_identity(tmp_path)
     os.replace(tmp_path, db_path)
     db_size_after = os.path.getsize(db_path)
     print(f"  replaced: {db_path}")
     print(f"  new size: {db_size_after} bytes")
+    if vector_entry:
+        install_vector_files(vector_dir, vector_staging, vector_fetch if vector_staging else [], vector_remove)
+        write_vector_state(db_path, vector_dir, vector_entry)
+        print(f"  vector DB: {len(vector_fetch) if vector_staging else 0} file(s) replaced, "
+              f"{len(vector_remove)} removed")
 
     # --- Verify DB integrity ---
     print()
@@ -692,14 +2863,23 @@ def pull_sqlite():
     except Exception as e:
         print(f"  ERROR verifying DB: {e}")
 
-    # --- Post-replace SHA256 check ---
-    final_sha = sha256_file(db_path)
-    if final_sha != remote_sha:
-        print(f"  WARNING: post-replace SHA256 mismatch!")
-        print(f"    expected: {remote_sha}")
-        print(f"    got:      {final_sha}")
+    # --- Post-replace check ---
+    # The rename keeps the verified inode, so the download digest still holds
+    # as long as the file identity is unchanged; only re-hash if it moved.
+    replaced_identity = file_identity(db_path)
+    if replaced_identity[:2] == tmp_identity[:2]:
+        print(f"  SHA256 post-replace: OK (digest reused from download)")
+        write_digest_cache(db_path, expected_sha, replaced_identity)
     else:
-        print(f"  SHA256 post-replace: OK")
+        final_sha = sha256_file(db_path)
+        if final_sha != expected_sha:
+            print(f"  WARNING: post-replace SHA256 mismatch!")
+            print(f"    expected: {expected_sha}")
+            print(f"    got:      {final_sha}")
+        else:
+            print(f"  SHA256 post-replace: OK")
+    if remote_deltas:
+        write_delta_state(db_path, remote_manifest["generation"], remote_sha, expected_sha)
 
     # --- Conditionally restart worker ---
     worker_ok = None
@@ -712,10 +2892,13 @@ def pull_sqlite():
         time.sleep(1)
         worker_ok = start_worker()
         time.sleep(2)
-        post_worker_sha = sha256_file(db_path)
-        if post_worker_sha != remote_sha:
+        if file_identity(db_path) == replaced_identity:
+            post_worker_sha = expected_sha
+        else:
+            post_worker_sha, _ = cached_sha256(db_path)
+        if post_worker_sha != expected_sha:
             print(f"  WARNING: worker may have overwritten DB!")
-            print(f"    expected: {remote_sha}")
+            print(f"    expected: {expected_sha}")
             print(f"    got:      {post_worker_sha}")
         else:
             print(f"  DB intact after worker start: OK")
@@ -740,8 +2923,180 @@ def pull_sqlite():
         print(f"  worker restart:  {'OK' if worker_ok else 'FAILED'}")
     print(f"  observations:    {obs_count}")
     print(f"  summaries:       {sess_count}")
+    print_phases(phases)
+
+
+@with_events
+@with_meta_cache
+def prefetch_sqlite():
+    """Download and verify the remote head into a staging file next to the DB.
+
+    No worker stop, backup or replace: the next pull_sqlite() only checks
+    that the staged generation is still the head and swaps it in.
+    """
+    cfg = load_config()
+
+    canonical_id = resolve_canonical_id(cfg)
+    prefix = f"projects/{canonical_id}/sqlite"
+    db_path = cfg["CLAUDE_MEM_DB"]
+    staged_path, meta_path = get_staging_paths(db_path)
+
+    print("=== claude-mem MinIO prefetch ===")
+    print(f"  project:      {cfg['CLAUDE_PROJECT_ID']}")
+    print(f"  canonical_id: {canonical_id}")
+    print(f"  staging:      {staged_path}")
+    print()
+
+    s3 = meta_cached(get_s3_client(cfg))
+    bucket = cfg["MINIO_BUCKET"]
+
+    print("[1/3] Reading remote head manifest...")
+    try:
+        manifest, remote_sha = get_remote_head(s3, bucket, prefix)
+    except s3.exceptions.NoSuchKey:
+        print("  ERROR: no manifest.json or claude-mem.db.sha256 in bucket")
+        sys.exit(1)
+    generation = (manifest or {}).get("generation")
+    deltas = (manifest or {}).get("deltas") or []
+    print(f"  remote SHA256: {remote_sha}")
+    print(f"  generation:    {generation or 'legacy'}")
+
+    print("[2/3] Checking local DB and staging...")
+    if os.path.exists(db_path):
+        local_sha, _ = cached_sha256(db_path)
+        if local_sha == remote_sha and not deltas:
+            discard_staged_snapshot(db_path)
+            print("  RESULT: local DB is current — nothing to stage")
+            emit_event("decision", decision="skip", reason="current")
+            sys.exit(0)
+        if plan_delta_pull(manifest, local_sha, read_delta_state(db_path)) is not None:
+            # Pull appends a few delta rows in place; the local DB still lacks them
+            discard_staged_snapshot(db_path)
+            print("  RESULT: local DB is delta-reachable — nothing to stage, pull applies the deltas")
+            emit_event("decision", decision="skip", reason="delta_reachable")
+            sys.exit(0)
+    if staging_is_fresh(read_staging_meta(db_path), manifest, remote_sha):
+        print(f"  RESULT: staging already holds generation {generation or 'legacy'}")
+        emit_event("decision", decision="skip", reason="already_staged")
+        sys.exit(0)
+    discard_staged_snapshot(db_path)
+
+    print("[3/3] Downloading into staging...")
+    fd, tmp_path = tempfile.mkstemp(suffix=".db.tmp", dir=os.path.dirname(db_path))
+    os.close(fd)
+    try:
+        sha, ph = download_remote_db(s3, bucket, prefix, manifest, remote_sha, tmp_path,
+                                     local_path=db_path)
+        if sha != remote_sha:
+            raise ValueError(f"SHA256 mismatch (expected {remote_sha}, got {sha})")
+        if deltas:
+            print(f"  applying {len(deltas)} delta segment(s) on top of the base")
+            sha = apply_remote_deltas(s3, bucket, prefix, deltas, tmp_path)
+        os.replace(tmp_path, staged_path)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        print(f"  ERROR prefetching: {e}")
+        sys.exit(1)
+
+    # Metadata last: a staging file without it is never used
+    meta = {
+        "generation": generation,
+        "base_sha256": remote_sha,
+        "sha256": sha,
+        "identity": list(file_identity(staged_path)),
+        "staged_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with open(meta_path + ".tmp", "w") as f:
+        json.dump(meta, f)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    print()
+    print("=" * 40)
+    print("PREFETCH COMPLETE")
+    print("=" * 40)
+    print(f"  staged:          {staged_path} ({os.path.getsize(staged_path)} bytes)")
+    print(f"  SHA256:          {sha}")
+    print(f"  generation:      {generation or 'legacy'}")
+    print_phases([ph])
+
+
+@with_events
+def restore_sqlite(argv=None):
+    """Rebuild claude-mem.db as of a remote snapshot generation.
+
+    CLI: sqlite_minio_sync.py restore_sqlite --generation N | --at TIME | --list [--output PATH]
+    Chunks the local DB already holds are reused; only missing ones are
+    fetched.  The result goes to a new file next to CLAUDE_MEM_DB.
+    """
+    parser = argparse.ArgumentParser(prog="sqlite_minio_sync.py restore_sqlite")
+    which = parser.add_mutually_exclusive_group(required=True)
+    which.add_argument("--generation", type=int, help="generation number to restore")
+    which.add_argument("--at", help="newest generation at or before this ISO time (UTC if no offset)")
+    which.add_argument("--list", action="store_true", help="list the retained generations")
+    parser.add_argument("--output", help="destination file (default: <db>.gen<N>)")
+    args = parser.parse_args(sys.argv[2:] if argv is None else argv)
+
+    cfg = load_config()
+    canonical_id = resolve_canonical_id(cfg)
+    prefix = f"projects/{canonical_id}/sqlite"
+    db_path = cfg["CLAUDE_MEM_DB"]
+    s3 = get_s3_client(cfg)
+    bucket = cfg["MINIO_BUCKET"]
+
+    gens = list_generations(s3, bucket, prefix)
+    if args.list:
+        for g, when, _ in gens:
+            print(f"  {g:>6}  {when.isoformat()}")
+        if not gens:
+            print("  no generations (is SNAPSHOT_GENERATIONS=1 set on the pushing node?)")
+        return gens
+
+    at = None
+    if args.at:
+        try:
+            at = datetime.fromisoformat(args.at)
+        except ValueError:
+            print(f"ERROR: cannot parse --at {args.at!r} (expected ISO 8601)")
+            sys.exit(1)
+        if at.tzinfo is None:
+            at = at.replace(tzinfo=timezone.utc)
+    found = find_generation(gens, generation=args.generation, at=at)
+    if found is None:
+        print(f"ERROR: no generation matches {args.at or args.generation} "
+              f"({len(gens)} retained: run with --list)")
+        sys.exit(1)
+    generation, when, key = found
+    record = read_generation(s3, bucket, key)
+    dest = args.output or f"{db_path}.gen{generation}"
+
+    print(f"=== claude-mem restore: generation {generation} ({when.isoformat()}) ===")
+    fd, tmp_path = tempfile.mkstemp(suffix=".db.tmp", dir=os.path.dirname(os.path.abspath(dest)))
+    os.close(fd)
+    try:
+        with TransferPhase("download") as ph:
+            stats = download_chunked(s3, bucket, prefix, record["chunks"], tmp_path, local_path=db_path)
+            ph.nbytes = stats["fetched_bytes"]
+        if stats["sha256"] != record["sha256"]:
+            raise ValueError(f"SHA256 mismatch (expected {record['sha256']}, got {stats['sha256']})")
+        os.replace(tmp_path, dest)
+    except Exception as e:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        print(f"ERROR: restore failed: {e}")
+        sys.exit(1)
 
+    print(f"  chunks: {stats['reused']} reused locally, {stats['fetched']} fetched "
+          f"({stats['fetched_bytes']} bytes)")
+    print(f"  SHA256: {record['sha256']}")
+    print_phases([ph])
+    print(f"restored: {dest}")
+    print(f"  stop the worker, then: mv {dest} {db_path}")
+    return dest
 
+
+@with_events
+@with_meta_cache
 def push_sqlite():
     """Push local SQLite DB to MinIO with integrity checks."""
     cfg = load_config()
@@ -763,52 +3118,110 @@ def push_sqlite():
         print("ERROR: local DB does not exist")
         sys.exit(1)
 
-    s3 = get_s3_client(cfg)
+    s3 = meta_cached(get_s3_client(cfg))
     bucket = cfg["MINIO_BUCKET"]
 
     # --- Leadership gate: secondary cannot push ---
+    lease_epoch = None
     if LEADERSHIP_ENABLED:
         try:
             role, lease, _ = determine_role(s3, bucket, canonical_id)
+            lease_epoch = lease.get("epoch")
             primary_node = lease.get("primary_node_id", "?")
-            print(f"[0/6] Leadership: role={role}  node={NODE_ID}  primary={primary_node}")
+            print(f"[1/8] Leadership: role={role}  node={NODE_ID}  primary={primary_node}")
             if role == "secondary" and not ALLOW_SECONDARY_PUSH:
                 print("  SECONDARY: push blocked by default.")
                 print("  Secondary nodes must not push — only the primary is the source of truth.")
                 print("  Options:")
                 print(f"    - Request promotion: POST /projects/{canonical_id}/leadership/select")
                 print("    - Override (unsafe): ALLOW_SECONDARY_PUSH=1")
+                emit_event("decision", decision="refused", reason="secondary")
                 sys.exit(3)
             print()
         except Exception as _e:
-            print(f"[0/6] Leadership check failed ({_e}) — proceeding without role enforcement")
+            print(f"[1/8] Leadership check failed ({_e}) — proceeding without role enforcement")
             print()
 
-    # --- Stop worker for consistent snapshot ---
-    print("[1/6] Stopping worker for consistent snapshot...")
-    stop_worker()
-    time.sleep(0.5)
+    # --- Pre-check: skip the snapshot if nothing changed since the last push ---
+    # Taken before the snapshot: a write racing it only makes the next push re-check.
+    fingerprint = db_fingerprint(db_path)
+    vector_fp = dir_fingerprint(get_vector_db_dir()) if VECTOR_SYNC else None
+
+    def _record_push(sha, vector_sha, generation):
+        write_push_state(db_path, canonical_id, {
+            "fingerprint": fingerprint,
+            "vector_fingerprint": vector_fp,
+            "sha256": sha,
+            "vector_sha256": vector_sha,
+            "generation": generation,
+            "pushed_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    push_state = read_push_state(db_path, canonical_id) if PUSH_PRECHECK else None
+    unchanged = check_push_state(s3, bucket, prefix, canonical_id, push_state, fingerprint, vector_fp)
+    if unchanged is not None:
+        if unchanged:
+            print(f"Pre-check: DB unchanged since push of generation {push_state.get('generation')}")
+            print("  RESULT: remote already up to date")
+            emit_event("decision", decision="up_to_date", via="precheck")
+            sys.exit(0)
+        print("Pre-check: local DB unchanged but remote head moved — full push")
+        print()
+
+    # --- Stop worker for consistent snapshot (legacy mode only) ---
+    phases = []
+    online = SNAPSHOT_MODE == "online"
+    worker_down_at = None
+    if online:
+        print("[2/8] Online snapshot — worker keeps running")
+    else:
+        print("[2/8] Stopping worker for consistent snapshot...")
+        if stop_worker():
+            worker_down_at = time.time()
+        time.sleep(0.5)
 
     # --- VACUUM + integrity check on a snapshot copy ---
-    print("[2/6] Creating consistent snapshot...")
+    print("[3/8] Creating consistent snapshot...")
     db_dir = os.path.dirname(db_path)
     fd, snap_path = tempfile.mkstemp(suffix=".snap.db", dir=db_dir)
     os.close(fd)
+    snap_phase = TransferPhase("snapshot").start()
     try:
-        conn = sqlite3.connect(db_path)
-        # Run integrity check on source
-        ic = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        # Integrity check on the source pages, before VACUUM rewrites them:
+        # quick_check on the hot path, the full O(DB size) check only when due
+        integrity_state = read_integrity_state(db_path)
+        full_reason = full_check_due(integrity_state)
+        integrity_level = "full" if full_reason else "quick"
+        if online:
+            ic = None
+
+            def _check(conn):
+                nonlocal ic
+                ic = run_integrity_check(conn, full=bool(full_reason))
+                return ic == "ok"
+
+            journal_mode = create_online_snapshot(db_path, snap_path, check=_check)
+            print(f"  online snapshot taken (journal_mode={journal_mode})")
+        else:
+            conn = sqlite3.connect(db_path)
+            ic = run_integrity_check(conn, full=bool(full_reason))
+        integrity_state = record_integrity_check(db_path, integrity_state, bool(full_reason), ic)
+        print(f"  integrity: {integrity_level} check {ic}" + (f" ({full_reason})" if full_reason else ""))
         if ic != "ok":
-            conn.close()
+            if not online:
+                conn.close()
             os.unlink(snap_path)
             print(f"  ERROR: source DB integrity check failed: {ic}")
-            start_worker()
+            if not online:
+                start_worker()
             sys.exit(1)
 
-        # VACUUM INTO creates a clean, defragmented copy
-        conn.execute(f"VACUUM INTO '{snap_path}'")
-        conn.close()
+        if not online:
+            # VACUUM INTO creates a clean, defragmented copy
+            conn.execute(f"VACUUM INTO '{snap_path}'")
+            conn.close()
         snap_size = os.path.getsize(snap_path)
+        phases.append(snap_phase.stop(snap_size))
         print(f"  snapshot: {snap_size} bytes (VACUUM'd)")
 
         # Read counts from snapshot
@@ -834,41 +3247,91 @@ def push_sqlite():
         if os.path.exists(snap_path):
             os.unlink(snap_path)
         print(f"  ERROR creating snapshot: {e}")
-        start_worker()
+        if not online:
+            start_worker()
         sys.exit(1)
 
     # --- Restart worker early (snapshot is independent now) ---
     print()
-    print("[3/6] Restarting worker...")
-    time.sleep(1)
-    worker_ok = start_worker()
+    if online:
+        print("[4/8] Worker restart not needed (online snapshot)")
+        worker_ok = None
+    else:
+        print("[4/8] Restarting worker...")
+        time.sleep(1)
+        worker_ok = start_worker()
+    worker_downtime = time.time() - worker_down_at if worker_down_at else 0.0
 
     # --- Compute SHA256 of snapshot ---
     print()
-    print("[4/6] Computing SHA256...")
-    local_sha = sha256_file(snap_path)
+    # VACUUM INTO exposes no output stream, so the snapshot is read once right
+    # after it was written (still in page cache); chunking shares that pass.
+    print("[5/8] Computing SHA256...")
+    snap_chunks = None
+    with TransferPhase("hash", snap_size) as ph:
+        if CHUNKED_SYNC or SNAPSHOT_GENERATIONS:
+            file_hash = hashlib.sha256()
+            snap_chunks = list(iter_chunks(snap_path, file_hash))
+            local_sha = file_hash.hexdigest()
+        else:
+            local_sha = sha256_file(snap_path)
+    phases.append(ph)
     print(f"  SHA256: {local_sha}")
+    emit_event("digest", role="snapshot", sha256=local_sha, bytes=snap_size)
+
+    # --- Vector DB: snapshot + hash the Chroma directory (failure skips it) ---
+    vector_entry = vector_chunks = vector_snap_dir = None
+    vector_dir = get_vector_db_dir()
+    if VECTOR_SYNC and os.path.exists(os.path.join(vector_dir, VECTOR_SQLITE_NAME)):
+        vector_snap_dir = tempfile.mkdtemp(prefix=".vector-snap-", dir=db_dir)
+        try:
+            with TransferPhase("vector-hash") as ph:
+                vector_copies = snapshot_vector_set(vector_dir, vector_snap_dir)
+                vector_entry, vector_chunks = describe_vector_set(vector_copies)
+                ph.nbytes = vector_entry["size"]
+            phases.append(ph)
+            print(f"  vector set: {len(vector_copies)} file(s), {vector_entry['size']} bytes, "
+                  f"SHA256 {vector_entry['sha256']}")
+        except Exception as e:
+            vector_entry = None
+            print(f"  WARNING: vector DB snapshot failed ({e}) — pushing claude-mem.db only")
+
+    def _discard_snapshots():
+        os.unlink(snap_path)
+        if vector_snap_dir:
+            shutil.rmtree(vector_snap_dir, ignore_errors=True)
 
     # --- Compare with remote ---
-    print("[5/6] Comparing with remote...")
+    print("[6/8] Comparing with remote...")
     sha_key = f"{prefix}/claude-mem.db.sha256"
     remote_sha = None
+    remote_manifest = None
     try:
-        resp = s3.get_object(Bucket=bucket, Key=sha_key)
-        remote_sha = resp["Body"].read().decode().strip().split()[0]
+        remote_manifest, remote_sha = get_remote_head(s3, bucket, prefix)
         print(f"  remote SHA256: {remote_sha}")
+        emit_event("digest", role="remote", sha256=remote_sha,
+                   generation=(remote_manifest or {}).get("generation"))
     except Exception:
         print("  no remote SHA256 found (first push or missing)")
-
-    if remote_sha == local_sha:
-        os.unlink(snap_path)
+    # With deltas on top of the base object the logical head is head_sha256
+    remote_head_sha = (remote_manifest or {}).get("head_sha256") or remote_sha
+    remote_vector = (remote_manifest or {}).get("vector") or {}
+    vector_changed = vector_entry is not None and vector_entry["sha256"] != remote_vector.get("sha256")
+
+    if remote_head_sha == local_sha and not vector_changed:
+        _discard_snapshots()
+        _record_push(local_sha, remote_vector.get("sha256"), (remote_manifest or {}).get("generation"))
         print("  RESULT: remote already up to date")
+        emit_event("decision", decision="up_to_date")
         sys.exit(0)
 
-    if remote_sha:
+    # claude-mem.db unchanged, only the vector set moved: new generation, same DB object
+    vector_only = remote_head_sha == local_sha and remote_manifest is not None
+    if vector_only:
+        print("  claude-mem.db unchanged — pushing vector DB only")
+    elif remote_sha:
         print("  SHA256 differs — pushing")
         # --- Pull-before-push guard: warn if remote appears ahead ---
-        remote_manifest = get_remote_manifest(s3, bucket, prefix)
         if remote_manifest:
             remote_obs_count = remote_manifest.get("observations", 0)
             if remote_obs_count > obs_count:
@@ -877,64 +3340,244 @@ def push_sqlite():
     else:
         print("  pushing new snapshot")
 
+    # --- Incremental: delta segment if only appends happened since last push ---
+    inc_state = None
+    delta_from = None
+    if INCREMENTAL_SYNC and not vector_only:
+        prev_inc = (remote_manifest or {}).get("incremental")
+        prev_deltas = (remote_manifest or {}).get("deltas") or []
+        inc_state, prefix_counts = scan_table_state(snap_path, (prev_inc or {}).get("high_water"))
+        if not prev_inc or (remote_manifest or {}).get("sha256") != remote_sha:
+            print("  incremental: no remote base — full snapshot")
+        elif not is_append_only(prev_inc, inc_state, prefix_counts):
+            print("  incremental: schema, other tables or existing rows changed — full snapshot")
+        elif len(prev_deltas) >= DELTA_COMPACT_EVERY:
+            print(f"  incremental: {len(prev_deltas)} deltas on base — compacting to full snapshot")
+        else:
+            delta_from = prev_inc["high_water"]
+            print(f"  incremental: append-only since generation "
+                  f"{remote_manifest.get('generation')} — delta segment")
+
     # --- Acquire lock ---
     print()
-    print("[6/7] Acquiring lock...")
+    print("[7/8] Acquiring lock...")
     if not acquire_lock(s3, bucket, project_name, canonical_id):
-        os.unlink(snap_path)
+        _discard_snapshots()
         print("  push aborted — could not acquire lock")
+        emit_event("decision", decision="abort", reason="lock_busy")
         sys.exit(1)
 
     # --- Upload ---
-    print("[7/7] Uploading to MinIO...")
+    print("[8/8] Uploading to MinIO...")
     db_key = f"{prefix}/claude-mem.db"
+    chunk_list = None
+    compression = None
+    codec, level = (None, None) if CHUNKED_SYNC else resolve_compression()
+    generation = next_generation(s3, bucket, prefix, remote_manifest)
+    delta_entry = None
+    if vector_only:
+        push_mode = "vector_only"
+    elif delta_from is not None:
+        push_mode = "delta"
+    else:
+        push_mode = "chunked" if CHUNKED_SYNC else ("compressed" if codec else "full")
+    emit_event("decision", decision="push", mode=push_mode, generation=generation,
+               vector=vector_changed)
     try:
-        # Upload DB
-        s3.upload_file(snap_path, bucket, db_key)
-        print(f"  uploaded: {db_key} ({snap_size} bytes)")
-
-        # Upload SHA256
-        sha_content = f"{local_sha}  claude-mem.db\n"
-        s3.put_object(
-            Bucket=bucket,
-            Key=sha_key,
-            Body=sha_content.encode(),
-        )
-        print(f"  uploaded: {sha_key}")
+        if vector_changed:
+            with TransferPhase("vector") as ph:
+                known = manifest_chunk_refs(remote_manifest)
+                uploaded = 0
+                for rel, path in vector_copies:
+                    n, nbytes = upload_chunks(s3, bucket, prefix, path, vector_chunks[rel], known)
+                    uploaded += n
+                    ph.nbytes += nbytes
+                    known.update(c_sha for _, _, c_sha in vector_chunks[rel])
+            phases.append(ph)
+            print(f"  vector chunks: {uploaded} uploaded ({ph.nbytes} bytes)")
+        if vector_only:
+            pass
+        elif delta_from is not None:
+            with TransferPhase("upload") as ph:
+                seg_path = snap_path + ".delta"
+                try:
+                    rows = build_delta_segment(snap_path, delta_from, seg_path)
+                    delta_entry = {
+                        "generation": generation,
+                        "key": f"deltas/{generation:010d}.db",
+                        "sha256": sha256_file(seg_path),
+                        "size": os.path.getsize(seg_path),
+                        "from": delta_from,
+                        "to": inc_state["high_water"],
+                        "rows": rows,
+                    }
+                    s3.upload_file(seg_path, bucket, f"{prefix}/{delta_entry['key']}",
+                                   Config=get_transfer_config())
+                finally:
+                    if os.path.exists(seg_path):
+                        os.unlink(seg_path)
+                ph.nbytes = delta_entry["size"]
+            phases.append(ph)
+            print(f"  uploaded: {prefix}/{delta_entry['key']} ({delta_entry['size']} bytes, "
+                  f"{sum(rows.values())} new rows)")
+            print(f"  {ph}")
+            # The base object stays (pull applies the deltas on top of it)
+            put_legacy_tombstone(s3, bucket, prefix, "delta")
+            print(f"  uploaded: {sha_key} (legacy tombstone)")
+        else:
+            with TransferPhase("upload") as ph:
+                if CHUNKED_SYNC:
+                    # Upload only chunks the bucket does not have yet
+                    known = {c["sha256"] for c in (remote_manifest or {}).get("chunks") or []}
+                    uploaded, ph.nbytes = upload_chunks(s3, bucket, prefix, snap_path, snap_chunks, known)
+                    chunk_list = [{"sha256": c_sha, "size": c_size} for _, c_size, c_sha in snap_chunks]
+                    print(f"  chunks: {len(snap_chunks)} total, {uploaded} uploaded ({ph.nbytes} bytes), "
+                          f"{len(snap_chunks) - uploaded} already remote")
+                elif codec:
+                    # Compress while uploading — no compressed copy on disk
+                    comp_name = "claude-mem.db" + COMPRESSION_SUFFIXES[codec]
+                    with open(snap_path, "rb") as f:
+                        reader = CompressingReader(f, codec, level)
+                        s3.upload_fileobj(reader, bucket, f"{prefix}/{comp_name}",
+                                          Config=get_transfer_config())
+                    ph.nbytes = reader.size
+                    compression = {"codec": codec, "level": level, "key": comp_name,
+                                   "compressed_size": reader.size}
+                    ratio = snap_size / reader.size if reader.size else 0.0
+                    print(f"  uploaded: {prefix}/{comp_name} ({reader.size} bytes, "
+                          f"{codec} level {level}, {ratio:.1f}x)")
+                else:
+                    # Upload DB (multipart, S3_MAX_CONCURRENCY parts in flight)
+                    s3.upload_file(snap_path, bucket, db_key, Config=get_transfer_config())
+                    ph.nbytes = snap_size
+                    print(f"  uploaded: {db_key} ({snap_size} bytes)")
+            phases.append(ph)
+            print(f"  {ph}")
+
+            # Upload SHA256 next to a freshly uploaded full object.  Otherwise the
+            # full object is superseded: drop it and leave a tombstone, so engines
+            # that read only the legacy pair fail loudly instead of going stale
+            if chunk_list is None and compression is None:
+                sha_content = f"{local_sha}  claude-mem.db\n"
+                s3.put_object(
+                    Bucket=bucket,
+                    Key=sha_key,
+                    Body=sha_content.encode(),
+                )
+                print(f"  uploaded: {sha_key}")
+            else:
+                s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": db_key}]})
+                put_legacy_tombstone(s3, bucket, prefix, push_mode)
+                print(f"  uploaded: {sha_key} (legacy tombstone)")
 
-        # Upload manifest
+        # Upload manifest last — it is the head document pull decides from
         manifest = {
+            "manifest_version": 2,
+            "generation": generation,
             "project": project_name,
             "canonical_id": canonical_id,
             "timestamp": datetime.now(timezone.utc).isoformat(),
             "source_host": os.uname().nodename,
+            "writer_node": NODE_ID,
+            "lease_epoch": lease_epoch,
             "db_size": snap_size,
             "sha256": local_sha,
+            "head_sha256": local_sha,
             "observations": obs_count,
             "session_summaries": sess_count,
             "user_prompts": prompt_count,
             "tables": table_count,
+            "counts": {
+                "observations": obs_count,
+                "session_summaries": sess_count,
+                "user_prompts": prompt_count,
+            },
         }
+        if delta_entry:
+            # The base object is unchanged: keep its digest, size and format
+            for key in ("db_size", "sha256", "format", "chunks", "compression", "base_generation"):
+                if key in remote_manifest:
+                    manifest[key] = remote_manifest[key]
+            manifest["deltas"] = (remote_manifest.get("deltas") or []) + [delta_entry]
+        elif vector_only:
+            for key in ("db_size", "sha256", "format", "chunks", "compression", "base_generation",
+                        "deltas", "incremental"):
+                if key in remote_manifest:
+                    manifest[key] = remote_manifest[key]
+        elif chunk_list is not None:
+            manifest["format"] = "chunked"
+            manifest["chunks"] = chunk_list
+        elif compression:
+            # sha256 / db_size above stay those of the uncompressed DB
+            manifest["format"] = "compressed"
+            manifest["compression"] = compression
+        if inc_state is not None:
+            manifest["incremental"] = inc_state
+            if not delta_entry:
+                manifest["base_generation"] = generation
+                manifest["deltas"] = []
+        manifest["integrity"] = integrity_summary(integrity_state, integrity_level, ic)
+        if vector_entry or remote_vector:
+            manifest["vector"] = vector_entry or remote_vector
         manifest_key = f"{prefix}/manifest.json"
         s3.put_object(
             Bucket=bucket,
             Key=manifest_key,
             Body=json.dumps(manifest, indent=2).encode(),
         )
-        print(f"  uploaded: {manifest_key}")
+        print(f"  uploaded: {manifest_key} (generation {generation})")
+
+        # Restore point: the full snapshot's chunk list, chunks shared across generations
+        if SNAPSHOT_GENERATIONS and not delta_entry and not vector_only:
+            gen_chunks = [{"sha256": c_sha, "size": c_size} for _, c_size, c_sha in snap_chunks]
+            if not CHUNKED_SYNC:
+                uploaded, uploaded_bytes = upload_chunks(s3, bucket, prefix, snap_path, snap_chunks)
+                print(f"  generation chunks: {uploaded} uploaded ({uploaded_bytes} bytes), "
+                      f"{len(snap_chunks) - uploaded} shared with earlier generations")
+            record = {key: manifest[key] for key in (
+                "generation", "timestamp", "writer_node", "lease_epoch", "db_size", "sha256", "counts")}
+            record["chunks"] = gen_chunks
+            gen_key = get_generation_key(prefix, generation, datetime.now(timezone.utc))
+            s3.put_object(Bucket=bucket, Key=gen_key, Body=json.dumps(record).encode())
+            print(f"  uploaded: {gen_key}")
+            try:
+                pruned, orphans = apply_generation_retention(s3, bucket, prefix, manifest)
+                if pruned:
+                    print(f"  retention: pruned {pruned} generation(s), {orphans} unreferenced chunk(s)")
+            except Exception as e:
+                print(f"  WARNING: generation retention failed: {e}")
+        elif not SNAPSHOT_GENERATIONS:
+            # Without restore points only the new head (its delta base and vector
+            # set included) and the previous head need their chunks.  Anything
+            # else, including chunks an earlier chunked push left behind after a
+            # switch to full objects, goes after CHUNK_GC_GRACE_SECONDS so a pull
+            # or prefetch reading an older manifest still finds it.
+            try:
+                referenced = manifest_chunk_refs(manifest) | manifest_chunk_refs(remote_manifest)
+                orphans = prune_chunks(s3, bucket, prefix, referenced)
+                if orphans:
+                    print(f"  pruned {orphans} unreferenced chunk(s)")
+            except Exception as e:
+                print(f"  WARNING: chunk pruning failed: {e}")
+        if inc_state is not None and not delta_entry:
+            pruned = prune_deltas(s3, bucket, prefix, [d["key"] for d in manifest.get("deltas") or []])
+            if pruned:
+                print(f"  pruned {pruned} delta segment(s) folded into the new base")
     except Exception as e:
         print(f"  ERROR uploading: {e}")
-        os.unlink(snap_path)
+        _discard_snapshots()
         sys.exit(1)
 
     # --- Verify remote ---
     print()
     print("=== Post-upload verification ===")
     try:
-        resp = s3.get_object(Bucket=bucket, Key=sha_key)
-        verify_sha = resp["Body"].read().decode().strip().split()[0]
+        revalidate(s3, bucket, f"{prefix}/manifest.json")
+        verify_manifest, verify_sha = get_remote_head(s3, bucket, prefix)
+        verify_sha = (verify_manifest or {}).get("head_sha256") or verify_sha
         if verify_sha == local_sha:
-            print("  remote SHA256: OK")
+            print("  remote head SHA256: OK")
+            _record_push(local_sha, (manifest.get("vector") or {}).get("sha256"), generation)
         else:
             print(f"  WARNING: remote SHA256 mismatch after upload!")
             print(f"    expected: {local_sha}")
@@ -943,7 +3586,7 @@ def push_sqlite():
         print(f"  WARNING: could not verify remote SHA256: {e}")
 
     # Cleanup snapshot
-    os.unlink(snap_path)
+    _discard_snapshots()
 
     # --- Final report ---
     print()
@@ -956,8 +3599,16 @@ def push_sqlite():
     print(f"  observations:    {obs_count}")
     print(f"  summaries:       {sess_count}")
     print(f"  prompts:         {prompt_count}")
-    print(f"  worker restart:  {'OK' if worker_ok else 'FAILED'}")
+    if vector_entry:
+        print(f"  vector DB:       {'pushed' if vector_changed else 'unchanged'} "
+              f"({len(vector_entry['files'])} files, {vector_entry['size']} bytes)")
+    if worker_ok is None:
+        print(f"  worker restart:  NOT NEEDED (online snapshot)")
+    else:
+        print(f"  worker restart:  {'OK' if worker_ok else 'FAILED'}")
+    print(f"  worker downtime: {worker_downtime:.2f}s")
     print(f"  remote prefix:   {prefix}/")
+    print_phases(phases)
 
 
 def print_project():
@@ -969,8 +3620,15 @@ def print_project():
     print(f"canonical_project_id: {canonical_id}")
 
 
-def doctor():
-    """Run diagnostics on the entire sync system."""
+@with_events
+@with_meta_cache
+def doctor(full=None):
+    """Run diagnostics on the entire sync system.
+
+    `full` forces a full integrity_check (CLI: doctor --full).
+    """
+    if full is None:
+        full = "--full" in sys.argv[2:]
     cfg = load_config()
     project_name = cfg["CLAUDE_PROJECT_ID"]
     canonical_id = resolve_canonical_id(cfg)
@@ -994,7 +3652,7 @@ def doctor():
     print("[2/5] MinIO connectivity")
     bucket = cfg["MINIO_BUCKET"]
     try:
-        s3 = get_s3_client(cfg)
+        s3 = meta_cached(get_s3_client(cfg))
         s3.head_bucket(Bucket=bucket)
         print(f"  endpoint: {cfg['MINIO_ENDPOINT']}")
         print(f"  bucket:   {bucket} — OK")
@@ -1008,17 +3666,34 @@ def doctor():
     # Check remote objects
     if s3:
         try:
-            resp = s3.head_object(Bucket=bucket, Key=f"{prefix}/claude-mem.db")
-            remote_size = resp["ContentLength"]
-            print(f"  remote DB: {remote_size} bytes")
+            head, remote_sha = get_remote_head(s3, bucket, prefix)
         except Exception:
-            print(f"  remote DB: not found")
+            head, remote_sha = None, None
+        if head and head.get("format") in ("chunked", "compressed"):
+            # claude-mem.db (if any) is a legacy object from an older generation
+            print(f"  remote DB: {head.get('db_size', '?')} bytes ({head['format']})")
+        else:
+            try:
+                resp = s3.head_object(Bucket=bucket, Key=f"{prefix}/claude-mem.db")
+                remote_size = resp["ContentLength"]
+                print(f"  remote DB: {remote_size} bytes")
+            except Exception:
+                print(f"  remote DB: not found")
 
-        try:
-            resp = s3.get_object(Bucket=bucket, Key=f"{prefix}/claude-mem.db.sha256")
-            remote_sha = resp["Body"].read().decode().strip().split()[0]
+        if remote_sha:
             print(f"  remote SHA256: {remote_sha[:16]}...")
-        except Exception:
+            if head and head.get("generation"):
+                print(f"  generation:    {head['generation']} (writer={head.get('writer_node', '?')}, "
+                      f"{head.get('timestamp', '?')})")
+            if head and head.get("compression"):
+                comp = head["compression"]
+                print(f"  compression:   {comp['codec']} level {comp.get('level')} → "
+                      f"{comp['key']} ({comp.get('compressed_size', '?')} bytes)")
+            if head and head.get("integrity"):
+                integ = head["integrity"]
+                print(f"  integrity:     {integ.get('check')} check {integ.get('result')} at push, "
+                      f"last full {integ.get('last_full_at') or 'never'} ({integ.get('last_full_result') or '-'})")
+        else:
             print(f"  remote SHA256: not found")
     print()
 
@@ -1051,7 +3726,9 @@ def doctor():
         print(f"  size: {db_size} bytes")
         try:
             conn = sqlite3.connect(db_path)
-            ic = conn.execute("PRAGMA integrity_check").fetchone()[0]
+            integrity_state = read_integrity_state(db_path)
+            ic = run_integrity_check(conn, full=full)
+            integrity_state = record_integrity_check(db_path, integrity_state, full, ic)
             tables = conn.execute(
                 "SELECT name FROM sqlite_master WHERE type='table'"
             ).fetchall()
@@ -1059,7 +3736,14 @@ def doctor():
             summ = conn.execute("SELECT COUNT(*) FROM session_summaries").fetchone()[0]
             prompts = conn.execute("SELECT COUNT(*) FROM user_prompts").fetchone()[0]
             conn.close()
-            print(f"  integrity:    {ic}")
+            print(f"  integrity:    {ic} ({'full' if full else 'quick'} check)")
+            summary = integrity_summary(integrity_state)
+            print(f"  last full:    {summary['last_full_at'] or 'never'} "
+                  f"({summary['last_full_result'] or '-'}, "
+                  f"{summary['quick_checks_since_full']} quick checks since)")
+            due = full_check_due(integrity_state)
+            if due:
+                print(f"  full check due: {due} — run `doctor --full`")
             print(f"  tables:       {len(tables)}")
             print(f"  observations: {obs}")
             print(f"  summaries:    {summ}")
@@ -1155,17 +3839,363 @@ def doctor():
     print("=" * 44)
 
 
+# ─────────────────────────────────────────────────────────────────
+# In-process engine API
+# ─────────────────────────────────────────────────────────────────
+
+ENGINE_REQUIRED_KEYS = ("MINIO_ENDPOINT", "MINIO_ACCESS_KEY", "MINIO_SECRET_KEY",
+                        "MINIO_BUCKET", "CLAUDE_PROJECT_ID", "CLAUDE_MEM_DB")
+
+
+def _env_flag(value):
+    return value == "1"
+
+
+# Module settings read from the environment at import: constant -> (variable, parser).
+# A SyncEngine built from another config (config.env) gets them as overrides.
+ENGINE_SETTINGS = {
+    "LOCK_TTL_SECONDS": ("LOCK_TTL_SECONDS", int),
+    "FORCE_PUSH": ("FORCE_PUSH", _env_flag),
+    "STALE_LOCK_GRACE_SECONDS": ("STALE_LOCK_GRACE_SECONDS", int),
+    "PULL_BACKUP_MAX_DAYS": ("PULL_BACKUP_MAX_DAYS", int),
+    "PULL_BACKUP_MAX_COUNT": ("PULL_BACKUP_MAX_COUNT", int),
+    "PULL_BACKUP_STORE": ("PULL_BACKUP_STORE", str),
+    "NODE_ID": ("MEMBRIDGE_NODE_ID", str),
+    "PRIMARY_NODE_ID_ENV": ("PRIMARY_NODE_ID", str),
+    "ALLOW_SECONDARY_PUSH": ("ALLOW_SECONDARY_PUSH", _env_flag),
+    "ALLOW_PRIMARY_PULL_OVERRIDE": ("ALLOW_PRIMARY_PULL_OVERRIDE", _env_flag),
+    "LEADERSHIP_ENABLED": ("LEADERSHIP_ENABLED", _env_flag),
+    "LEADERSHIP_LEASE_SECONDS": ("LEADERSHIP_LEASE_SECONDS", int),
+    "DIGEST_CACHE_ENABLED": ("DIGEST_CACHE", _env_flag),
+    "PUSH_PRECHECK": ("PUSH_PRECHECK", _env_flag),
+    "INTEGRITY_FULL_EVERY": ("INTEGRITY_FULL_EVERY", int),
+    "INTEGRITY_FULL_MAX_AGE_HOURS": ("INTEGRITY_FULL_MAX_AGE_HOURS", float),
+    "META_CACHE_ENABLED": ("META_CACHE", _env_flag),
+    "META_CACHE_PATH": ("META_CACHE_PATH", str),
+    "SNAPSHOT_MODE": ("SNAPSHOT_MODE", str),
+    "SNAPSHOT_BACKUP_PAGES": ("SNAPSHOT_BACKUP_PAGES", int),
+    "CHUNKED_SYNC": ("CHUNKED_SYNC", _env_flag),
+    "CHUNK_TARGET_BYTES": ("CHUNK_TARGET_BYTES", int),
+    "CHUNK_MIN_BYTES": ("CHUNK_MIN_BYTES", int),
+    "CHUNK_MAX_BYTES": ("CHUNK_MAX_BYTES", int),
+    "CHUNK_GC_GRACE_SECONDS": ("CHUNK_GC_GRACE_SECONDS", int),
+    "SNAPSHOT_COMPRESSION": ("SNAPSHOT_COMPRESSION", str.lower),
+    "SNAPSHOT_COMPRESSION_LEVEL": ("SNAPSHOT_COMPRESSION_LEVEL", str),
+    "INCREMENTAL_SYNC": ("INCREMENTAL_SYNC", _env_flag),
+    "DELTA_COMPACT_EVERY": ("DELTA_COMPACT_EVERY", int),
+    "SNAPSHOT_GENERATIONS": ("SNAPSHOT_GENERATIONS", _env_flag),
+    "GENERATIONS_KEEP_LAST": ("GENERATIONS_KEEP_LAST", int),
+    "GENERATIONS_KEEP_HOURLY": ("GENERATIONS_KEEP_HOURLY", int),
+    "GENERATIONS_KEEP_DAILY": ("GENERATIONS_KEEP_DAILY", int),
+    "GENERATIONS_KEEP_WEEKLY": ("GENERATIONS_KEEP_WEEKLY", int),
+    "VECTOR_SYNC": ("VECTOR_SYNC", _env_flag),
+    "VECTOR_DB_DIR": ("VECTOR_DB_DIR", str),
+    "S3_MAX_CONCURRENCY": ("S3_MAX_CONCURRENCY", int),
+    "S3_MULTIPART_THRESHOLD_MB": ("S3_MULTIPART_THRESHOLD_MB", int),
+    "S3_MULTIPART_CHUNKSIZE_MB": ("S3_MULTIPART_CHUNKSIZE_MB", int),
+    "S3_MAX_POOL_CONNECTIONS": ("S3_MAX_POOL_CONNECTIONS", int),
+    "S3_RETRY_MODE": ("S3_RETRY_MODE", str),
+    "S3_MAX_ATTEMPTS": ("S3_MAX_ATTEMPTS", int),
+    "S3_CONNECT_TIMEOUT": ("S3_CONNECT_TIMEOUT", int),
+    "S3_READ_TIMEOUT": ("S3_READ_TIMEOUT", int),
+    "S3_MAX_BANDWIDTH_MBPS": ("S3_MAX_BANDWIDTH_MBPS", float),
+    "BATCH_CHECK_CONCURRENCY": ("BATCH_CHECK_CONCURRENCY", int),
+    "NO_RESTART_WORKER": ("MEMBRIDGE_NO_RESTART_WORKER", _env_flag),
+}
+
+
+def engine_settings(env):
+    """SyncEngine overrides for the ENGINE_SETTINGS variables present in `env`.
+
+    Parsed exactly like the module constants, so an engine configured from
+    config.env behaves like a subprocess started with that environment.
+    Raises ValueError on an unparsable value.
+    """
+    settings = {}
+    for name, (var, parse) in ENGINE_SETTINGS.items():
+        if var in env:
+            try:
+                settings[name] = parse(env[var])
+            except ValueError:
+                raise ValueError(f"invalid {var}={env[var]!r}") from None
+    return settings
+
+
+_ENGINE_LOCK = threading.RLock()
+
+
+@contextlib.contextmanager
+def _module_overrides(overrides):
+    """Temporarily replace module constants (callers hold _ENGINE_LOCK)."""
+    saved = {name: globals()[name] for name in overrides}
+    globals().update(overrides)
+    try:
+        yield
+    finally:
+        globals().update(saved)
+
+
+class SyncResult:
+    """Outcome of one SyncEngine command — what the CLI reports as an exit code."""
+
+    def __init__(self, action, exit_code, output, events, seconds, reason=None):
+        self.action = action
+        self.reason = reason  # batch runs: why this project was transferred
+        self.exit_code = exit_code
+        self.ok = exit_code == 0
+        self.output = output
+        self.events = events
+        self.seconds = seconds
+
+    @property
+    def decision(self):
+        """The last decision event (e.g. up_to_date, full_pull, push) or None."""
+        decisions = [e for e in self.events if e.get("event") == "decision"]
+        return decisions[-1] if decisions else None
+
+    @property
+    def phases(self):
+        return [e for e in self.events if e.get("event") == "phase"]
+
+    def to_dict(self):
+        return {
+            "action": self.action,
+            "ok": self.ok,
+            "exit_code": self.exit_code,
+            "seconds": self.seconds,
+            "decision": self.decision,
+            "phases": self.phases,
+            "events": self.events,
+            "reason": self.reason,
+            "output": self.output,
+        }
+
+    def __repr__(self):
+        return f"SyncResult({self.action}, exit_code={self.exit_code})"
+
+
+class SyncEngine:
+    """Run sync commands in-process with one config and one pooled S3 client.
+
+        engine = SyncEngine({"CLAUDE_PROJECT_ID": "mem", ...})
+        result = engine.pull()
+        if not result.ok: ...
+
+    Commands return a SyncResult instead of exiting; their report lines are
+    captured in `result.output` and their progress events in `result.events`.
+    Runs are serialized process-wide: per-run state (metadata cache, event
+    sink, transfer counters) lives in module globals.  `settings` overrides
+    module constants for every run (see engine_settings()).
+    """
+
+    def __init__(self, cfg=None, s3=None, settings=None):
+        if cfg is None:
+            cfg = {key: os.environ.get(key) for key in ENGINE_REQUIRED_KEYS}
+            cfg["MINIO_REGION"] = os.environ.get("MINIO_REGION", "us-east-1")
+        missing = [key for key in ENGINE_REQUIRED_KEYS if not cfg.get(key)]
+        if missing:
+            raise ValueError(f"SyncEngine config missing: {', '.join(missing)}")
+        self.cfg = dict(cfg)
+        self.cfg.setdefault("MINIO_REGION", "us-east-1")
+        self.settings = dict(settings or {})
+        unknown = set(self.settings) - set(ENGINE_SETTINGS)
+        if unknown:
+            raise ValueError(f"SyncEngine unknown settings: {', '.join(sorted(unknown))}")
+        self._s3 = s3
+
+    @property
+    def s3(self):
+        """The engine's S3 client, created on first use and reused by every run."""
+        if self._s3 is None:
+            with _ENGINE_LOCK, _module_overrides(self.settings):
+                self._s3 = get_s3_client(self.cfg)
+        return self._s3
+
+    def _setting(self, name):
+        return self.settings.get(name, globals()[name])
+
+    @property
+    def canonical_id(self):
+        return resolve_canonical_id(self.cfg)
+
+    def _run(self, action, fn, *args, **overrides):
+        global _ENGINE_CFG, _ENGINE_S3, _EVENT_SINK, _ENGINE_OUT
+        with _ENGINE_LOCK:
+            s3 = self.s3
+            sink, out = io.StringIO(), io.StringIO()
+            exit_code = 0
+            t0 = time.monotonic()
+            _ENGINE_CFG, _ENGINE_S3, _EVENT_SINK, _ENGINE_OUT = self.cfg, s3, sink, out
+            try:
+                with _module_overrides({**self.settings, **overrides}):
+                    try:
+                        fn(*args)
+                    except SystemExit as e:
+                        exit_code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+            finally:
+                _ENGINE_CFG = _ENGINE_S3 = _EVENT_SINK = _ENGINE_OUT = None
+        events = [json.loads(line) for line in sink.getvalue().splitlines() if line]
+        return SyncResult(action, exit_code, out.getvalue(), events, round(time.monotonic() - t0, 6))
+
+    def pull(self, no_restart_worker=None):
+        overrides = {} if no_restart_worker is None else {"NO_RESTART_WORKER": bool(no_restart_worker)}
+        return self._run("pull", pull_sqlite, **overrides)
+
+    def push(self):
+        return self._run("push", push_sqlite)
+
+    def prefetch(self):
+        return self._run("prefetch", prefetch_sqlite)
+
+    def doctor(self, full=False):
+        return self._run("doctor", doctor, full)
+
+    def restore(self, generation=None, at=None, output=None):
+        argv = ["--generation", str(generation)] if generation is not None else ["--at", str(at)]
+        if output:
+            argv += ["--output", str(output)]
+        return self._run("restore", restore_sqlite, argv)
+
+    # Read-only checks used to skip batch members.  They run concurrently without
+    # the engine lock, so they never read module constants: every setting comes
+    # from this engine via _setting() and is passed to the helpers explicitly.
+
+    def _head(self):
+        prefix = f"projects/{self.canonical_id}/sqlite"
+        return get_remote_head(self.s3, self.cfg["MINIO_BUCKET"], prefix)
+
+    def needs_pull(self):
+        """Reason the local DB (or vector DB) lags the remote head, or None."""
+        db_path = self.cfg["CLAUDE_MEM_DB"]
+        try:
+            manifest, remote_sha = self._head()
+        except Exception as e:
+            return f"remote head unreadable ({e})"
+        if not os.path.exists(db_path):
+            return "no local DB"
+        local_sha, _ = peek_cached_sha256(db_path, self._setting("DIGEST_CACHE_ENABLED"))
+        if local_sha is None:
+            return "local digest not cached"
+        if local_sha != ((manifest or {}).get("head_sha256") or remote_sha):
+            return "remote head differs"
+        vector = (manifest or {}).get("vector")
+        if self._setting("VECTOR_SYNC") and vector and (read_vector_state(db_path) or {}).get("sha256") != vector["sha256"]:
+            return "vector set differs"
+        return None
+
+    def needs_push(self):
+        """Reason the local DB must be pushed, or None if the remote has it."""
+        db_path = self.cfg["CLAUDE_MEM_DB"]
+        if not os.path.exists(db_path):
+            return "no local DB"
+        if not self._setting("PUSH_PRECHECK"):
+            return "pre-check disabled"
+        prefix = f"projects/{self.canonical_id}/sqlite"
+        vector_fp = (dir_fingerprint(os.path.expanduser(self._setting("VECTOR_DB_DIR")))
+                     if self._setting("VECTOR_SYNC") else None)
+        unchanged = check_push_state(self.s3, self.cfg["MINIO_BUCKET"], prefix, self.canonical_id,
+                                     read_push_state(db_path, self.canonical_id), db_fingerprint(db_path),
+                                     vector_fp)
+        if unchanged is None:
+            return "local DB changed since last push"
+        return None if unchanged else "remote head moved"
+
+
+def sync_many(action, projects, cfg=None, s3=None):
+    """Push or pull several projects with one S3 client and connection pool.
+
+    `projects` holds project names or dicts overriding cfg keys (at least
+    CLAUDE_PROJECT_ID, optionally CLAUDE_MEM_DB).  Change checks run
+    concurrently (BATCH_CHECK_CONCURRENCY); only projects that need it are
+    transferred, one at a time, so S3_MAX_CONCURRENCY and
+    S3_MAX_BANDWIDTH_MBPS cap the whole batch.  Returns {project: SyncResult}.
+    """
+    if action not in ("push", "pull"):
+        raise ValueError(f"unsupported batch action: {action}")
+    base = dict(cfg) if cfg else {key: os.environ.get(key) for key in ENGINE_REQUIRED_KEYS}
+    base.setdefault("MINIO_REGION", os.environ.get("MINIO_REGION", "us-east-1"))
+    engines = []
+    for project in projects:
+        overrides = {"CLAUDE_PROJECT_ID": project} if isinstance(project, str) else project
+        engine = SyncEngine({**base, **overrides}, s3=s3)
+        s3 = engine.s3  # first engine creates the client, the rest share it
+        engines.append(engine)
+
+    check = SyncEngine.needs_push if action == "push" else SyncEngine.needs_pull
+    with ThreadPoolExecutor(max_workers=max(1, min(BATCH_CHECK_CONCURRENCY, len(engines) or 1))) as pool:
+        reasons = list(pool.map(check, engines))
+
+    results = {}
+    for engine, reason in zip(engines, reasons):
+        name = engine.cfg["CLAUDE_PROJECT_ID"]
+        if reason is None:
+            event = {"event": "decision", "command": f"{action}_many", "ts": time.time(),
+                     "decision": "up_to_date", "via": "batch_check"}
+            results[name] = SyncResult(action, 0, "", [event], 0.0)
+        else:
+            results[name] = getattr(engine, action)()
+            results[name].reason = reason
+    return results
+
+
+def _batch_command(action):
+    """CLI: push_many|pull_many <project>[=<db path>] ..."""
+    specs = sys.argv[2:]
+    if not specs:
+        print(f"Usage: sqlite_minio_sync.py {action}_many <project>[=<db path>] ...")
+        sys.exit(1)
+    projects = []
+    for spec in specs:
+        name, _, db = spec.partition("=")
+        projects.append({"CLAUDE_PROJECT_ID": name, **({"CLAUDE_MEM_DB": db} if db else {})})
+    try:
+        results = sync_many(action, projects)
+    except ValueError as e:
+        print(f"ERROR: {e}")
+        sys.exit(1)
+
+    print(f"=== claude-mem MinIO {action}_many: {len(results)} project(s) ===")
+    for name, result in results.items():
+        if result.reason:
+            print()
+            print(f"--- {name} ({result.reason}) ---")
+            print(result.output.rstrip())
+    print()
+    for name, result in results.items():
+        decision = (result.decision or {}).get("decision", "?")
+        print(f"  {name:<30} exit={result.exit_code}  {decision}  {result.seconds:.2f}s")
+    transferred = sum(1 for r in results.values() if r.reason)
+    print(f"  transferred: {transferred}, skipped (unchanged): {len(results) - transferred}")
+    if any(not r.ok for r in results.values()):
+        sys.exit(1)
+
+
+def push_many():
+    _batch_command("push")
+
+
+def pull_many():
+    _batch_command("pull")
+
+
 if __name__ == "__main__":
     commands = {
         "pull_sqlite": pull_sqlite,
+        "prefetch_sqlite": prefetch_sqlite,
         "push_sqlite": push_sqlite,
         "doctor": doctor,
         "print_project": print_project,
         "leadership_info": leadership_info,
+        "restore_pull_backup": restore_pull_backup,
+        "restore_sqlite": restore_sqlite,
+        "push_many": push_many,
+        "pull_many": pull_many,
     }
 
     if len(sys.argv) < 2 or sys.argv[1] not in commands:
-        print("Usage: sqlite_minio_sync.py <pull_sqlite|push_sqlite|doctor|print_project|leadership_info>")
+        print("Usage: sqlite_minio_sync.py "
+              "<pull_sqlite|prefetch_sqlite|push_sqlite|doctor|print_project|leadership_info"
+              "|restore_pull_backup|restore_sqlite|push_many|pull_many>")
         sys.exit(1)
 
     commands[sys.argv[1]]()
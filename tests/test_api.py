@@ -144,6 +144,158 @@ class TestAgentDaemon:
         assert data["ok"] is True
         assert data["dryrun"] is True
 
+    def test_agent_prefetch_dryrun(self, agent_client):
+        resp = agent_client.post("/sync/prefetch", json={"project": "test"})
+        assert resp.status_code == 200
+        data = resp.json()
+        assert data["ok"] is True
+        assert data["action"] == "prefetch"
+
+
+class TestHostFacts:
+    def test_health_does_not_fork_once_warm(self, agent_client, monkeypatch):
+        import subprocess
+        agent_client.get("/health")
+
+        def no_fork(*args, **kwargs):
+            raise AssertionError(f"/health forked: {args}")
+
+        monkeypatch.setattr(subprocess, "run", no_fork)
+        data = agent_client.get("/health").json()
+        assert data["status"] == "ok"
+        assert data["facts_age_seconds"]["git"] is not None
+
+    def test_git_facts_refresh_when_head_moves(self, monkeypatch, tmp_path):
+        import os
+        import agent.main as agent_main
+        git_dir = tmp_path / ".git"
+        (git_dir / "refs" / "heads").mkdir(parents=True)
+        (git_dir / "HEAD").write_text("ref: refs/heads/main\n")
+        ref = git_dir / "refs" / "heads" / "main"
+        ref.write_text("a" * 40)
+        commits = iter(["aaaaaaa", "bbbbbbb"])
+        monkeypatch.setattr(agent_main, "AGENT_DIR", tmp_path)
+        monkeypatch.setattr(agent_main, "_HOST_FACTS", {})
+        monkeypatch.setattr(agent_main, "_get_git_version", lambda: "v1")
+        monkeypatch.setattr(agent_main, "_get_git_commit", lambda: next(commits))
+        assert agent_main._git_facts()["git_commit"] == "aaaaaaa"
+        assert agent_main._git_facts()["git_commit"] == "aaaaaaa"  # cached
+        ref.write_text("b" * 40)
+        os.utime(ref, ns=(0, ref.stat().st_mtime_ns + 1_000_000))
+        assert agent_main._git_facts()["git_commit"] == "bbbbbbb"
+
+    def test_system_info_reads_proc(self, agent_client):
+        data = agent_client.get("/system-info").json()
+        if os.path.exists("/proc/meminfo"):
+            assert data["memory_mb"]["total"] > 0
+            assert data["uptime"].startswith("up ") and data["uptime_seconds"] > 0
+
+
+class TestProjectRegistry:
+    def test_imports_legacy_json_once(self, tmp_path):
+        import json
+        from agent.registry import ProjectRegistry
+        legacy = tmp_path / "agent_projects.json"
+        legacy.write_text(json.dumps({
+            "abc": {"project_id": "proj", "canonical_id": "abc", "created_at": 1.0, "path": "/x"},
+        }))
+        reg = ProjectRegistry(tmp_path / "projects.db", legacy_json=legacy)
+        assert reg.get("abc")["path"] == "/x"
+        assert not legacy.exists()
+        assert (tmp_path / "agent_projects.json.imported").exists()
+        reg.close()
+
+        reg = ProjectRegistry(tmp_path / "projects.db", legacy_json=legacy)
+        assert len(reg) == 1
+        reg.close()
+
+    def test_upsert_persists_and_notifies(self, tmp_path):
+        from agent.registry import ProjectRegistry
+        reg = ProjectRegistry(tmp_path / "projects.db")
+        seen = []
+        reg.subscribe(seen.append)
+        first = reg.upsert("proj", "abc", {"path": "/x"})
+        reg.upsert("proj", "abc", {"path": None, "db_path": "/x/db"})
+        assert [e["canonical_id"] for e in seen] == ["abc", "abc"]
+        assert reg.version == 2
+        reg.close()
+
+        reg = ProjectRegistry(tmp_path / "projects.db")
+        entry = reg.get("abc")
+        assert entry["path"] == "/x" and entry["db_path"] == "/x/db"
+        assert entry["created_at"] == first["created_at"]
+        reg.close()
+
+    def test_heartbeat_payloads_read_from_memory(self, monkeypatch, tmp_path):
+        import agent.main as agent_main
+        monkeypatch.setattr(agent_main, "_registry", agent_main.ProjectRegistry(tmp_path / "projects.db"))
+        agent_main.upsert_project("proj", "abc")
+        (tmp_path / "projects.db").unlink()
+        assert [p["canonical_id"] for p in agent_main._heartbeat_payloads()] == ["abc"]
+
+
+class TestHeartbeatBatch:
+    def _payloads(self, obs=10, ips=("10.0.0.5",)):
+        return [
+            {"node_id": "hb-node", "canonical_id": "cidA", "project_id": "alpha", "obs_count": obs,
+             "ip_addrs": list(ips), "agent_version": "0.4.0"},
+            {"node_id": "hb-node", "canonical_id": "cidB", "project_id": "beta", "obs_count": 5,
+             "ip_addrs": list(ips), "agent_version": "0.4.0"},
+        ]
+
+    def test_delta_carries_only_changes(self):
+        from agent.main import HeartbeatDelta
+        delta = HeartbeatDelta()
+        first = delta.build(self._payloads())
+        assert first["base_seq"] is None and len(first["projects"]) == 2
+        assert first["ip_addrs"] == ["10.0.0.5"]
+        delta.ack(first["seq"])
+
+        quiet = delta.build(self._payloads())
+        assert quiet["base_seq"] == first["seq"]
+        assert quiet["projects"] == [] and "ip_addrs" not in quiet
+        delta.ack(quiet["seq"])
+
+        changed = delta.build(self._payloads(obs=11, ips=("10.0.0.6",)))
+        assert changed["projects"] == [{"canonical_id": "cidA", "obs_count": 11}]
+        assert changed["ip_addrs"] == ["10.0.0.6"]
+
+    def test_batch_round_trip_and_resync(self, monkeypatch):
+        import asyncio
+        import httpx
+        import agent.main as agent_main
+        import server.main as server_main
+        monkeypatch.setattr(agent_main, "NODE_ID", "hb-node")
+        monkeypatch.setattr(agent_main, "SERVER_URL", "http://control-plane")
+        server_main._heartbeat_acks.pop("hb-node", None)
+        delta = agent_main.HeartbeatDelta()
+
+        async def main():
+            transport = httpx.ASGITransport(app=server_main.app)
+            async with httpx.AsyncClient(transport=transport) as client:
+                await agent_main._send_heartbeat_batch(client, delta, self._payloads())
+                data = await agent_main._send_heartbeat_batch(client, delta, self._payloads(obs=12))
+                merged = server_main._nodes["cidA:hb-node"]
+                assert (merged.obs_count, merged.project_id) == (12, "alpha")  # delta merged
+                server_main._heartbeat_acks.clear()  # control plane restarted
+                resynced = await agent_main._send_heartbeat_batch(client, delta, self._payloads(obs=13))
+                return data, resynced
+
+        data, resynced = asyncio.run(main())
+        assert data["ok"] is True and set(data["roles"]) == {"cidA", "cidB"}
+        assert resynced["ok"] is True and resynced["ack"] == delta.acked_seq
+        record = server_main._nodes["cidA:hb-node"]
+        assert record.obs_count == 13 and record.project_id == "alpha"
+        assert record.ip_addrs == ["10.0.0.5"]
+
+    def test_ip_discovery_is_cached(self, monkeypatch):
+        import agent.main as agent_main
+        calls = []
+        monkeypatch.setattr(agent_main, "_HOST_FACTS", {})
+        monkeypatch.setattr(agent_main, "_discover_ip_addrs", lambda: calls.append(1) or ["10.0.0.7"])
+        assert agent_main._get_ip_addrs() == agent_main._get_ip_addrs() == ["10.0.0.7"]
+        assert len(calls) == 1
+
 
 class TestAgentAliasEndpoints:
     def test_pull_alias(self, agent_client):
@@ -176,6 +328,240 @@ class TestAgentAliasEndpoints:
         assert resp.json()["canonical_id"] == expected
 
 
+class TestSyncExecution:
+    def test_syncs_run_off_the_event_loop(self, monkeypatch, tmp_path):
+        import asyncio
+        import agent.main as agent_main
+        log = tmp_path / "runs.log"
+        script = tmp_path / "claude-mem-push"
+        script.write_text(f"#!/bin/bash\necho \"start $2\" >> {log}\nsleep 0.3\n"
+                          f"echo \"end $2\" >> {log}\necho pushed $2\n")
+        script.chmod(0o755)
+        monkeypatch.setattr(agent_main, "DRYRUN", False)
+        monkeypatch.setattr(agent_main, "HOOKS_BIN", tmp_path)
+        monkeypatch.setattr(agent_main, "CONFIG_ENV", tmp_path / "missing.env")
+        monkeypatch.setattr(agent_main, "_DB_LOCKS", {})
+        monkeypatch.setattr(agent_main, "_SYNC_SLOTS", asyncio.Semaphore(3))
+        other_db = {"CLAUDE_MEM_DB": str(tmp_path / "other.db")}
+
+        async def main():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.02)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            push = agent_main.SyncAction.push
+            results = await asyncio.gather(
+                agent_main._run_sync(push, "alpha"),
+                agent_main._run_sync(push, "alpha"),
+                agent_main._run_sync(push, "beta", extra_env=other_db),
+                agent_main._run_sync(push, "gamma"),
+            )
+            task.cancel()
+            return results, ticks
+
+        results, ticks = asyncio.run(main())
+        assert all(r.ok and r.stdout.strip().startswith("pushed") for r in results)
+        assert ticks > 10  # the loop kept running while the scripts slept
+        lines = log.read_text().split("\n")
+        shared = [line for line in lines if line.endswith(("alpha", "gamma"))]
+        assert shared == ["start alpha", "end alpha", "start alpha", "end alpha", "start gamma", "end gamma"]
+        assert lines.index("start beta") < lines.index("end alpha")  # other DB files run in parallel
+        assert agent_main._SYNC_STATS == {"running": 0, "waiting": 0}
+
+    def test_timeout_kills_the_sync(self, monkeypatch, tmp_path):
+        import asyncio
+        import agent.main as agent_main
+        script = tmp_path / "claude-mem-doctor"
+        script.write_text("#!/bin/bash\nsleep 30\n")
+        script.chmod(0o755)
+        monkeypatch.setattr(agent_main, "DRYRUN", False)
+        monkeypatch.setattr(agent_main, "HOOKS_BIN", tmp_path)
+        monkeypatch.setattr(agent_main, "CONFIG_ENV", tmp_path / "missing.env")
+        monkeypatch.setattr(agent_main, "SYNC_TIMEOUT", 0.2)
+        monkeypatch.setattr(agent_main, "_SYNC_SLOTS", asyncio.Semaphore(2))
+        result = asyncio.run(agent_main._run_sync(agent_main.SyncAction.doctor, "gamma"))
+        assert not result.ok and "timed out" in result.detail
+
+
+class TestPushQueue:
+    def test_markers_coalesce_into_one_push(self):
+        from agent.main import PushQueue
+        queue = PushQueue(window=30, max_wait=300)
+        for t in (0, 10, 20):
+            queue.enqueue("garden-seedling", now=t)
+        queue.enqueue("other", now=40)
+        assert queue.take_due(now=45) == []  # garden-seedling still active
+        due = queue.take_due(now=50)
+        assert [e["project"] for e in due] == ["garden-seedling"]
+        queue.record(due[0], ok=True, finished=62)
+        metrics = queue.metrics(now=62)
+        assert metrics["coalescing_ratio"] == 3.0
+        assert metrics["max_staleness_seconds"] == 62.0
+        assert metrics["pending"] == [{"project": "other", "count": 1, "age_seconds": 22.0}]
+
+    def test_max_wait_bounds_staleness(self):
+        from agent.main import PushQueue
+        queue = PushQueue(window=30, max_wait=60)
+        for t in range(0, 70, 10):
+            queue.enqueue("busy", now=t)
+        assert [e["count"] for e in queue.take_due(now=65)] == [7]
+
+    def test_failed_push_is_retried_with_backoff(self):
+        from agent.main import PushQueue
+        queue = PushQueue(window=30, max_wait=300, retry_max=100)
+        queue.enqueue("garden-seedling", now=0)
+        due = queue.take_due(now=30)
+        queue.record(due[0], ok=False, finished=40)
+        assert queue.last_flush["retry_in_seconds"] == 30
+        queue.enqueue("garden-seedling", now=50)
+        assert queue.take_due(now=69) == []  # backoff, not the quiet window
+        due = queue.take_due(now=70)
+        assert due[0]["count"] == 2 and due[0]["first"] == 0
+        queue.record(due[0], ok=False, finished=75)
+        assert queue.last_flush["retry_in_seconds"] == 60
+        due = queue.take_due(now=135)
+        queue.record(due[0], ok=True, finished=140)
+        metrics = queue.metrics(now=140)
+        assert metrics["pending"] == [] and metrics["failures"] == 2
+        assert metrics["max_staleness_seconds"] == 140.0
+        assert metrics["coalescing_ratio"] == 2.0
+
+    def test_pending_markers_survive_restart(self, tmp_path):
+        from agent.main import PushQueue
+        from agent.registry import ProjectRegistry
+        registry = ProjectRegistry(tmp_path / "projects.db")
+        queue = PushQueue(window=30, max_wait=300)
+        queue.attach(registry)
+        queue.enqueue("garden-seedling", now=0)
+        queue.enqueue("other", now=5)
+        due = queue.take_due(now=40)
+        queue.record(due[0], ok=True, finished=41)
+        queue.record(due[1], ok=False, finished=41)
+        registry.close()
+
+        restarted = PushQueue(window=30, max_wait=300)
+        assert restarted.attach(ProjectRegistry(tmp_path / "projects.db")) == 1
+        pending = restarted.metrics(now=50)["pending"]
+        assert [(p["project"], p["attempts"]) for p in pending] == [("other", 1)]
+
+    def test_enqueue_and_flush_endpoints(self, agent_client):
+        resp = agent_client.post("/push/enqueue", json={"project": "garden-seedling"})
+        assert resp.status_code == 200
+        assert resp.json()["pending_markers"] >= 1
+        pending = agent_client.get("/push/queue").json()["pending"]
+        assert "garden-seedling" in [p["project"] for p in pending]
+
+        flushed = agent_client.post("/push/flush").json()["flushed"]
+        assert [f["project"] for f in flushed] == ["garden-seedling"]
+        assert flushed[0]["ok"] is True  # DRYRUN push
+        data = agent_client.get("/push/queue").json()
+        assert data["pending"] == [] and data["pushes"] >= 1
+
+
+class TestHeadWatcher:
+    def test_interval_backs_off_and_resets_on_change(self):
+        from agent.main import HeadWatcher
+        watcher = HeadWatcher(min_interval=10, max_interval=60)
+        assert watcher.observe("p", {"generation": 1}, '"e1"', now=0) is True
+        intervals = []
+        for t in (10, 30, 70, 130):
+            assert watcher.observe("p", None, '"e1"', now=t) is False  # 304
+            intervals.append(watcher.state["p"]["interval"])
+        assert intervals == [20, 40, 60, 60]
+        assert watcher.due(now=189) == [] and watcher.due(now=190) == ["p"]
+        assert watcher.observe("p", {"generation": 2}, '"e2"', now=190) is True
+        assert watcher.state["p"]["interval"] == 10
+
+    def test_failure_forgets_head_for_retry(self):
+        from agent.main import HeadWatcher
+        watcher = HeadWatcher(min_interval=10, max_interval=60)
+        watcher.observe("p", {"generation": 3}, '"e3"', now=0)
+        watcher.failed("p", "prefetch: failed", now=0)
+        assert watcher.state["p"]["etag"] is None
+        assert watcher.observe("p", {"generation": 3}, '"e3"', now=20) is True
+
+    def test_poll_triggers_prefetch_on_new_generation(self, monkeypatch, tmp_path):
+        import asyncio
+        import agent.main as agent_main
+        monkeypatch.setattr(agent_main, "_registry", agent_main.ProjectRegistry(tmp_path / "projects.db"))
+        monkeypatch.setattr(agent_main, "_HEAD_WATCHER", agent_main.HeadWatcher(10, 60))
+        manifest = {"generation": 4, "timestamp": "2026-01-01T00:00:00+00:00", "writer_node": "other"}
+        monkeypatch.setattr(agent_main, "_fetch_head", lambda project, etag: (manifest, '"e4"'))
+        calls = []
+        skips = {}
+
+        async def fake_run_sync(action, project, extra_env=None):
+            calls.append(action)
+            events = [{"event": "decision", "decision": "skip", "reason": skips[action]}] if action in skips else []
+            return agent_main.SyncResponse(ok=True, action=action.value, project=project,
+                                           canonical_id="x", hostname="h", detail="ok", events=events)
+
+        monkeypatch.setattr(agent_main, "_run_sync", fake_run_sync)
+        # Prefetch stages the head: reported as staged, not as synced
+        result = asyncio.run(agent_main._poll_head("garden-seedling"))
+        assert calls == [agent_main.SyncAction.prefetch]
+        assert result["staged"] is True and result["convergence_seconds"] is None
+        entry = next(iter(agent_main.load_projects().values()))
+        assert entry["staged_generation"] == 4 and entry.get("synced_generation") is None
+        assert asyncio.run(agent_main._poll_head("garden-seedling")) is None  # same head, no sync
+        assert len(calls) == 1
+
+        # Delta-reachable head: prefetch stages nothing, so the watcher pulls
+        skips[agent_main.SyncAction.prefetch] = "delta_reachable"
+        manifest.update(generation=5, timestamp="2026-01-01T01:00:00+00:00")
+        result = asyncio.run(agent_main._poll_head("garden-seedling"))
+        assert calls[1:] == [agent_main.SyncAction.prefetch, agent_main.SyncAction.pull]
+        assert result["generation"] == 5 and result["convergence_seconds"] > 0
+        entry = next(iter(agent_main.load_projects().values()))
+        assert entry["synced_generation"] == 5 and entry["synced_at"] is not None
+
+    def test_first_head_after_start_is_no_convergence_sample(self, monkeypatch, tmp_path):
+        import asyncio
+        import agent.main as agent_main
+        monkeypatch.setattr(agent_main, "_registry", agent_main.ProjectRegistry(tmp_path / "projects.db"))
+        monkeypatch.setattr(agent_main, "_HEAD_WATCHER", agent_main.HeadWatcher(10, 60))
+        monkeypatch.setattr(agent_main, "HEAD_WATCH_ACTION", "pull")
+        manifest = {"generation": 4, "timestamp": "2026-01-01T00:00:00+00:00", "writer_node": "other"}
+        monkeypatch.setattr(agent_main, "_fetch_head", lambda project, etag: (manifest, '"e4"'))
+
+        async def fake_run_sync(action, project, extra_env=None):
+            return agent_main.SyncResponse(ok=True, action=action.value, project=project,
+                                           canonical_id="x", hostname="h", detail="ok")
+
+        monkeypatch.setattr(agent_main, "_run_sync", fake_run_sync)
+        result = asyncio.run(agent_main._poll_head("garden-seedling"))
+        assert result["generation"] == 4 and result["convergence_seconds"] is None
+        entry = next(iter(agent_main.load_projects().values()))
+        assert entry["synced_generation"] == 4 and entry.get("synced_at") is None
+
+        manifest.update(generation=5, timestamp="2026-01-01T01:00:00+00:00")
+        assert asyncio.run(agent_main._poll_head("garden-seedling"))["convergence_seconds"] > 0
+
+    def test_restart_does_not_resync_known_head(self, monkeypatch, tmp_path):
+        import asyncio
+        import agent.main as agent_main
+        registry = agent_main.ProjectRegistry(tmp_path / "projects.db")
+        registry.upsert("garden-seedling", agent_main._cid("garden-seedling"),
+                        {"synced_generation": 7, "synced_at": 100.0, "convergence_seconds": 4.0})
+        monkeypatch.setattr(agent_main, "_registry", registry)
+        monkeypatch.setattr(agent_main, "_HEAD_WATCHER", agent_main.HeadWatcher(10, 60))
+        manifest = {"generation": 7, "timestamp": "2026-01-01T00:00:00+00:00", "writer_node": "other"}
+        monkeypatch.setattr(agent_main, "_fetch_head", lambda project, etag: (manifest, '"e7"'))
+
+        async def no_sync(*args, **kwargs):
+            raise AssertionError("known head must not be synced again")
+
+        monkeypatch.setattr(agent_main, "_run_sync", no_sync)
+        assert asyncio.run(agent_main._poll_head("garden-seedling")) is None
+        entry = registry.get(agent_main._cid("garden-seedling"))
+        assert entry["synced_at"] == 100.0 and entry["convergence_seconds"] == 4.0
+
+
 class TestJobs:
     def test_list_jobs_empty(self, server_client):
         resp = server_client.get("/jobs")
@@ -186,6 +572,74 @@ class TestJobs:
         resp = server_client.get("/jobs/nonexistent")
         assert resp.status_code == 404
 
+    def test_push_follows_agent_job(self, server_client, monkeypatch):
+        import time
+        import server.main as server_main
+        polls = []
+
+        async def fake_call_agent(agent, method, path, json_body=None):
+            if method == "POST":
+                assert json_body == {"project": "jp", "wait": False}
+                return {"job_id": "agentjob1", "status": "queued", "finished_at": None}
+            polls.append(path)
+            if len(polls) < 2:
+                return {"job_id": "agentjob1", "status": "running", "finished_at": None}
+            return {"job_id": "agentjob1", "status": "completed", "finished_at": 1.0,
+                    "result": {"ok": True, "detail": "push completed", "stdout": "PUSH COMPLETE",
+                               "returncode": 0}}
+
+        monkeypatch.setattr(server_main, "_call_agent", fake_call_agent)
+        monkeypatch.setattr(server_main, "AGENT_JOB_POLL_SECONDS", 0.01)
+        with server_client as client:
+            client.post("/projects", json={"name": "jp"})
+            client.post("/agents", json={"name": "a1", "url": "http://localhost:8001"})
+            resp = client.post("/sync/push", json={"project": "jp", "agent": "a1"})
+            assert resp.status_code == 202
+            data = resp.json()
+            assert data["agent_job_id"] == "agentjob1"
+            for _ in range(100):
+                job = client.get(f"/jobs/{data['job_id']}").json()
+                if job["status"] != "running":
+                    break
+                time.sleep(0.02)
+        assert job["status"] == "completed" and job["stdout"] == "PUSH COMPLETE"
+        assert polls == ["/jobs/agentjob1", "/jobs/agentjob1"]
+
+
+class TestAgentJobs:
+    def test_background_sync_streams_log(self, monkeypatch, tmp_path):
+        import asyncio
+        import agent.main as agent_main
+        script = tmp_path / "claude-mem-push"
+        script.write_text("#!/bin/bash\necho '[1/3] snapshot'\nsleep 0.2\necho '[2/3] upload' >&2\n"
+                          "echo 'PUSH COMPLETE'\n")
+        script.chmod(0o755)
+        monkeypatch.setattr(agent_main, "DRYRUN", False)
+        monkeypatch.setattr(agent_main, "HOOKS_BIN", tmp_path)
+        monkeypatch.setattr(agent_main, "CONFIG_ENV", tmp_path / "missing.env")
+        monkeypatch.setattr(agent_main, "_SYNC_SLOTS", asyncio.Semaphore(2))
+        with TestClient(agent_main.app) as client:
+            resp = client.post("/sync/push", json={"project": "jobs-project", "wait": False})
+            assert resp.status_code == 202
+            job_id = resp.json()["job_id"]
+            assert resp.json()["status"] in ("queued", "running")
+
+            body = client.get(f"/jobs/{job_id}/log").text
+            events = [block for block in body.split("\n\n") if block]
+            logs = [e.split("data: ", 1)[1] for e in events if "event: log" in e]
+            assert logs == ["[1/3] snapshot", "[stderr] [2/3] upload", "PUSH COMPLETE"]
+            assert "event: end" in events[-1]
+
+            job = client.get(f"/jobs/{job_id}").json()
+            assert job["status"] == "completed" and job["result"]["returncode"] == 0
+            resumed = client.get(f"/jobs/{job_id}/log", headers={"Last-Event-ID": "2"}).text
+            assert resumed.startswith("id: 3\nevent: log\ndata: PUSH COMPLETE\n\n")
+            assert job_id in [j["job_id"] for j in client.get("/jobs").json()]
+
+    def test_unknown_job(self, agent_client):
+        assert agent_client.get("/jobs/nope").status_code == 404
+        assert agent_client.get("/jobs/nope/log").status_code == 404
+
 
 class TestCombined:
     def test_combined_health(self, combined_client):
@@ -262,6 +716,39 @@ class TestCompatLayer:
         assert result["project"] == "test-project"
         assert result["action"] == "doctor"
 
+    def test_inprocess_push_returns_same_shape(self, monkeypatch, tmp_path):
+        from membridge.compat import sync_wrapper
+        config = tmp_path / "config.env"
+        config.write_text("MINIO_BUCKET=b\n")  # incomplete: engine refuses to start
+        monkeypatch.setattr(sync_wrapper, "SYNC_INPROCESS", True)
+        result = sync_wrapper.push_project("test-project", config_path=config)
+        assert result["ok"] is False
+        assert result["action"] == "push"
+        assert "missing" in result["detail"]
+        assert result["returncode"] == -1
+
+    def test_inprocess_engine_takes_config_env_flags(self, monkeypatch, tmp_path):
+        from membridge.compat import sync_wrapper
+        config = tmp_path / "config.env"
+        config.write_text(
+            "MINIO_ENDPOINT=http://127.0.0.1:9\nMINIO_ACCESS_KEY=a\nMINIO_SECRET_KEY=s\n"
+            "MINIO_BUCKET=b\nCLAUDE_MEM_DB=/tmp/x.db\n"
+            "CHUNKED_SYNC=1\nPRIMARY_NODE_ID=rpi4b\nLOCK_TTL_SECONDS=60\n"
+        )
+        monkeypatch.setattr(sync_wrapper, "_ENGINES", {})
+        monkeypatch.setattr(sync_wrapper, "_S3_CLIENTS", {})
+        engine = sync_wrapper._get_engine("test-project", config_path=config)
+        assert engine.settings["CHUNKED_SYNC"] is True
+        assert engine.settings["PRIMARY_NODE_ID_ENV"] == "rpi4b"
+        assert engine.settings["LOCK_TTL_SECONDS"] == 60
+        assert sync_wrapper._get_engine("test-project", config_path=config) is engine
+
+        # An edited config.env is picked up without restarting the process
+        config.write_text(config.read_text().replace("CHUNKED_SYNC=1", "CHUNKED_SYNC=0"))
+        os.utime(config, ns=(config.stat().st_atime_ns, config.stat().st_mtime_ns + 1_000_000))
+        engine = sync_wrapper._get_engine("test-project", config_path=config)
+        assert engine.settings["CHUNKED_SYNC"] is False
+
     def test_protected_user_files_list(self):
         from membridge.compat.sync_wrapper import PROTECTED_USER_FILES
         assert "~/.claude/.credentials.json" in PROTECTED_USER_FILES
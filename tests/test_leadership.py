@@ -326,3 +326,26 @@ class TestLeadershipEndpoints:
         # Heartbeat from secondary
         resp = client.post("/agent/heartbeat", json={"node_id": "orangepi", "canonical_id": "cid004"})
         assert resp.json()["role"] == "secondary"
+
+    def test_convergence_after_secondaries_sync(self, client):
+        from server.main import _convergence_history
+        _convergence_history.clear()
+        base = {"canonical_id": "cid005", "head_generation": 7, "head_pushed_at": 1000.0}
+        client.post("/agent/heartbeat", json={
+            **base, "node_id": "rpi4b", "synced_generation": 7, "synced_at": 1000.0})
+        client.post("/agent/heartbeat", json={
+            **base, "node_id": "orangepi", "synced_generation": 6, "synced_at": 900.0})
+        client.post("/agent/heartbeat", json={"node_id": "legacy", "canonical_id": "cid005"})
+
+        data = client.get("/projects/cid005/convergence").json()
+        assert data["generation"] == 7 and data["converged"] is False
+        nodes = {n["node_id"]: n for n in data["nodes"]}
+        assert nodes["orangepi"]["current"] is False
+        assert nodes["legacy"]["current"] is None  # no head watcher, not counted
+
+        client.post("/agent/heartbeat", json={
+            **base, "node_id": "orangepi", "synced_generation": 7, "synced_at": 1012.5})
+        data = client.get("/projects/cid005/convergence").json()
+        assert data["converged"] is True
+        assert data["time_to_convergence_seconds"] == 12.5
+        assert data["recent"] == [{"generation": 7, "seconds": 12.5}]
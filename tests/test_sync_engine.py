@@ -0,0 +1,1470 @@
+"""Tests for the sqlite_minio_sync transfer engine against an in-memory S3."""
+
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+from types import SimpleNamespace
+
+import pytest
+from botocore.exceptions import ClientError
+
+# ─────────────────────────────────────────────────────────────────
+# Helpers
+# ─────────────────────────────────────────────────────────────────
+
+class NoSuchKey(Exception):
+    pass
+
+
+class FakeS3:
+    """Minimal dict-backed stand-in for the boto3 S3 client."""
+
+    exceptions = SimpleNamespace(NoSuchKey=NoSuchKey)
+
+    def __init__(self):
+        self.objects = {}
+        self.calls = []
+
+    def _get(self, key):
+        if key not in self.objects:
+            raise NoSuchKey(key)
+        return self.objects[key]
+
+    @staticmethod
+    def _etag(data):
+        return '"%s"' % hashlib.md5(data).hexdigest()
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.calls.append(("put_object", Key))
+        self.objects[Key] = Body if isinstance(Body, bytes) else Body.read()
+        return {"ETag": self._etag(self.objects[Key])}
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None, **kwargs):
+        self.calls.append(("get_object", Key))
+        data = self._get(Key)
+        if IfNoneMatch and IfNoneMatch == self._etag(data):
+            raise ClientError(
+                {"Error": {"Code": "304", "Message": "Not Modified"},
+                 "ResponseMetadata": {"HTTPStatusCode": 304}},
+                "GetObject",
+            )
+        return {"Body": SimpleNamespace(read=lambda: data), "ContentLength": len(data),
+                "ETag": self._etag(data)}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        self.calls.append(("head_object", Key))
+        return {"ContentLength": len(self._get(Key))}
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        self.calls.append(("upload_file", Key))
+        with open(Filename, "rb") as f:
+            self.objects[Key] = f.read()
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+        self.calls.append(("upload_fileobj", Key))
+        parts = []
+        for part in iter(lambda: Fileobj.read(8192), b""):
+            parts.append(part)
+        self.objects[Key] = b"".join(parts)
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        self.calls.append(("download_file", Key))
+        with open(Filename, "wb") as f:
+            f.write(self._get(Key))
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        self.calls.append(("download_fileobj", Key))
+        data = self._get(Key)
+        for i in range(0, len(data), 4096):
+            Fileobj.write(data[i:i + 4096])
+
+    page_size = 1000
+
+    def list_objects_v2(self, Bucket, Prefix="", ContinuationToken=None, **kwargs):
+        self.calls.append(("list_objects_v2", Prefix))
+        keys = [k for k in sorted(self.objects) if k.startswith(Prefix)]
+        start = int(ContinuationToken or 0)
+        resp = {"Contents": [{"Key": k, "Size": len(self.objects[k])}
+                             for k in keys[start:start + self.page_size]]}
+        if start + self.page_size < len(keys):
+            resp.update(IsTruncated=True, NextContinuationToken=str(start + self.page_size))
+        return resp
+
+    def delete_objects(self, Bucket, Delete, **kwargs):
+        for obj in Delete["Objects"]:
+            self.calls.append(("delete_object", obj["Key"]))
+            self.objects.pop(obj["Key"], None)
+        return {}
+
+    def keys(self, prefix):
+        return [k for k in self.objects if k.startswith(prefix)]
+
+
+def _make_db(path, rows=2000, payload=200):
+    conn = sqlite3.connect(str(path))
+    conn.execute("CREATE TABLE observations (id INTEGER PRIMARY KEY, body TEXT)")
+    conn.execute("CREATE TABLE session_summaries (id INTEGER PRIMARY KEY)")
+    conn.execute("CREATE TABLE user_prompts (id INTEGER PRIMARY KEY)")
+    conn.executemany(
+        "INSERT INTO observations (body) VALUES (?)",
+        [(hashlib.sha256(str(i).encode()).hexdigest() * (payload // 64 + 1),) for i in range(rows)],
+    )
+    conn.commit()
+    conn.close()
+
+
+def _add_rows(path, rows=10):
+    conn = sqlite3.connect(str(path))
+    conn.executemany("INSERT INTO observations (body) VALUES (?)", [(f"new-{i}",) for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    """Configure the engine for an isolated node with a fake S3 backend."""
+    import sqlite_minio_sync as sms
+
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("MINIO_ENDPOINT", "http://localhost:9000")
+    monkeypatch.setenv("MINIO_ACCESS_KEY", "minioadmin")
+    monkeypatch.setenv("MINIO_SECRET_KEY", "minioadmin")
+    monkeypatch.setenv("MINIO_BUCKET", "test-bucket")
+    monkeypatch.setenv("CLAUDE_PROJECT_ID", "test-project")
+
+    s3 = FakeS3()
+    monkeypatch.setattr(sms, "get_s3_client", lambda cfg: s3)
+    monkeypatch.setattr(sms, "LEADERSHIP_ENABLED", False)
+    monkeypatch.setattr(sms, "NO_RESTART_WORKER", True)
+    monkeypatch.setattr(sms, "stop_worker", lambda: False)
+    monkeypatch.setattr(sms, "start_worker", lambda: True)
+    monkeypatch.setattr(sms.time, "sleep", lambda s: None)
+    # Small chunks so test DBs span several of them
+    monkeypatch.setattr(sms, "CHUNK_TARGET_BYTES", 16 * 1024)
+    monkeypatch.setattr(sms, "CHUNK_MIN_BYTES", 8 * 1024)
+    monkeypatch.setattr(sms, "CHUNK_MAX_BYTES", 64 * 1024)
+
+    def use_db(path):
+        monkeypatch.setenv("CLAUDE_MEM_DB", str(path))
+
+    return SimpleNamespace(sms=sms, s3=s3, tmp=tmp_path, use_db=use_db)
+
+
+def _run(fn):
+    """Run an engine command, returning its exit code (0 on normal return)."""
+    try:
+        fn()
+    except SystemExit as exc:
+        return exc.code or 0
+    return 0
+
+
+def _prefix(env, project="test-project"):
+    return f"projects/{env.sms.resolve_canonical_id({'CLAUDE_PROJECT_ID': project})}/sqlite"
+
+
+def _manifest(env):
+    """The remote head manifest.json as a dict."""
+    return json.loads(env.s3.objects[f"{_prefix(env)}/manifest.json"])
+
+
+def _two_nodes(env, primary, secondary, rows=300, secondary_rows=None, pull=False):
+    """Push a `rows`-row primary DB, then switch the engine to `secondary`.
+
+    `secondary_rows` creates a local secondary DB first; `pull` pulls the
+    pushed head into it.
+    """
+    _make_db(primary, rows=rows)
+    if secondary_rows is not None:
+        _make_db(secondary, rows=secondary_rows)
+    env.use_db(primary)
+    assert _run(env.sms.push_sqlite) == 0
+    env.use_db(secondary)
+    if pull:
+        assert _run(env.sms.pull_sqlite) == 0
+    return SimpleNamespace(primary=primary, secondary=secondary)
+
+
+# ─────────────────────────────────────────────────────────────────
+# Chunked transfer
+# ─────────────────────────────────────────────────────────────────
+
+class TestChunking:
+
+    def test_chunks_cover_file_and_are_page_aligned(self, env, tmp_path):
+        db = tmp_path / "a.db"
+        _make_db(db)
+        page = env.sms.sqlite_page_size(str(db))
+        chunks = list(env.sms.iter_chunks(str(db)))
+
+        assert len(chunks) > 1
+        assert sum(size for _, size, _ in chunks) == os.path.getsize(db)
+        offset = 0
+        for chunk_offset, size, _ in chunks:
+            assert chunk_offset == offset
+            assert chunk_offset % page == 0
+            offset += size
+
+    def test_chunking_is_deterministic(self, env, tmp_path):
+        db = tmp_path / "a.db"
+        _make_db(db)
+        assert list(env.sms.iter_chunks(str(db))) == list(env.sms.iter_chunks(str(db)))
+
+
+class TestChunkedSync:
+
+    def test_push_then_pull_fetches_only_missing_chunks(self, env, monkeypatch):
+        sms, s3 = env.sms, env.s3
+        monkeypatch.setattr(sms, "CHUNKED_SYNC", True)
+
+        primary = env.tmp / "primary.db"
+        _make_db(primary)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+
+        prefix = _prefix(env)
+        assert f"{prefix}/claude-mem.db" not in s3.objects
+        assert s3.objects[f"{prefix}/claude-mem.db.sha256"].startswith(sms.LEGACY_TOMBSTONE.encode())
+        first_chunks = set(s3.keys(f"{prefix}/chunks/"))
+        assert first_chunks
+
+        # Fresh secondary: everything comes from chunks
+        secondary = env.tmp / "secondary.db"
+        env.use_db(secondary)
+        assert _run(sms.pull_sqlite) == 0
+        snap_sha = _manifest(env)["sha256"]
+        assert sms.sha256_file(str(secondary)) == snap_sha
+
+        # Small change on primary → second push uploads a fraction of the chunks
+        _add_rows(primary)
+        env.use_db(primary)
+        s3.calls.clear()
+        assert _run(sms.push_sqlite) == 0
+        uploaded = [k for op, k in s3.calls if op == "put_object" and "/chunks/" in k]
+        assert 0 < len(uploaded) < len(first_chunks)
+
+        # Secondary pull reuses local chunks and fetches only the new ones
+        env.use_db(secondary)
+        s3.calls.clear()
+        assert _run(sms.pull_sqlite) == 0
+        fetched = [k for op, k in s3.calls if op == "get_object" and "/chunks/" in k]
+        assert 0 < len(fetched) < len(first_chunks)
+        new_sha = _manifest(env)["sha256"]
+        assert sms.sha256_file(str(secondary)) == new_sha
+
+    def test_push_prunes_unreferenced_chunks(self, env, monkeypatch):
+        sms, s3 = env.sms, env.s3
+        monkeypatch.setattr(sms, "CHUNKED_SYNC", True)
+        prefix = _prefix(env)
+        primary = env.tmp / "primary.db"
+        _make_db(primary)
+        env.use_db(primary)
+
+        heads = []
+        for _ in range(4):
+            _add_rows(primary, rows=200)
+            assert _run(sms.push_sqlite) == 0
+            heads.append(_manifest(env))
+
+        # Chunks of older heads stay for the grace period (pulls take no lock)
+        def remote():
+            return {k.rsplit("/", 1)[-1] for k in s3.keys(f"{prefix}/chunks/")}
+
+        live = sms.manifest_chunk_refs(heads[-1]) | sms.manifest_chunk_refs(heads[-2])
+        assert sms.manifest_chunk_refs(heads[0]) - live
+        assert sms.manifest_chunk_refs(heads[0]) <= remote()
+        ledger_key = f"{prefix}/chunks-gc.json"
+        ledger = json.loads(s3.objects[ledger_key])
+        assert set(ledger) == remote() - live
+
+        # Once the grace period has passed, a full-object push collects them too
+        s3.objects[ledger_key] = json.dumps({sha: t - 7200 for sha, t in ledger.items()}).encode()
+        monkeypatch.setattr(sms, "CHUNKED_SYNC", False)
+        _add_rows(primary, rows=200)
+        assert _run(sms.push_sqlite) == 0
+        assert remote() == live
+        assert set(json.loads(s3.objects[ledger_key])) == live - sms.manifest_chunk_refs(heads[-1])
+
+    def test_legacy_pull_fails_after_chunked_push(self, env, monkeypatch):
+        sms, s3 = env.sms, env.s3
+        primary = env.tmp / "primary.db"
+        _make_db(primary)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+
+        _add_rows(primary)
+        monkeypatch.setattr(sms, "CHUNKED_SYNC", True)
+        assert _run(sms.push_sqlite) == 0
+
+        # An engine without manifest support reads claude-mem.db + .sha256: the
+        # superseded full object is gone and the tombstone makes its pull fail
+        prefix = _prefix(env)
+        assert s3.objects[f"{prefix}/claude-mem.db.sha256"].decode().split()[0] == sms.LEGACY_TOMBSTONE
+        assert f"{prefix}/claude-mem.db" not in s3.objects
+        monkeypatch.setattr(sms, "get_remote_manifest", lambda *args, **kwargs: None)
+        secondary = env.tmp / "secondary.db"
+        env.use_db(secondary)
+        assert _run(sms.pull_sqlite) != 0
+        assert not secondary.exists()
+
+    def test_pull_falls_back_to_full_object_without_chunk_list(self, env):
+        sms, s3 = env.sms, env.s3
+
+        primary = env.tmp / "primary.db"
+        _make_db(primary, rows=50)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+
+        secondary = env.tmp / "secondary.db"
+        env.use_db(secondary)
+        assert _run(sms.pull_sqlite) == 0
+        assert any(op == "download_fileobj" for op, _ in s3.calls)
+
+
+class TestStreamingHash:
+
+    def test_pull_hashes_only_the_local_db(self, env, monkeypatch):
+        sms = env.sms
+        primary = env.tmp / "primary.db"
+        _make_db(primary, rows=50)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+
+        secondary = env.tmp / "secondary.db"
+        _make_db(secondary, rows=10)
+        env.use_db(secondary)
+        hashed = []
+        real = sms.sha256_file
+        monkeypatch.setattr(sms, "sha256_file", lambda p: hashed.append(p) or real(p))
+        monkeypatch.setattr(sms, "NO_RESTART_WORKER", False)
+
+        assert _run(sms.pull_sqlite) == 0
+        # Local compare only: download, post-replace and post-worker checks reuse the stream digest
+        assert hashed == [str(secondary)]
+        assert sms.get_local_obs_count(str(secondary)) == 50
+
+    def test_hashing_writer_matches_sha256(self, env, tmp_path):
+        buf = io.BytesIO()
+        writer = env.sms.HashingWriter(buf)
+        for part in (b"abc", b"", b"def" * 1000):
+            writer.write(part)
+        assert writer.hexdigest() == hashlib.sha256(buf.getvalue()).hexdigest()
+        assert writer.size == len(buf.getvalue())
+        assert writer.seekable() is False
+
+
+# ─────────────────────────────────────────────────────────────────
+# Online snapshots
+# ─────────────────────────────────────────────────────────────────
+
+class TestOnlineSnapshot:
+
+    @pytest.mark.parametrize("journal_mode", ["wal", "delete"])
+    def test_snapshot_matches_source(self, env, journal_mode):
+        db = env.tmp / "live.db"
+        _make_db(db, rows=300)
+        conn = sqlite3.connect(str(db))
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        conn.close()
+
+        snap = env.tmp / "snap.db"
+        assert env.sms.create_online_snapshot(str(db), str(snap)) == journal_mode
+        conn = sqlite3.connect(str(snap))
+        assert conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0] == 300
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+        conn.close()
+
+    def test_push_does_not_stop_worker(self, env, monkeypatch, capsys):
+        sms = env.sms
+        monkeypatch.setattr(sms, "SNAPSHOT_MODE", "online")
+
+        def fail():
+            raise AssertionError("worker must keep running during online snapshot")
+
+        monkeypatch.setattr(sms, "stop_worker", fail)
+        monkeypatch.setattr(sms, "start_worker", fail)
+
+        db = env.tmp / "claude-mem.db"
+        _make_db(db, rows=50)
+        env.use_db(db)
+        assert _run(sms.push_sqlite) == 0
+        out = capsys.readouterr().out
+        assert "worker downtime: 0.00s" in out
+        assert "NOT NEEDED (online snapshot)" in out
+
+
+# ─────────────────────────────────────────────────────────────────
+# Local digest cache
+# ─────────────────────────────────────────────────────────────────
+
+class TestDigestCache:
+
+    def test_second_lookup_hits_cache(self, env):
+        db = env.tmp / "claude-mem.db"
+        _make_db(db, rows=20)
+        sha, hit = env.sms.cached_sha256(str(db))
+        assert hit is False
+        assert sha == env.sms.sha256_file(str(db))
+        assert os.path.exists(env.sms.get_digest_cache_path(str(db)))
+
+        assert env.sms.cached_sha256(str(db)) == (sha, True)
+
+    def test_write_invalidates_cache(self, env):
+        db = env.tmp / "claude-mem.db"
+        _make_db(db, rows=20)
+        env.sms.cached_sha256(str(db))
+        _add_rows(db)
+
+        sha, hit = env.sms.cached_sha256(str(db))
+        assert hit is False
+        assert sha == env.sms.sha256_file(str(db))
+
+    def test_noop_pull_after_pull_uses_cache(self, env, capsys):
+        sms = env.sms
+        primary = env.tmp / "primary.db"
+        _make_db(primary, rows=20)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+
+        secondary = env.tmp / "secondary.db"
+        env.use_db(secondary)
+        assert _run(sms.pull_sqlite) == 0
+        capsys.readouterr()
+
+        assert _run(sms.pull_sqlite) == 0
+        out = capsys.readouterr().out
+        assert "(cached)" in out
+        assert "already up to date" in out
+
+
+# ─────────────────────────────────────────────────────────────────
+# Metadata cache (ETag)
+# ─────────────────────────────────────────────────────────────────
+
+class TestMetaCache:
+
+    def test_reads_are_deduplicated_within_a_run(self, env):
+        sms, s3 = env.sms, env.s3
+        s3.put_object(Bucket="b", Key="projects/x/sqlite/manifest.json", Body=b'{"a": 1}')
+        client = sms.MetaCachedS3(s3, sms.MetaCache())
+        s3.calls.clear()
+
+        for _ in range(3):
+            resp = client.get_object(Bucket="b", Key="projects/x/sqlite/manifest.json")
+            assert resp["Body"].read() == b'{"a": 1}'
+        assert s3.calls == [("get_object", "projects/x/sqlite/manifest.json")]
+        assert client._cache.stats["deduped"] == 2
+
+    def test_missing_key_is_deduplicated_and_reraised(self, env):
+        sms, s3 = env.sms, env.s3
+        client = sms.MetaCachedS3(s3, sms.MetaCache())
+        for _ in range(2):
+            with pytest.raises(NoSuchKey):
+                client.get_object(Bucket="b", Key="projects/x/leadership/lease.json")
+        assert len(s3.calls) == 1
+
+    def test_unchanged_object_costs_a_304_on_next_run(self, env, tmp_path):
+        sms, s3 = env.sms, env.s3
+        key = "projects/x/sqlite/claude-mem.db.sha256"
+        s3.put_object(Bucket="b", Key=key, Body=b"abc  claude-mem.db\n")
+        path = str(tmp_path / "meta.json")
+
+        first = sms.MetaCache.load(path)
+        sms.MetaCachedS3(s3, first).get_object(Bucket="b", Key=key)
+        first.save()
+
+        second = sms.MetaCache.load(path)
+        resp = sms.MetaCachedS3(s3, second).get_object(Bucket="b", Key=key)
+        assert resp["Body"].read() == b"abc  claude-mem.db\n"
+        assert second.stats["not_modified"] == 1
+        assert second.stats["bytes_saved"] == len(b"abc  claude-mem.db\n")
+
+        # Changed remote object is fetched again
+        s3.put_object(Bucket="b", Key=key, Body=b"def  claude-mem.db\n")
+        third = sms.MetaCache.load(path)
+        resp = sms.MetaCachedS3(s3, third).get_object(Bucket="b", Key=key)
+        assert resp["Body"].read() == b"def  claude-mem.db\n"
+        assert third.stats["not_modified"] == 0
+
+    def test_command_reports_savings(self, env, capsys):
+        sms = env.sms
+        db = env.tmp / "claude-mem.db"
+        _make_db(db, rows=20)
+        env.use_db(db)
+        assert _run(sms.push_sqlite) == 0
+        assert _run(sms.push_sqlite) == 0
+        out = capsys.readouterr().out
+        assert "meta cache:" in out
+        assert "1 not modified" in out
+
+
+# ─────────────────────────────────────────────────────────────────
+# Manifest-first head
+# ─────────────────────────────────────────────────────────────────
+
+class TestHeadManifest:
+
+    def test_push_writes_head_fields_and_bumps_generation(self, env, monkeypatch):
+        sms = env.sms
+        monkeypatch.setattr(sms, "NODE_ID", "rpi4b")
+        db = env.tmp / "claude-mem.db"
+        _make_db(db, rows=20)
+        env.use_db(db)
+        assert _run(sms.push_sqlite) == 0
+        head = _manifest(env)
+        assert head["generation"] == 1
+        assert head["writer_node"] == "rpi4b"
+        assert head["counts"]["observations"] == 20
+        assert head["db_size"] > 0
+
+        _add_rows(db)
+        assert _run(sms.push_sqlite) == 0
+        assert _manifest(env)["generation"] == 2
+
+    def test_noop_pull_is_one_get(self, env):
+        sms, s3 = env.sms, env.s3
+        primary = env.tmp / "primary.db"
+        _make_db(primary, rows=20)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+
+        secondary = env.tmp / "secondary.db"
+        env.use_db(secondary)
+        assert _run(sms.pull_sqlite) == 0
+
+        s3.calls.clear()
+        assert _run(sms.pull_sqlite) == 0
+        assert len(s3.calls) == 1
+        assert s3.calls[0][1].endswith("/sqlite/manifest.json")
+
+    def test_pull_does_not_need_legacy_sha_object(self, env):
+        sms, s3 = env.sms, env.s3
+        primary = env.tmp / "primary.db"
+        _make_db(primary, rows=20)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+        for key in [k for k in s3.objects if k.endswith(".sha256")]:
+            del s3.objects[key]
+
+        secondary = env.tmp / "secondary.db"
+        env.use_db(secondary)
+        assert _run(sms.pull_sqlite) == 0
+        assert sms.get_local_obs_count(str(secondary)) == 20
+
+
+# ─────────────────────────────────────────────────────────────────
+# Transfer tuning / throughput
+# ─────────────────────────────────────────────────────────────────
+
+class TestTransferTuning:
+
+    def test_client_uses_pool_retry_and_timeout_settings(self, monkeypatch):
+        import sqlite_minio_sync as sms
+
+        monkeypatch.setattr(sms, "S3_MAX_CONCURRENCY", 16)
+        monkeypatch.setattr(sms, "S3_MAX_POOL_CONNECTIONS", 10)
+        monkeypatch.setattr(sms, "S3_MAX_ATTEMPTS", 7)
+        monkeypatch.setattr(sms, "S3_RETRY_MODE", "adaptive")
+        monkeypatch.setattr(sms, "S3_READ_TIMEOUT", 33)
+        client = sms.get_s3_client({
+            "MINIO_ENDPOINT": "http://localhost:9000", "MINIO_ACCESS_KEY": "a",
+            "MINIO_SECRET_KEY": "b", "MINIO_REGION": "us-east-1",
+        })
+        config = client.meta.config
+        assert config.max_pool_connections == 16
+        assert config.retries["mode"] == "adaptive"
+        assert config.retries["total_max_attempts"] == 7
+        assert config.read_timeout == 33
+
+    def test_transfer_config_follows_settings(self, monkeypatch):
+        import sqlite_minio_sync as sms
+
+        monkeypatch.setattr(sms, "S3_MAX_CONCURRENCY", 2)
+        monkeypatch.setattr(sms, "S3_MULTIPART_CHUNKSIZE_MB", 16)
+        tc = sms.get_transfer_config()
+        assert tc.max_concurrency == 2
+        assert tc.multipart_chunksize == 16 * 1024 * 1024
+
+    def test_phase_counts_requests_and_retries(self):
+        import sqlite_minio_sync as sms
+
+        with sms.TransferPhase("upload", nbytes=2 * 1024 * 1024) as ph:
+            sms._count_request(parsed={"ResponseMetadata": {"RetryAttempts": 2}})
+            sms._count_request(parsed={"ResponseMetadata": {"RetryAttempts": 0}})
+        assert (ph.requests, ph.retries) == (2, 2)
+        assert "MB/s" in str(ph)
+
+    def test_push_and_pull_report_throughput(self, env, monkeypatch, capsys):
+        sms, s3 = env.sms, env.s3
+        seen = {}
+        upload_file = s3.upload_file
+
+        def spy_upload(Filename, Bucket, Key, **kwargs):
+            seen.update(kwargs)
+            return upload_file(Filename, Bucket, Key, **kwargs)
+
+        monkeypatch.setattr(s3, "upload_file", spy_upload)
+        primary = env.tmp / "primary.db"
+        _make_db(primary, rows=200)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+        assert isinstance(seen.get("Config"), sms.TransferConfig)
+        out = capsys.readouterr().out
+        for phase in ("snapshot", "hash", "upload"):
+            assert f"    {phase}" in out
+
+        env.use_db(env.tmp / "secondary.db")
+        assert _run(sms.pull_sqlite) == 0
+        out = capsys.readouterr().out
+        assert "throughput:" in out
+        assert "    download" in out
+
+
+# ─────────────────────────────────────────────────────────────────
+# Compressed snapshots
+# ─────────────────────────────────────────────────────────────────
+
+class TestCompression:
+
+    def test_stream_roundtrip(self, env, tmp_path):
+        sms = env.sms
+        db = tmp_path / "a.db"
+        _make_db(db)
+        with open(db, "rb") as f:
+            reader = sms.CompressingReader(f, "gzip", 6)
+            compressed = b"".join(iter(lambda: reader.read(1000), b""))
+        assert reader.size == len(compressed) < os.path.getsize(db)
+
+        out = tmp_path / "out.db"
+        with open(out, "wb") as f:
+            writer = sms.HashingWriter(f)
+            sink = sms.DecompressingWriter(writer, "gzip")
+            for i in range(0, len(compressed), 777):
+                sink.write(compressed[i:i + 777])
+            sink.close()
+        assert writer.hexdigest() == sms.sha256_file(str(db))
+
+    def test_truncated_object_is_rejected(self, env, tmp_path):
+        sms = env.sms
+        payload = os.urandom(50_000)
+        compressed = sms.CompressingReader(io.BytesIO(payload), "gzip", 1).read()
+        sink = sms.DecompressingWriter(io.BytesIO(), "gzip")
+        sink.write(compressed[: len(compressed) // 2])
+        with pytest.raises(ValueError):
+            sink.close()
+
+    def test_push_pull_compressed(self, env, monkeypatch):
+        sms, s3 = env.sms, env.s3
+        monkeypatch.setattr(sms, "SNAPSHOT_COMPRESSION", "gzip")
+
+        primary = env.tmp / "primary.db"
+        _make_db(primary)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+
+        prefix = _prefix(env)
+        manifest = _manifest(env)
+        comp = manifest["compression"]
+        assert comp["codec"] == "gzip" and comp["key"] == "claude-mem.db.gz"
+        assert f"{prefix}/claude-mem.db" not in s3.objects
+        assert comp["compressed_size"] == len(s3.objects[f"{prefix}/claude-mem.db.gz"])
+        assert comp["compressed_size"] < manifest["db_size"]
+
+        secondary = env.tmp / "secondary.db"
+        env.use_db(secondary)
+        assert _run(sms.pull_sqlite) == 0
+        assert sms.sha256_file(str(secondary)) == manifest["sha256"]
+
+    def test_legacy_pull_fails_after_compressed_push(self, env, monkeypatch):
+        sms, s3 = env.sms, env.s3
+        primary = env.tmp / "primary.db"
+        _make_db(primary)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+
+        _add_rows(primary)
+        monkeypatch.setattr(sms, "SNAPSHOT_COMPRESSION", "gzip")
+        assert _run(sms.push_sqlite) == 0
+
+        # An engine without manifest support reads claude-mem.db + .sha256: the
+        # superseded full object is gone and the tombstone makes its pull fail
+        prefix = _prefix(env)
+        assert s3.objects[f"{prefix}/claude-mem.db.sha256"].decode().split()[0] == sms.LEGACY_TOMBSTONE
+        assert f"{prefix}/claude-mem.db" not in s3.objects
+        monkeypatch.setattr(sms, "get_remote_manifest", lambda *args, **kwargs: None)
+        secondary = env.tmp / "secondary.db"
+        env.use_db(secondary)
+        assert _run(sms.pull_sqlite) != 0
+        assert not secondary.exists()
+
+    def test_zstd_falls_back_to_gzip_when_unavailable(self, env, monkeypatch):
+        sms = env.sms
+        monkeypatch.setattr(sms, "SNAPSHOT_COMPRESSION", "zstd")
+        monkeypatch.setattr(sms, "SNAPSHOT_COMPRESSION_LEVEL", "")
+        monkeypatch.setattr(sms, "zstandard", None)
+        assert sms.resolve_compression() == ("gzip", 6)
+
+
+# ─────────────────────────────────────────────────────────────────
+# Incremental changelog
+# ─────────────────────────────────────────────────────────────────
+
+class TestIncremental:
+
+    @pytest.fixture
+    def inc(self, env, monkeypatch):
+        monkeypatch.setattr(env.sms, "INCREMENTAL_SYNC", True)
+        return _two_nodes(env, env.tmp / "primary.db", env.tmp / "secondary.db", pull=True)
+
+    def test_append_pushes_delta_and_pull_appends_in_place(self, env, inc):
+        sms, s3 = env.sms, env.s3
+        base = _manifest(env)
+        assert base["deltas"] == []
+        assert base["incremental"]["high_water"]["observations"] == 300
+
+        _add_rows(inc.primary, rows=5)
+        env.use_db(inc.primary)
+        s3.calls.clear()
+        assert _run(sms.push_sqlite) == 0
+        assert not [k for op, k in s3.calls if op == "upload_file" and k.endswith("claude-mem.db")]
+        head = _manifest(env)
+        assert head["sha256"] == base["sha256"]
+        assert [d["rows"]["observations"] for d in head["deltas"]] == [5]
+        legacy = s3.objects[f"{_prefix(env)}/claude-mem.db.sha256"].decode()
+        assert legacy.split()[0] == sms.LEGACY_TOMBSTONE
+
+        env.use_db(inc.secondary)
+        s3.calls.clear()
+        assert _run(sms.pull_sqlite) == 0
+        fetched = [k for op, k in s3.calls if op == "download_fileobj"]
+        assert fetched and all("/deltas/" in k for k in fetched)
+        assert sms.get_local_obs_count(str(inc.secondary)) == 305
+
+        s3.calls.clear()
+        assert _run(sms.pull_sqlite) == 0
+        assert not [k for op, k in s3.calls if op == "download_fileobj"]
+
+    def test_fresh_node_pulls_base_plus_deltas(self, env, inc):
+        sms = env.sms
+        _add_rows(inc.primary, rows=3)
+        env.use_db(inc.primary)
+        assert _run(sms.push_sqlite) == 0
+
+        fresh = env.tmp / "fresh.db"
+        env.use_db(fresh)
+        assert _run(sms.pull_sqlite) == 0
+        assert sms.get_local_obs_count(str(fresh)) == 303
+        assert sms.read_delta_state(str(fresh))["generation"] == _manifest(env)["generation"]
+
+    def test_delete_of_existing_row_forces_full_snapshot(self, env, inc):
+        sms, s3 = env.sms, env.s3
+        _add_rows(inc.primary, rows=2)
+        env.use_db(inc.primary)
+        assert _run(sms.push_sqlite) == 0
+        assert len(_manifest(env)["deltas"]) == 1
+
+        conn = sqlite3.connect(str(inc.primary))
+        conn.execute("DELETE FROM observations WHERE id = 1")
+        conn.execute("INSERT INTO observations (body) VALUES ('keeps the row count')")
+        conn.commit()
+        conn.close()
+        assert _run(sms.push_sqlite) == 0
+        head = _manifest(env)
+        assert head["deltas"] == []
+        assert head["base_generation"] == head["generation"]
+        assert not [k for k in s3.objects if "/deltas/" in k]
+
+    def test_other_table_update_forces_full_snapshot(self, env, inc):
+        sms = env.sms
+        conn = sqlite3.connect(str(inc.primary))
+        conn.execute("CREATE TABLE IF NOT EXISTS sdk_sessions (id INTEGER PRIMARY KEY, status TEXT)")
+        conn.execute("INSERT INTO sdk_sessions (status) VALUES ('active')")
+        conn.commit()
+        env.use_db(inc.primary)
+        assert _run(sms.push_sqlite) == 0  # schema changed: new base
+        conn.execute("UPDATE sdk_sessions SET status = 'done'")
+        conn.commit()
+        conn.close()
+        _add_rows(inc.primary, rows=1)
+        assert _run(sms.push_sqlite) == 0
+        assert _manifest(env)["deltas"] == []
+
+    def test_prune_deltas_follows_list_pagination(self, env):
+        sms, s3 = env.sms, env.s3
+        s3.page_size = 2
+        for gen in range(1, 6):
+            s3.put_object(Bucket="b", Key=f"p/deltas/{gen:010d}.db", Body=b"x")
+        assert sms.prune_deltas(s3, "b", "p", ["deltas/0000000005.db"]) == 4
+        assert s3.keys("p/deltas/") == ["p/deltas/0000000005.db"]
+
+    def test_compaction_after_limit(self, env, inc, monkeypatch):
+        sms = env.sms
+        monkeypatch.setattr(sms, "DELTA_COMPACT_EVERY", 2)
+        env.use_db(inc.primary)
+        for _ in range(3):
+            _add_rows(inc.primary, rows=1)
+            assert _run(sms.push_sqlite) == 0
+        assert _manifest(env)["deltas"] == []
+
+        env.use_db(inc.secondary)
+        assert _run(sms.pull_sqlite) == 0
+        assert sms.get_local_obs_count(str(inc.secondary)) == 303
+
+    def test_segment_roundtrip_without_integer_primary_key(self, env, tmp_path, monkeypatch):
+        sms = env.sms
+        monkeypatch.setattr(sms, "INCREMENTAL_TABLES", ("notes",))
+        src = tmp_path / "src.db"
+        dst = tmp_path / "dst.db"
+        for path in (src, dst):
+            conn = sqlite3.connect(str(path))
+            conn.execute("CREATE TABLE notes (body TEXT)")
+            conn.executemany("INSERT INTO notes VALUES (?)", [("a",), ("b",)])
+            conn.commit()
+            conn.close()
+        conn = sqlite3.connect(str(src))
+        conn.executemany("INSERT INTO notes VALUES (?)", [("c",), ("d",)])
+        conn.commit()
+        conn.close()
+
+        seg = tmp_path / "seg.db"
+        assert sms.build_delta_segment(str(src), {"notes": 2}, str(seg)) == {"notes": 2}
+        delta = {"generation": 2, "from": {"notes": 2}}
+        assert sms.apply_delta_segments(str(dst), [(delta, str(seg))]) == {"notes": 2}
+        conn = sqlite3.connect(str(dst))
+        assert conn.execute("SELECT rowid, body FROM notes ORDER BY rowid").fetchall() == \
+            [(1, "a"), (2, "b"), (3, "c"), (4, "d")]
+        conn.close()
+
+        # A second application no longer matches the high-water mark
+        with pytest.raises(ValueError):
+            sms.apply_delta_segments(str(dst), [(delta, str(seg))])
+
+
+# ─────────────────────────────────────────────────────────────────
+# Prefetch staging
+# ─────────────────────────────────────────────────────────────────
+
+class TestPrefetch:
+
+    @pytest.fixture
+    def nodes(self, env):
+        return _two_nodes(env, env.tmp / "primary.db", env.tmp / "secondary.db",
+                          rows=200, secondary_rows=10)
+
+    def test_pull_swaps_in_prefetched_snapshot(self, env, nodes, capsys):
+        sms, s3 = env.sms, env.s3
+        assert _run(sms.prefetch_sqlite) == 0
+        staged, meta = sms.get_staging_paths(str(nodes.secondary))
+        assert os.path.exists(staged) and os.path.exists(meta)
+        assert sms.get_local_obs_count(str(nodes.secondary)) == 10
+
+        capsys.readouterr()
+        s3.calls.clear()
+        assert _run(sms.pull_sqlite) == 0
+        assert not [c for c in s3.calls if c[0].startswith("download")]
+        assert "using prefetched snapshot" in capsys.readouterr().out
+        assert sms.get_local_obs_count(str(nodes.secondary)) == 200
+        assert not os.path.exists(staged) and not os.path.exists(meta)
+
+    def test_second_prefetch_is_a_noop(self, env, nodes):
+        sms, s3 = env.sms, env.s3
+        assert _run(sms.prefetch_sqlite) == 0
+        s3.calls.clear()
+        assert _run(sms.prefetch_sqlite) == 0
+        assert not [c for c in s3.calls if c[0].startswith("download")]
+
+    def test_stale_staging_is_discarded(self, env, nodes):
+        sms = env.sms
+        assert _run(sms.prefetch_sqlite) == 0
+        _add_rows(nodes.primary, rows=7)
+        env.use_db(nodes.primary)
+        assert _run(sms.push_sqlite) == 0
+
+        env.use_db(nodes.secondary)
+        assert _run(sms.pull_sqlite) == 0
+        assert sms.get_local_obs_count(str(nodes.secondary)) == 207
+        staged, _ = sms.get_staging_paths(str(nodes.secondary))
+        assert not os.path.exists(staged)
+
+    def test_modified_staging_file_is_not_used(self, env, nodes):
+        sms = env.sms
+        assert _run(sms.prefetch_sqlite) == 0
+        staged, _ = sms.get_staging_paths(str(nodes.secondary))
+        with open(staged, "ab") as f:
+            f.write(b"\0")
+        assert _run(sms.pull_sqlite) == 0
+        assert sms.get_local_obs_count(str(nodes.secondary)) == 200
+
+    def test_nothing_staged_when_current(self, env, nodes):
+        sms = env.sms
+        assert _run(sms.pull_sqlite) == 0
+        assert _run(sms.prefetch_sqlite) == 0
+        staged, _ = sms.get_staging_paths(str(nodes.secondary))
+        assert not os.path.exists(staged)
+
+
+# ─────────────────────────────────────────────────────────────────
+# Pull-overwrite backup store
+# ─────────────────────────────────────────────────────────────────
+
+class TestBackupStore:
+
+    def _backup(self, sms, db):
+        sha, _ = sms.cached_sha256(str(db))
+        return sms.create_pull_safety_backup(str(db), sha, "remote", 0, 0, False)
+
+    def _store_bytes(self, sms):
+        total = 0
+        for root, _, files in os.walk(os.path.join(sms.get_pull_backup_base(), "store")):
+            total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+        return total
+
+    def test_near_identical_backups_share_chunks(self, env, monkeypatch):
+        sms = env.sms
+        monkeypatch.setattr(sms, "reflink_file", lambda src, dst: False)
+        db = env.tmp / "local.db"
+        _make_db(db)
+        first_sha = sms.sha256_file(str(db))
+        first = self._backup(sms, db)
+        after_first = self._store_bytes(sms)
+        assert after_first >= os.path.getsize(db)
+
+        _add_rows(db, rows=3)
+        second = self._backup(sms, db)
+        grown = self._store_bytes(sms) - after_first
+        assert 0 < grown < os.path.getsize(db) / 2
+
+        # Unchanged DB: referenced by digest, nothing read or written
+        monkeypatch.setattr(sms, "iter_chunks", None)
+        third = self._backup(sms, db)
+        with open(os.path.join(third, "manifest.json")) as f:
+            assert json.load(f)["files"]["claude-mem.db"]["written"] == 0
+
+        for backup_dir, expected in ((first, first_sha), (second, sms.sha256_file(str(db)))):
+            out = env.tmp / f"restored-{os.path.basename(backup_dir)}.db"
+            sms.restore_pull_backup(os.path.basename(backup_dir), str(out))
+            assert sms.sha256_file(str(out)) == expected
+
+    def test_reflink_objects_are_linked_into_snapshot(self, env, monkeypatch):
+        sms = env.sms
+        import shutil
+
+        def fake_reflink(src, dst):
+            shutil.copyfile(src, dst)
+            return True
+
+        monkeypatch.setattr(sms, "reflink_file", fake_reflink)
+        db = env.tmp / "local.db"
+        _make_db(db, rows=50)
+        backup_dir = self._backup(sms, db)
+        with open(os.path.join(backup_dir, "manifest.json")) as f:
+            ref = json.load(f)["files"]["claude-mem.db"]
+        assert ref["kind"] == "object"
+        obj = os.path.join(sms.get_pull_backup_base(), "store", "objects", ref["sha256"])
+        assert os.path.samefile(obj, os.path.join(backup_dir, "claude-mem.db"))
+
+    def test_gc_frees_only_unreferenced_content(self, env, monkeypatch):
+        sms = env.sms
+        monkeypatch.setattr(sms, "reflink_file", lambda src, dst: False)
+        db = env.tmp / "local.db"
+        _make_db(db)
+        old = self._backup(sms, db)
+        os.rename(old, os.path.join(os.path.dirname(old), "20000101-000000"))
+        _add_rows(db, rows=3)
+        keep = self._backup(sms, db)
+        before = self._store_bytes(sms)
+
+        sms.cleanup_pull_backups(max_days=3650, max_count=1)
+        assert not os.path.exists(os.path.join(os.path.dirname(old), "20000101-000000"))
+        assert 0 < self._store_bytes(sms) < before
+
+        out = env.tmp / "restored.db"
+        sms.restore_pull_backup(os.path.basename(keep), str(out))
+        assert sms.sha256_file(str(out)) == sms.sha256_file(str(db))
+
+
+# ─────────────────────────────────────────────────────────────────
+# Remote snapshot generations
+# ─────────────────────────────────────────────────────────────────
+
+class TestGenerations:
+
+    @pytest.fixture
+    def prefix(self, env, monkeypatch):
+        monkeypatch.setattr(env.sms, "SNAPSHOT_GENERATIONS", True)
+        return _prefix(env)
+
+    def _gen(self, num, iso):
+        from datetime import datetime
+        return (num, datetime.fromisoformat(iso), f"generations/{num}.json")
+
+    def test_restore_old_generation_fetches_only_missing_chunks(self, env, prefix, tmp_path):
+        sms, s3 = env.sms, env.s3
+        db = env.tmp / "primary.db"
+        _make_db(db, rows=400)
+        env.use_db(db)
+        assert _run(sms.push_sqlite) == 0
+        _add_rows(db, rows=50)
+        assert _run(sms.push_sqlite) == 0
+
+        gens = sms.list_generations(s3, "test-bucket", prefix)
+        assert [g for g, _, _ in gens] == [1, 2]
+
+        s3.calls.clear()
+        out = tmp_path / "restored.db"
+        assert sms.restore_sqlite(["--generation", "1", "--output", str(out)]) == str(out)
+        fetched = [c for c in s3.calls if c[0] == "get_object" and "/chunks/" in c[1]]
+        record = sms.read_generation(s3, "test-bucket", gens[0][2])
+        assert 0 < len(fetched) < len(record["chunks"])
+        assert sms.sha256_file(str(out)) == record["sha256"]
+        assert sms.get_local_obs_count(str(out)) == 400
+
+    def test_generation_continues_after_legacy_engine_push(self, env, prefix):
+        sms, s3 = env.sms, env.s3
+        db = env.tmp / "primary.db"
+        _make_db(db, rows=100)
+        env.use_db(db)
+        for _ in range(2):
+            _add_rows(db, rows=5)
+            assert _run(sms.push_sqlite) == 0
+
+        # An engine without generations overwrites the head manifest
+        legacy = _manifest(env)
+        del legacy["generation"]
+        s3.objects[f"{prefix}/manifest.json"] = json.dumps(legacy).encode()
+        _add_rows(db, rows=5)
+        assert _run(sms.push_sqlite) == 0
+        assert _manifest(env)["generation"] == 3
+
+    def test_restore_at_picks_newest_generation_not_after(self, env):
+        gens = [self._gen(1, "2026-01-01T10:00:00+00:00"), self._gen(2, "2026-01-01T12:00:00+00:00")]
+        at = gens[1][1].replace(hour=11)
+        assert env.sms.find_generation(gens, at=at)[0] == 1
+        assert env.sms.find_generation(gens, at=gens[1][1])[0] == 2
+        assert env.sms.find_generation(gens, at=at.replace(hour=9)) is None
+        assert env.sms.find_generation(gens, generation=3) is None
+
+    def test_retention_keeps_newest_per_period(self, env):
+        gens = [
+            self._gen(1, "2026-01-01T10:05:00+00:00"),
+            self._gen(2, "2026-01-01T10:40:00+00:00"),
+            self._gen(3, "2026-01-01T11:10:00+00:00"),
+            self._gen(4, "2026-01-02T09:00:00+00:00"),
+        ]
+        keep = env.sms.select_retained_generations(gens, keep_last=1, hourly=2, daily=2, weekly=0)
+        # last: 4; hourly: 4, 3; daily: 4, 3 (newest of Jan 1)
+        assert keep == {3, 4}
+        keep = env.sms.select_retained_generations(gens, keep_last=1, hourly=3, daily=0, weekly=0)
+        assert keep == {2, 3, 4}
+
+    def test_pruned_generation_releases_unshared_chunks(self, env, prefix, monkeypatch):
+        sms, s3 = env.sms, env.s3
+        for name in ("GENERATIONS_KEEP_HOURLY", "GENERATIONS_KEEP_DAILY", "GENERATIONS_KEEP_WEEKLY"):
+            monkeypatch.setattr(sms, name, 0)
+        monkeypatch.setattr(sms, "GENERATIONS_KEEP_LAST", 1)
+        db = env.tmp / "primary.db"
+        _make_db(db, rows=400)
+        env.use_db(db)
+        assert _run(sms.push_sqlite) == 0
+        conn = sqlite3.connect(str(db))
+        conn.execute("UPDATE observations SET body = 'rewritten'")
+        conn.commit()
+        conn.close()
+        assert _run(sms.push_sqlite) == 0
+
+        gens = sms.list_generations(s3, "test-bucket", prefix)
+        assert [g for g, _, _ in gens] == [2]
+        live = {f"{prefix}/chunks/{c['sha256']}"
+                for c in sms.read_generation(s3, "test-bucket", gens[0][2])["chunks"]}
+        assert set(s3.keys(f"{prefix}/chunks/")) == live
+
+
+# ─────────────────────────────────────────────────────────────────
+# Vector DB sync
+# ─────────────────────────────────────────────────────────────────
+
+class TestVectorSync:
+
+    @pytest.fixture
+    def nodes(self, env, monkeypatch):
+        monkeypatch.setattr(env.sms, "VECTOR_SYNC", True)
+        primary, secondary = env.tmp / "primary", env.tmp / "secondary"
+        for node in (primary, secondary):
+            (node / "vector-db").mkdir(parents=True)
+        _make_db(primary / "vector-db" / "chroma.sqlite3", rows=100)
+        seg = primary / "vector-db" / "0d3c-segment"
+        seg.mkdir()
+        (seg / "data_level0.bin").write_bytes(os.urandom(40000))
+
+        def use(node):
+            env.use_db(node / "claude-mem.db")
+            monkeypatch.setattr(env.sms, "VECTOR_DB_DIR", str(node / "vector-db"))
+
+        use(primary)
+        _two_nodes(env, primary / "claude-mem.db", secondary / "claude-mem.db")
+        return SimpleNamespace(primary=primary, secondary=secondary, use=use)
+
+    def test_pull_installs_vector_set(self, env, nodes):
+        sms = env.sms
+        manifest = _manifest(env)
+        assert sorted(manifest["vector"]["files"]) == ["0d3c-segment/data_level0.bin", "chroma.sqlite3"]
+
+        nodes.use(nodes.secondary)
+        assert _run(sms.pull_sqlite) == 0
+        vec = nodes.secondary / "vector-db"
+        assert (vec / "0d3c-segment" / "data_level0.bin").read_bytes() == \
+            (nodes.primary / "vector-db" / "0d3c-segment" / "data_level0.bin").read_bytes()
+        assert sms.get_local_obs_count(str(vec / "chroma.sqlite3")) == 100
+        state = sms.read_vector_state(str(nodes.secondary / "claude-mem.db"))
+        assert state["sha256"] == manifest["vector"]["sha256"]
+
+    def test_vector_only_push_and_pull(self, env, nodes):
+        sms, s3 = env.sms, env.s3
+        nodes.use(nodes.secondary)
+        assert _run(sms.pull_sqlite) == 0
+        before = _manifest(env)
+
+        nodes.use(nodes.primary)
+        seg = nodes.primary / "vector-db" / "0d3c-segment" / "data_level0.bin"
+        seg.write_bytes(seg.read_bytes()[:20000] + os.urandom(20000))
+        s3.calls.clear()
+        assert _run(sms.push_sqlite) == 0
+        after = _manifest(env)
+        assert after["generation"] == before["generation"] + 1
+        assert after["sha256"] == before["sha256"]
+        assert after["vector"]["sha256"] != before["vector"]["sha256"]
+        assert not [c for c in s3.calls if c[0] == "upload_file"]
+
+        nodes.use(nodes.secondary)
+        assert _run(sms.pull_sqlite) == 0
+        assert (nodes.secondary / "vector-db" / "0d3c-segment" / "data_level0.bin").read_bytes() == \
+            seg.read_bytes()
+
+    def test_current_vector_set_is_not_fetched(self, env, nodes):
+        sms, s3 = env.sms, env.s3
+        nodes.use(nodes.secondary)
+        assert _run(sms.pull_sqlite) == 0
+        s3.calls.clear()
+        assert _run(sms.pull_sqlite) == 0
+        assert not [c for c in s3.calls if "/chunks/" in c[1]]
+
+
+# ─────────────────────────────────────────────────────────────────
+# Push pre-check
+# ─────────────────────────────────────────────────────────────────
+
+class TestPushPrecheck:
+
+    @pytest.fixture
+    def pushed(self, env, monkeypatch):
+        db = env.tmp / "primary.db"
+        _make_db(db, rows=200)
+        env.use_db(db)
+        assert _run(env.sms.push_sqlite) == 0
+        snapshots = []
+        real = env.sms.create_online_snapshot
+        monkeypatch.setattr(env.sms, "create_online_snapshot",
+                            lambda src, dst, **kwargs: snapshots.append(src) or real(src, dst, **kwargs))
+        return SimpleNamespace(db=db, snapshots=snapshots)
+
+    def test_unchanged_db_skips_snapshot(self, env, pushed, capsys):
+        capsys.readouterr()
+        assert _run(env.sms.push_sqlite) == 0
+        assert pushed.snapshots == []
+        assert "unchanged since push of generation 1" in capsys.readouterr().out
+
+    def test_new_rows_take_a_snapshot(self, env, pushed):
+        _add_rows(pushed.db, rows=3)
+        assert _run(env.sms.push_sqlite) == 0
+        assert pushed.snapshots == [str(pushed.db)]
+
+    def test_projects_sharing_a_db_keep_their_own_state(self, env, pushed, monkeypatch):
+        monkeypatch.setenv("CLAUDE_PROJECT_ID", "other-project")
+        assert _run(env.sms.push_sqlite) == 0
+        assert pushed.snapshots == [str(pushed.db)]  # first push of this project
+        for project in ("test-project", "other-project"):
+            monkeypatch.setenv("CLAUDE_PROJECT_ID", project)
+            assert _run(env.sms.push_sqlite) == 0
+        assert pushed.snapshots == [str(pushed.db)]
+
+    def test_moved_remote_head_forces_full_push(self, env, pushed):
+        for key in list(env.s3.objects):
+            del env.s3.objects[key]
+        assert _run(env.sms.push_sqlite) == 0
+        assert pushed.snapshots == [str(pushed.db)]
+        assert env.s3.keys("projects/")
+
+
+# ─────────────────────────────────────────────────────────────────
+# Tiered integrity checks
+# ─────────────────────────────────────────────────────────────────
+
+class TestIntegrityTiers:
+
+    def test_full_check_schedule(self, env, monkeypatch):
+        sms = env.sms
+        monkeypatch.setattr(sms, "INTEGRITY_FULL_EVERY", 3)
+        monkeypatch.setattr(sms, "INTEGRITY_FULL_MAX_AGE_HOURS", 24)
+        now = 1_000_000
+        assert sms.full_check_due({}, now) == "no full check recorded"
+        state = {"last_full_at": now, "last_full_result": "ok", "quick_checks_since_full": 2}
+        assert sms.full_check_due(state, now + 60) is None
+        assert "3 quick checks" in sms.full_check_due(dict(state, quick_checks_since_full=3), now)
+        assert "25h ago" in sms.full_check_due(state, now + 25 * 3600)
+        assert sms.full_check_due(dict(state, last_full_result="corrupt"), now) == "last full check failed"
+
+    def test_push_runs_full_check_then_quick_checks(self, env, monkeypatch):
+        sms = env.sms
+        monkeypatch.setattr(sms, "INTEGRITY_FULL_EVERY", 2)
+        db = env.tmp / "primary.db"
+        _make_db(db, rows=100)
+        env.use_db(db)
+
+        checks = []
+        for _ in range(4):
+            _add_rows(db, rows=1)
+            assert _run(sms.push_sqlite) == 0
+            checks.append(_manifest(env)["integrity"]["check"])
+        assert checks == ["full", "quick", "quick", "full"]
+
+        integrity = _manifest(env)["integrity"]
+        assert integrity["result"] == "ok" and integrity["last_full_result"] == "ok"
+        assert sms.read_integrity_state(str(db))["quick_checks_since_full"] == 0
+
+    @pytest.mark.parametrize("journal_mode", ["wal", "delete"])
+    def test_online_push_checks_source_not_vacuumed_snapshot(self, env, monkeypatch, journal_mode):
+        sms, s3 = env.sms, env.s3
+        monkeypatch.setattr(sms, "SNAPSHOT_MODE", "online")
+        db = env.tmp / "claude-mem.db"
+        _make_db(db, rows=500)
+        conn = sqlite3.connect(str(db))
+        conn.execute(f"PRAGMA journal_mode={journal_mode}")
+        conn.execute("DELETE FROM observations WHERE id > 100")
+        conn.commit()
+        conn.close()
+        # Drop the freelist from the header: its pages become orphans, which
+        # VACUUM silently discards but an integrity check on the source reports
+        with open(db, "r+b") as f:
+            f.seek(32)
+            f.write(b"\0" * 8)
+        env.use_db(db)
+
+        assert _run(sms.push_sqlite) == 1
+        assert not s3.keys("projects/")
+        assert sms.read_integrity_state(str(db))["last_full_result"] != "ok"
+
+
+# ─────────────────────────────────────────────────────────────────
+# Progress events
+# ─────────────────────────────────────────────────────────────────
+
+class TestEvents:
+
+    def _events(self, path):
+        with open(path) as f:
+            return [json.loads(line) for line in f]
+
+    def test_push_and_pull_emit_phase_and_decision_events(self, env, monkeypatch):
+        sms = env.sms
+        events_path = env.tmp / "events.jsonl"
+        monkeypatch.setattr(sms, "SYNC_EVENTS", str(events_path))
+        primary = env.tmp / "primary.db"
+        _make_db(primary, rows=100)
+        env.use_db(primary)
+        assert _run(sms.push_sqlite) == 0
+
+        events = self._events(events_path)
+        assert events[0]["event"] == "start" and events[0]["command"] == "push_sqlite"
+        assert events[-1] == dict(events[-1], event="end", exit_code=0)
+        phases = {e["phase"]: e for e in events if e["event"] == "phase"}
+        assert {"snapshot", "hash", "upload"} <= set(phases)
+        assert phases["upload"]["bytes"] > 0 and phases["upload"]["ended_at"] >= phases["upload"]["started_at"]
+        assert [e["mode"] for e in events if e["event"] == "decision"] == ["full"]
+
+        events_path.unlink()
+        env.use_db(env.tmp / "secondary.db")
+        assert _run(sms.pull_sqlite) == 0
+        events = self._events(events_path)
+        decisions = [e for e in events if e["event"] == "decision"]
+        assert decisions == [dict(decisions[0], decision="full_pull", reason="no_local_db")]
+        digests = {e["role"]: e["sha256"] for e in events if e["event"] == "digest"}
+        assert digests["download"] == digests["remote"]
+
+    def test_exit_code_is_reported(self, env, monkeypatch):
+        sms = env.sms
+        events_path = env.tmp / "events.jsonl"
+        monkeypatch.setattr(sms, "SYNC_EVENTS", str(events_path))
+        env.use_db(env.tmp / "missing.db")
+        assert _run(sms.push_sqlite) == 1
+        assert self._events(events_path)[-1]["exit_code"] == 1
+
+    def test_events_disabled_by_default(self, env, capsys):
+        _make_db(env.tmp / "primary.db", rows=10)
+        env.use_db(env.tmp / "primary.db")
+        assert _run(env.sms.push_sqlite) == 0
+        assert '"event"' not in capsys.readouterr().out
+
+
+# ─────────────────────────────────────────────────────────────────
+# In-process engine API
+# ─────────────────────────────────────────────────────────────────
+
+class TestSyncEngine:
+
+    def _engine(self, env, db):
+        cfg = {
+            "MINIO_ENDPOINT": "http://localhost:9000",
+            "MINIO_ACCESS_KEY": "minioadmin",
+            "MINIO_SECRET_KEY": "minioadmin",
+            "MINIO_BUCKET": "test-bucket",
+            "CLAUDE_PROJECT_ID": "engine-project",
+            "CLAUDE_MEM_DB": str(db),
+        }
+        return env.sms.SyncEngine(cfg, s3=env.s3)
+
+    def test_push_pull_return_structured_results(self, env):
+        primary = env.tmp / "primary.db"
+        _make_db(primary, rows=50)
+        result = self._engine(env, primary).push()
+        assert result.ok and result.exit_code == 0
+        assert result.decision["mode"] == "full"
+        assert "PUSH COMPLETE" in result.output
+        assert env.s3.keys(f"projects/{self._engine(env, primary).canonical_id}/sqlite/")
+
+        secondary = self._engine(env, env.tmp / "secondary.db")
+        first, second = secondary.pull(no_restart_worker=True), secondary.pull()
+        assert first.ok and first.decision["decision"] == "full_pull"
+        assert second.ok and second.decision["decision"] == "up_to_date"
+        assert env.sms.get_local_obs_count(str(env.tmp / "secondary.db")) == 50
+        assert env.sms.NO_RESTART_WORKER is True  # fixture value restored after the override
+
+    def test_exit_becomes_result(self, env):
+        result = self._engine(env, env.tmp / "missing.db").push()
+        assert not result.ok and result.exit_code == 1
+        assert "local DB does not exist" in result.output
+        assert env.sms._ENGINE_CFG is None and env.sms._ENGINE_S3 is None
+
+    def test_missing_config_raises(self, env):
+        with pytest.raises(ValueError, match="CLAUDE_MEM_DB"):
+            env.sms.SyncEngine({"CLAUDE_PROJECT_ID": "x"})
+
+    def test_settings_apply_to_runs_only(self, env):
+        sms = env.sms
+        settings = sms.engine_settings({"CHUNKED_SYNC": "1", "SNAPSHOT_COMPRESSION": "GZIP",
+                                        "PRIMARY_NODE_ID": "rpi4b", "UNRELATED": "x"})
+        assert settings == {"CHUNKED_SYNC": True, "SNAPSHOT_COMPRESSION": "gzip",
+                            "PRIMARY_NODE_ID_ENV": "rpi4b"}
+        db = env.tmp / "primary.db"
+        _make_db(db, rows=50)
+        engine = sms.SyncEngine(self._engine(env, db).cfg, s3=env.s3, settings={"CHUNKED_SYNC": True})
+        assert engine.push().decision["mode"] == "chunked"
+        assert sms.CHUNKED_SYNC is False
+
+    def test_change_checks_use_engine_settings(self, env):
+        sms = env.sms
+        db = env.tmp / "primary.db"
+        _make_db(db, rows=50)
+        assert self._engine(env, db).push().ok
+        cfg = self._engine(env, env.tmp / "secondary.db").cfg
+        assert sms.SyncEngine(cfg, s3=env.s3).pull(no_restart_worker=True).ok
+        assert sms.SyncEngine(cfg, s3=env.s3).needs_pull() is None
+        assert sms.SyncEngine(cfg, s3=env.s3).needs_push() is not None  # never pushed from here
+        engine = sms.SyncEngine(cfg, s3=env.s3, settings={"DIGEST_CACHE_ENABLED": False,
+                                                          "PUSH_PRECHECK": False})
+        assert engine.needs_pull() == "local digest not cached"
+        assert engine.needs_push() == "pre-check disabled"
+        assert sms.DIGEST_CACHE_ENABLED is True and sms.PUSH_PRECHECK is True
+
+    def test_output_is_not_redirected_process_wide(self, env, monkeypatch, capsys):
+        import threading
+        sms = env.sms
+        real = sms.create_online_snapshot
+
+        def snapshot_with_bystander(*args, **kwargs):
+            t = threading.Thread(target=print, args=("bystander thread output",))
+            t.start()
+            t.join()
+            return real(*args, **kwargs)
+
+        monkeypatch.setattr(sms, "create_online_snapshot", snapshot_with_bystander)
+        db = env.tmp / "primary.db"
+        _make_db(db, rows=50)
+        result = self._engine(env, db).push()
+        assert result.ok and "PUSH COMPLETE" in result.output
+        assert "bystander" not in result.output
+        assert "bystander thread output" in capsys.readouterr().out
+
+
+# ─── Batch sync ──────────────────────────────────────────────────────────────
+
+
+class TestBatchSync:
+
+    def _projects(self, env, names, suffix=""):
+        return [{"CLAUDE_PROJECT_ID": n, "CLAUDE_MEM_DB": str(env.tmp / f"{n}{suffix}.db")}
+                for n in names]
+
+    def _cfg(self):
+        return {
+            "MINIO_ENDPOINT": "http://localhost:9000",
+            "MINIO_ACCESS_KEY": "minioadmin",
+            "MINIO_SECRET_KEY": "minioadmin",
+            "MINIO_BUCKET": "test-bucket",
+        }
+
+    def test_push_many_transfers_only_changed_projects(self, env, monkeypatch):
+        clients = []
+
+        def get_s3_client(cfg):  # mirrors the real one: engine runs reuse their client
+            if env.sms._ENGINE_S3 is not None:
+                return env.sms._ENGINE_S3
+            clients.append(cfg["CLAUDE_PROJECT_ID"])
+            return env.s3
+
+        monkeypatch.setattr(env.sms, "get_s3_client", get_s3_client)
+        for name in ("alpha", "beta", "gamma"):
+            _make_db(env.tmp / f"{name}.db", rows=20)
+        projects = self._projects(env, ("alpha", "beta", "gamma"))
+
+        first = env.sms.sync_many("push", projects, cfg=self._cfg())
+        assert all(r.ok and r.reason for r in first.values())
+        assert len(clients) == 1  # every project shared one client
+
+        _add_rows(env.tmp / "beta.db", 5)
+        second = env.sms.sync_many("push", projects, cfg=self._cfg())
+        assert second["beta"].reason and second["beta"].decision["decision"] == "push"
+        for name in ("alpha", "gamma"):
+            assert second[name].reason is None
+            assert second[name].decision == {"event": "decision", "command": "push_many",
+                                              "ts": second[name].decision["ts"],
+                                              "decision": "up_to_date", "via": "batch_check"}
+
+    def test_pull_many_skips_current_projects(self, env):
+        for name in ("alpha", "beta"):
+            _make_db(env.tmp / f"{name}.db", rows=10)
+        env.sms.sync_many("push", self._projects(env, ("alpha", "beta")), cfg=self._cfg())
+        replicas = self._projects(env, ("alpha", "beta"), suffix="-replica")
+
+        first = env.sms.sync_many("pull", replicas, cfg=self._cfg(), s3=env.s3)
+        assert all(r.ok and r.decision["decision"] == "full_pull" for r in first.values())
+
+        _add_rows(env.tmp / "alpha.db", 3)
+        env.sms.sync_many("push", self._projects(env, ("alpha",)), cfg=self._cfg())
+        second = env.sms.sync_many("pull", replicas, cfg=self._cfg(), s3=env.s3)
+        assert second["alpha"].reason == "remote head differs" and second["alpha"].ok
+        assert second["beta"].reason is None
+        assert env.sms.get_local_obs_count(str(env.tmp / "alpha-replica.db")) == 13
+
+    def test_cli_exits_nonzero_when_a_project_fails(self, env, monkeypatch, capsys):
+        _make_db(env.tmp / "alpha.db", rows=5)
+        monkeypatch.setattr(sys, "argv", ["sqlite_minio_sync.py", "push_many",
+                                          f"alpha={env.tmp / 'alpha.db'}",
+                                          f"ghost={env.tmp / 'ghost.db'}"])
+        with pytest.raises(SystemExit) as exc:
+            env.sms.push_many()
+        assert exc.value.code == 1
+        out = capsys.readouterr().out
+        assert "alpha" in out and "ghost" in out and "transferred: 2" in out